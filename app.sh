@@ -33,6 +33,12 @@ case $KEBECHET_SUBCOMMAND in
     'run')
         exec pipenv run python3 kebechet-cli run
         ;;
+    'run-fleet')
+        exec pipenv run python3 kebechet-cli run-fleet
+        ;;
+    'serve')
+        exec pipenv run python3 kebechet-cli serve
+        ;;
     *)
         echo "Application configuration error - invalid or no subcommand supplied"
         exit 1
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# Kebechet
+# Copyright(C) 2022 Kevin Postlethwait
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Measure start-up time of kebechet-cli sub-commands and import time of managers.
+
+Each target is run in a fresh interpreter, wall time is measured over several runs and a per-module breakdown
+is obtained using python -X importtime. The benchmark runs offline, run-webhook is given a stub payload of an
+event no manager acts on so that Kebechet exits before talking to any forge. Results are reported as JSON:
+
+    $ python3 benchmarks/startup.py --repeat 5 --output startup.json
+"""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import click
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_CLI = os.path.join(_ROOT, "kebechet-cli")
+
+# Sub-commands parse their arguments before talking to a forge, --help measures imports and CLI initialization.
+_SUBCOMMANDS = ["run", "run-url", "run-webhook", "run-results", "run-fleet", "serve"]
+
+# GitHub payload of an event no manager acts on, Kebechet exits before creating an ogr service.
+_STUB_PAYLOAD = {
+    "event": "watch",
+    "payload": {
+        "action": "started",
+        "sender": {"url": "https://api.github.com/users/kebechet-benchmark"},
+        "repository": {"html_url": "https://github.com/thoth-station/kebechet"},
+    },
+}
+
+
+def _get_environment() -> Dict[str, str]:
+    """Get environment for benchmarked processes, no credentials are passed so that no forge is accessed."""
+    env = {
+        key: value
+        for key, value in os.environ.items()
+        if not key.endswith("_KEBECHET_TOKEN")
+        and key not in ("GITHUB_APP_ID", "GITHUB_PRIVATE_KEY_PATH")
+    }
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [_ROOT, env.get("PYTHONPATH")]))
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+def _parse_import_time(stderr: str) -> List[Tuple[str, int, int]]:
+    """Parse output of -X importtime, return tuples of module name, self and cumulative time in microseconds."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+
+        self_time, cumulative_time, module = line[len("import time:") :].split("|")
+        modules.append((module.strip(), int(self_time), int(cumulative_time)))
+
+    return modules
+
+
+def _import_time_report(
+    modules: List[Tuple[str, int, int]], top: int
+) -> Dict[str, Any]:
+    """Summarize import times, aggregate self time per top level package."""
+    packages: Dict[str, int] = defaultdict(int)
+    for module, self_time, _ in modules:
+        packages[module.split(".", maxsplit=1)[0]] += self_time
+
+    return {
+        "total_us": sum(self_time for _, self_time, _ in modules),
+        "modules_imported": len(modules),
+        "packages_us": dict(
+            sorted(packages.items(), key=lambda item: item[1], reverse=True)
+        ),
+        "top_modules": [
+            {"module": module, "self_us": self_time, "cumulative_us": cumulative_time}
+            for module, self_time, cumulative_time in sorted(
+                modules, key=lambda item: item[1], reverse=True
+            )[:top]
+        ],
+    }
+
+
+def _benchmark(
+    name: str,
+    args: List[str],
+    env: Dict[str, str],
+    repeat: int,
+    top: int,
+    module: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Benchmark a command run in a fresh interpreter, optionally report cumulative import time of the given module."""
+    command = [sys.executable, *args]
+    wall_times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        process = subprocess.run(command, env=env, cwd=_ROOT, capture_output=True)
+        wall_times.append(time.perf_counter() - start)
+
+    # Import time instrumentation adds overhead, it is measured in a separate run.
+    traced = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        env=env,
+        cwd=_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if traced.returncode != 0:
+        click.echo(f"{name!r} exited with {traced.returncode}:", err=True)
+        click.echo(traced.stderr[-2000:], err=True)
+
+    modules = _parse_import_time(traced.stderr)
+    result = {
+        "command": command,
+        "exit_code": process.returncode,
+        "wall_time": {
+            "min": round(min(wall_times), 4),
+            "median": round(statistics.median(wall_times), 4),
+            "max": round(max(wall_times), 4),
+        },
+        "import_time": _import_time_report(modules, top),
+    }
+    if module is not None:
+        result["module_import_us"] = next(
+            (cumulative for m, _, cumulative in modules if m == module), None
+        )
+
+    return result
+
+
+def _manager_modules() -> Dict[str, str]:
+    """Get modules of managers shipped with Kebechet."""
+    sys.path.insert(0, _ROOT)
+    from kebechet.managers.registry import _BUILTIN_MANAGERS
+
+    return {
+        name: path.split(":", maxsplit=1)[0] for name, path in _BUILTIN_MANAGERS.items()
+    }
+
+
+@click.command()
+@click.option(
+    "-r",
+    "--repeat",
+    default=5,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of runs used to measure wall time of each target.",
+)
+@click.option(
+    "--top",
+    default=25,
+    show_default=True,
+    type=click.IntRange(min=0),
+    help="Number of the slowest modules to report per target.",
+)
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Write report to the given file instead of standard output.",
+)
+def main(repeat: int, top: int, output: str):
+    """Benchmark start-up of Kebechet."""
+    env = _get_environment()
+    results = {}
+
+    with tempfile.NamedTemporaryFile("w", suffix=".json") as payload_file:
+        json.dump(_STUB_PAYLOAD, payload_file)
+        payload_file.flush()
+
+        for subcommand in _SUBCOMMANDS:
+            click.echo(f"Benchmarking {subcommand} --help", err=True)
+            results[f"cli:{subcommand}"] = _benchmark(
+                subcommand, [_CLI, subcommand, "--help"], env, repeat, top
+            )
+
+        click.echo("Benchmarking run-webhook with a stub payload", err=True)
+        results["cli:run-webhook:stub-payload"] = _benchmark(
+            "run-webhook",
+            [_CLI, "run-webhook", payload_file.name],
+            env,
+            repeat,
+            top,
+        )
+
+    # Manager modules are imported by the CLI on demand, measure what a job pays on top of the CLI start-up.
+    for name, module in _manager_modules().items():
+        click.echo(f"Benchmarking import of manager {name}", err=True)
+        results[f"manager:{name}"] = _benchmark(
+            name,
+            ["-c", f"import kebechet.cli; import {module}"],
+            env,
+            repeat,
+            top,
+            module=module,
+        )
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "repeat": repeat,
+        "results": results,
+    }
+    content = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as output_file:
+            output_file.write(content)
+    else:
+        click.echo(content)
+
+
+if __name__ == "__main__":
+    main()
@@ -28,7 +28,14 @@ from thoth.common import init_logging
 from kebechet.exception import WebhookPayloadError
 
 from kebechet import __version__ as kebechet_version
-from kebechet.kebechet_runners import run, run_url, run_webhook, run_analysis
+from kebechet.kebechet_runners import (
+    run,
+    run_fleet,
+    run_url,
+    run_webhook,
+    run_analysis,
+)
+from kebechet.server import serve
 
 init_logging(logging_env_var_start="KEBECHET_LOG_")
 
@@ -151,6 +158,57 @@ def cli_run_url(
     )
 
 
+@cli.command("run-fleet")
+@click.pass_context
+@click.option(
+    "-c",
+    "--config",
+    "config_path",
+    envvar="KEBECHET_FLEET_CONFIG",
+    default="config/thoth.yaml",
+    show_default=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="Configuration file listing repositories and their managers.",
+)
+@click.option("-s", "--service", envvar="KEBECHET_SERVICE_NAME", default="GITHUB")
+@click.option("-u", "--service-url", envvar="KEBECHET_SERVICE_URL")
+@click.option(
+    "-w",
+    "--workers",
+    envvar="KEBECHET_FLEET_WORKERS",
+    default=4,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of repositories processed concurrently.",
+)
+@click.option(
+    "-t",
+    "--timeout",
+    envvar="KEBECHET_FLEET_TIMEOUT",
+    type=float,
+    help="Time in seconds after which run on a single repository is terminated.",
+)
+def cli_run_fleet(
+    ctx,
+    config_path: str,
+    service: str,
+    workers: int,
+    service_url: Optional[str] = None,
+    timeout: Optional[float] = None,
+):
+    """Run Kebechet on all the repositories stated in a configuration file."""
+    summary = run_fleet(
+        config_path=config_path,
+        service_type=service,
+        service_url=service_url,
+        workers=workers,
+        timeout=timeout,
+    )
+    click.echo(json.dumps(summary, indent=2))
+    if summary["failed"] or summary["timeout"]:
+        ctx.exit(1)
+
+
 @cli.command("run-webhook")
 @click.argument("web_payload", nargs=1, envvar="KEBECHET_PAYLOAD", required=True)
 def cli_run_webhook(web_payload: str):
@@ -167,5 +225,74 @@ def cli_run_webhook(web_payload: str):
     run_webhook(payload=payload)
 
 
+@cli.command("serve")
+@click.option(
+    "-h", "--host", envvar="KEBECHET_SERVE_HOST", default="127.0.0.1", show_default=True
+)
+@click.option(
+    "-p", "--port", envvar="KEBECHET_SERVE_PORT", default=8080, show_default=True
+)
+@click.option(
+    "-w",
+    "--workers",
+    envvar="KEBECHET_SERVE_WORKERS",
+    default=4,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of payloads processed concurrently.",
+)
+@click.option(
+    "-q",
+    "--queue-size",
+    envvar="KEBECHET_SERVE_QUEUE_SIZE",
+    default=100,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of payloads waiting for a worker, payloads over the limit are rejected.",
+)
+@click.option(
+    "-t",
+    "--timeout",
+    envvar="KEBECHET_SERVE_TIMEOUT",
+    type=float,
+    help="Time in seconds after which processing of a payload is terminated.",
+)
+@click.option(
+    "-d",
+    "--debounce-window",
+    envvar="KEBECHET_SERVE_DEBOUNCE_WINDOW",
+    default=10.0,
+    show_default=True,
+    type=click.FloatRange(min=0),
+    help="Time in seconds to wait for further events on a repository before running Kebechet on it.",
+)
+@click.option(
+    "-s",
+    "--secret",
+    envvar="KEBECHET_SERVE_WEBHOOK_SECRET",
+    required=True,
+    help="Secret of the webhook, GitHub deliveries have to be signed using it, GitLab ones have to carry it.",
+)
+def cli_serve(
+    secret: str,
+    host: str,
+    port: int,
+    workers: int,
+    queue_size: int,
+    debounce_window: float,
+    timeout: Optional[float] = None,
+):
+    """Run Kebechet as a service accepting webhook payloads over HTTP."""
+    serve(
+        secret=secret,
+        host=host,
+        port=port,
+        workers=workers,
+        queue_size=queue_size,
+        timeout=timeout,
+        debounce_window=debounce_window,
+    )
+
+
 if __name__ == "__main__":
     cli()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# Kebechet
+# Copyright(C) 2022 Kevin Postlethwait
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Persistent cache of bare repository mirrors used as a reference for clones."""
+
+import fcntl
+import logging
+import os
+import shutil
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+import git
+
+_LOGGER = logging.getLogger(__name__)
+
+_CACHE_DIRECTORY = os.getenv("KEBECHET_GIT_CACHE_DIRECTORY", None)
+# Size of the cache in bytes, least recently used mirrors are evicted once it is exceeded; 0 means no limit.
+_CACHE_MAX_SIZE = int(os.getenv("KEBECHET_GIT_CACHE_MAX_SIZE", 0))
+# Number of loose objects in a mirror which triggers its repacking after a fetch (gc.auto of git).
+_GC_AUTO = int(os.getenv("KEBECHET_GIT_CACHE_GC_AUTO", 6700))
+
+# Mirror both branches and tags, remote refs which were removed are pruned on each fetch.
+_MIRROR_REFSPECS = ["+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*"]
+
+
+def is_enabled() -> bool:
+    """Check whether the clone cache is configured."""
+    return _CACHE_DIRECTORY is not None
+
+
+def get_mirror_path(service_host: str, slug: str) -> str:
+    """Get path to the bare mirror of the given repository in the cache."""
+    if _CACHE_DIRECTORY is None:
+        raise ValueError("Clone cache is not configured")
+
+    return os.path.join(_CACHE_DIRECTORY, service_host, f"{slug}.git")
+
+
+@contextmanager
+def _file_lock(path: str, operation: int = fcntl.LOCK_EX):
+    """Hold an advisory lock on the given file, the lock is shared across processes."""
+    with open(path, "a") as lock_file:
+        fcntl.flock(lock_file, operation)
+        try:
+            yield lock_file
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@contextmanager
+def lease(service_host: str, slug: str):
+    """Mark the mirror of the given repository as used, it is not evicted until the lease is released.
+
+    Clones keep borrowing objects from the mirror for their whole lifetime so the lease has to be held
+    as long as the clone exists. Leases are shared, any number of jobs can use the same mirror.
+    """
+    if _CACHE_DIRECTORY is None:
+        yield
+        return
+
+    mirror_path = get_mirror_path(service_host, slug)
+    os.makedirs(os.path.dirname(mirror_path), exist_ok=True)
+    with _file_lock(f"{mirror_path}.lease", fcntl.LOCK_SH) as lease_file:
+        # The modification time of the lease file tracks when the mirror was used the last time.
+        os.utime(lease_file.name)
+        yield
+
+
+def _read_size(mirror_path: str) -> Optional[int]:
+    """Read size of the mirror recorded on its last update."""
+    try:
+        with open(f"{mirror_path}.size") as size_file:
+            return int(size_file.read())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_size(mirror_path: str, size: int) -> None:
+    """Record size of the mirror, the record is replaced atomically."""
+    with open(f"{mirror_path}.size.tmp", "w") as size_file:
+        size_file.write(str(size))
+    os.replace(f"{mirror_path}.size.tmp", f"{mirror_path}.size")
+
+
+def _get_mirror_size(mirror: git.Repo) -> int:
+    """Get size of objects stored in the mirror as reported by git, without walking the mirror."""
+    counts = dict(
+        line.split(": ", maxsplit=1)
+        for line in mirror.git.count_objects(verbose=True).splitlines()
+    )
+    # Sizes are reported in KiB.
+    return 1024 * sum(
+        int(counts.get(key, 0)) for key in ("size", "size-pack", "size-garbage")
+    )
+
+
+def _get_directory_size(path: str) -> int:
+    """Compute size of all the files in the given directory."""
+    size = 0
+    for root, _, files in os.walk(path):
+        for file_name in files:
+            try:
+                size += os.lstat(os.path.join(root, file_name)).st_size
+            except FileNotFoundError:
+                pass
+    return size
+
+
+def _list_mirrors() -> List[Tuple[float, str]]:
+    """List all the mirrors in the cache together with the time they were used the last time."""
+    mirrors = []
+    for root, dirs, _ in os.walk(_CACHE_DIRECTORY):  # type: ignore
+        for dir_name in dirs:
+            if dir_name.endswith(".git"):
+                mirror_path = os.path.join(root, dir_name)
+                try:
+                    last_used = os.stat(f"{mirror_path}.lease").st_mtime
+                except FileNotFoundError:
+                    last_used = 0.0
+                mirrors.append((last_used, mirror_path))
+        # Do not descend into mirrors themselves.
+        dirs[:] = [d for d in dirs if not d.endswith(".git")]
+
+    return mirrors
+
+
+def evict(keep: Optional[str] = None) -> None:
+    """Evict least recently used mirrors until the cache fits into the configured size.
+
+    Mirrors leased by a running job are never evicted, the same applies to the mirror passed as keep.
+    """
+    if _CACHE_DIRECTORY is None or not _CACHE_MAX_SIZE:
+        return
+
+    mirrors = sorted(_list_mirrors())
+    sizes = {}
+    for _, path in mirrors:
+        size = _read_size(path)
+        if size is None:
+            # Mirrors created before sizes were recorded are measured once.
+            size = _get_directory_size(path)
+            _write_size(path, size)
+        sizes[path] = size
+    total_size = sum(sizes.values())
+
+    for _, mirror_path in mirrors:
+        if total_size <= _CACHE_MAX_SIZE:
+            break
+
+        if mirror_path == keep:
+            continue
+
+        with open(f"{mirror_path}.lease", "a") as lease_file:
+            try:
+                fcntl.flock(lease_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                _LOGGER.debug("Mirror %s is in use, not evicting it", mirror_path)
+                continue
+
+            try:
+                # Lock files are kept so that jobs waiting on them keep locking the same file.
+                with _file_lock(f"{mirror_path}.lock"):
+                    _LOGGER.info(
+                        "Evicting mirror %s (%d bytes) from clone cache",
+                        mirror_path,
+                        sizes[mirror_path],
+                    )
+                    shutil.rmtree(mirror_path, ignore_errors=True)
+                    try:
+                        os.remove(f"{mirror_path}.size")
+                    except FileNotFoundError:
+                        pass
+            finally:
+                fcntl.flock(lease_file, fcntl.LOCK_UN)
+
+        total_size -= sizes[mirror_path]
+
+    if total_size > _CACHE_MAX_SIZE:
+        _LOGGER.warning(
+            "Clone cache size %d exceeds the configured limit %d, all the remaining mirrors are in use",
+            total_size,
+            _CACHE_MAX_SIZE,
+        )
+
+
+def update_mirror(
+    repo_url: str, service_host: str, slug: str, masked_repo_url: Optional[str] = None
+) -> str:
+    """Create or incrementally refresh the bare mirror of the given repository, return path to it.
+
+    The caller is expected to hold a lease on the mirror, see lease(). The repository URL (possibly carrying
+    an access token) is never stored in the mirror configuration, it is passed explicitly on each fetch.
+    Size of the mirror is recorded once it is refreshed so that eviction does not need to walk the cache.
+    """
+    mirror_path = get_mirror_path(service_host, slug)
+    os.makedirs(os.path.dirname(mirror_path), exist_ok=True)
+
+    # Serialize updates of the same mirror done by concurrent jobs.
+    with _file_lock(f"{mirror_path}.lock"):
+        if os.path.isdir(mirror_path):
+            mirror = git.Repo(mirror_path)
+        else:
+            _LOGGER.info("Creating mirror of %s in %s", slug, mirror_path)
+            mirror = git.Repo.init(mirror_path, bare=True)
+            # Clones borrow objects from the mirror, never drop them on an automatic gc.
+            mirror.git.config("gc.auto", "0")
+
+        _LOGGER.info(
+            "Fetching %s to mirror %s", masked_repo_url or repo_url, mirror_path
+        )
+        mirror.git.fetch(repo_url, *_MIRROR_REFSPECS, prune=True)
+        # Incremental fetches leave many small packs and loose objects behind, they are repacked once there are
+        # too many of them. Unreachable objects are pruned only after gc.pruneExpire (two weeks by default), far
+        # longer than any clone borrowing them exists. The gc runs in the foreground, under the lock.
+        mirror.git.execute(
+            [
+                "git",
+                "-c",
+                f"gc.auto={_GC_AUTO}",
+                "-c",
+                "gc.autoDetach=false",
+                "gc",
+                "--auto",
+                "--quiet",
+            ]
+        )
+        _write_size(mirror_path, _get_mirror_size(mirror))
+
+    evict(keep=mirror_path)
+    return mirror_path
@@ -0,0 +1,76 @@
+"""Tests for the clone cache."""
+
+import os
+
+import git
+import pytest
+
+from kebechet import clone_cache
+
+
+@pytest.fixture
+def source(tmp_path):
+    """Create a repository mirrored by tests."""
+    repo = git.Repo.init(tmp_path / "source")
+    (tmp_path / "source" / "README").write_text("Kebechet\n" * 1000)
+    repo.index.add(["README"])
+    repo.index.commit("Initial commit")
+    return str(tmp_path / "source")
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """Configure the clone cache in a temporary directory."""
+    monkeypatch.setattr(clone_cache, "_CACHE_DIRECTORY", str(tmp_path / "cache"))
+    return str(tmp_path / "cache")
+
+
+class TestCloneCache:
+    """Test mirrors are kept, measured and evicted."""
+
+    def test_size_recorded(self, source, cache):
+        """Test size of the mirror is recorded once it is fetched."""
+        with clone_cache.lease("localhost", "a/b"):
+            mirror_path = clone_cache.update_mirror(source, "localhost", "a/b")
+
+        size = clone_cache._read_size(mirror_path)
+        assert size is not None and size > 0
+        assert git.Repo(mirror_path).git.config("gc.auto") == "0"
+
+    def test_evict_recorded_sizes(self, source, cache, monkeypatch):
+        """Test least recently used mirrors are evicted based on recorded sizes, leased ones are kept."""
+        for slug in ("a/first", "a/second", "a/third"):
+            with clone_cache.lease("localhost", slug):
+                clone_cache.update_mirror(source, "localhost", slug)
+
+        first, second, third = (
+            clone_cache.get_mirror_path("localhost", slug)
+            for slug in ("a/first", "a/second", "a/third")
+        )
+        for age, mirror_path in enumerate((third, second, first)):
+            os.utime(f"{mirror_path}.lease", (1000 - age, 1000 - age))
+            clone_cache._write_size(mirror_path, 100)
+
+        def _walk(path):
+            raise AssertionError(f"Size of {path} is recorded, it is not walked")
+
+        monkeypatch.setattr(clone_cache, "_get_directory_size", _walk)
+        monkeypatch.setattr(clone_cache, "_CACHE_MAX_SIZE", 150)
+        with clone_cache.lease("localhost", "a/first"):
+            clone_cache.evict()
+
+        assert os.path.isdir(first)
+        assert not os.path.exists(second)
+        assert not os.path.exists(f"{second}.size")
+        assert not os.path.exists(third)
+
+    def test_evict_measures_unrecorded(self, source, cache, monkeypatch):
+        """Test mirrors without a recorded size are measured once."""
+        with clone_cache.lease("localhost", "a/b"):
+            mirror_path = clone_cache.update_mirror(source, "localhost", "a/b")
+        os.remove(f"{mirror_path}.size")
+
+        monkeypatch.setattr(clone_cache, "_CACHE_MAX_SIZE", 1024**3)
+        clone_cache.evict()
+
+        assert clone_cache._read_size(mirror_path) > 0
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# Kebechet
+# Copyright(C) 2022 Kevin Postlethwait
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Cache of Kebechet configuration files keyed by repository and commit the configuration was read from."""
+
+import copy
+import hashlib
+import io
+import logging
+import os
+import tempfile
+from collections import OrderedDict
+from typing import Optional
+
+from .config import _Config
+
+_LOGGER = logging.getLogger(__name__)
+
+_CACHE_DIRECTORY = os.getenv("KEBECHET_CONFIG_CACHE_DIRECTORY", None)
+# Number of parsed configuration files kept in memory of a long running process.
+_CACHE_SIZE = int(os.getenv("KEBECHET_CONFIG_CACHE_SIZE", 128))
+
+_CACHE: "OrderedDict[str, _Config]" = OrderedDict()
+
+
+def _get_key(service_host: str, slug: str, sha: str) -> str:
+    """Get cache key for the configuration of the given repository at the given commit."""
+    return hashlib.sha256(f"{service_host}/{slug}@{sha}".encode()).hexdigest()
+
+
+def get(service_host: str, slug: str, sha: str) -> Optional[_Config]:
+    """Get configuration of the given repository at the given commit if it is cached."""
+    key = _get_key(service_host, slug, sha)
+
+    config = _CACHE.get(key)
+    if config is None and _CACHE_DIRECTORY is not None:
+        try:
+            with open(os.path.join(_CACHE_DIRECTORY, key)) as config_file:
+                config = _Config.from_file(config_file)
+        except FileNotFoundError:
+            pass
+
+    if config is None:
+        return None
+
+    _LOGGER.debug("Using cached configuration of %r at %s", slug, sha)
+    _store(key, config)
+    # Configuration entries are adjusted by their consumers, cached configuration is never handed out.
+    return copy.deepcopy(config)
+
+
+def put(service_host: str, slug: str, sha: str, content: str) -> _Config:
+    """Parse and cache content of the configuration file of the given repository at the given commit."""
+    key = _get_key(service_host, slug, sha)
+    config = _Config.from_file(io.StringIO(content))
+
+    if _CACHE_DIRECTORY is not None:
+        os.makedirs(_CACHE_DIRECTORY, exist_ok=True)
+        # Write atomically, concurrent jobs can read the same entry.
+        with tempfile.NamedTemporaryFile(
+            "w", dir=_CACHE_DIRECTORY, delete=False
+        ) as config_file:
+            config_file.write(content)
+        os.replace(config_file.name, os.path.join(_CACHE_DIRECTORY, key))
+
+    _store(key, config)
+    return copy.deepcopy(config)
+
+
+def _store(key: str, config: _Config) -> None:
+    """Store parsed configuration in memory, the least recently used entries are dropped."""
+    _CACHE[key] = config
+    _CACHE.move_to_end(key)
+    while len(_CACHE) > _CACHE_SIZE:
+        _CACHE.popitem(last=False)
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# Kebechet
+# Copyright(C) 2022 Kevin Postlethwait
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Dependency graph of a project computed out of its Pipfile.lock and metadata of the locked packages.
+
+The graph is rendered in the format of `pipenv graph` without installing the locked environment. Requirements
+of locked packages are obtained from the JSON API of package indexes, graphs are cached by the lock file content.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+from packaging.requirements import InvalidRequirement, Requirement
+from packaging.utils import canonicalize_name
+
+from . import package_index
+
+_LOGGER = logging.getLogger(__name__)
+
+_CACHE_DIRECTORY = os.getenv("KEBECHET_PACKAGE_CACHE_DIRECTORY", None)
+# Number of rendered graphs kept in memory of a long running process.
+_CACHE_SIZE = int(os.getenv("KEBECHET_DEPENDENCY_GRAPH_CACHE_SIZE", 32))
+
+_CACHE: "OrderedDict[str, str]" = OrderedDict()
+
+
+class _LockedPackage:
+    """A package stated in Pipfile.lock."""
+
+    __slots__ = ("name", "version", "extras", "requirements")
+
+    def __init__(self, name: str, version: Optional[str], extras: List[str]) -> None:
+        """Create a locked package, requirements are resolved later."""
+        self.name = name
+        self.version = version
+        self.extras = extras
+        # Requirements on other locked packages as tuples of canonical name and version specifier.
+        self.requirements: List[Tuple[str, str]] = []
+
+
+def _get_locked_packages(lock: dict) -> Dict[str, _LockedPackage]:
+    """Get packages stated in default and develop sections of the lock, keyed by canonical name.
+
+    Raises ValueError if a section or an entry is malformed.
+    """
+    packages = {}
+    for section in ("default", "develop"):
+        entries = lock.get(section) or {}
+        if not isinstance(entries, dict):
+            raise ValueError(f"Section {section!r} of Pipfile.lock is not a mapping")
+
+        for name, entry in entries.items():
+            if not isinstance(entry, dict):
+                raise ValueError(
+                    f"Entry {name!r} in section {section!r} of Pipfile.lock is not a mapping"
+                )
+
+            version = entry.get("version")
+            if version is not None and not isinstance(version, str):
+                raise ValueError(
+                    f"Version of {name!r} in section {section!r} of Pipfile.lock is not a string"
+                )
+            packages[canonicalize_name(name)] = _LockedPackage(
+                name=name,
+                # Packages installed from VCS or a path are not pinned to a version.
+                version=version[2:] if version and version.startswith("==") else None,
+                extras=entry.get("extras") or [],
+            )
+    return packages
+
+
+def _resolve_requirements(
+    packages: Dict[str, _LockedPackage], index_urls: List[str]
+) -> bool:
+    """Fill in requirements of the locked packages on other locked packages.
+
+    Return False if requirements of any pinned package could not be obtained.
+    """
+    complete = True
+    all_requires_dist = package_index.get_all_requires_dist(
+        (
+            (package.name, package.version)
+            for package in packages.values()
+            if package.version
+        ),
+        index_urls=index_urls,
+    )
+
+    for package in packages.values():
+        requires_dist = all_requires_dist.get((package.name, package.version))  # type: ignore
+        if requires_dist is None:
+            if package.version:
+                _LOGGER.warning(
+                    "Unable to obtain requirements of %s==%s",
+                    package.name,
+                    package.version,
+                )
+                complete = False
+            continue
+
+        for requirement_str in requires_dist:
+            try:
+                requirement = Requirement(requirement_str)
+            except InvalidRequirement:
+                _LOGGER.debug(
+                    "Ignoring invalid requirement %r of %s",
+                    requirement_str,
+                    package.name,
+                )
+                continue
+
+            if requirement.marker is not None and not any(
+                requirement.marker.evaluate({"extra": extra})
+                for extra in ["", *package.extras]
+            ):
+                continue
+
+            name = canonicalize_name(requirement.name)
+            # Requirements not locked do not apply to the locked environment.
+            if name in packages and name != canonicalize_name(package.name):
+                package.requirements.append((name, str(requirement.specifier) or "Any"))
+
+    return complete
+
+
+def _render(packages: Dict[str, _LockedPackage]) -> str:
+    """Render the graph in the format of `pipenv graph`."""
+    required: Set[str] = {
+        name for package in packages.values() for name, _ in package.requirements
+    }
+    lines: List[str] = []
+    rendered: Set[str] = set()
+
+    def render_requirements(
+        package: _LockedPackage, depth: int, path: Set[str]
+    ) -> None:
+        for name, specifier in sorted(package.requirements):
+            requirement = packages[name]
+            lines.append(
+                f"{'  ' * depth}- {requirement.name} "
+                f"[required: {specifier}, installed: {requirement.version or '?'}]"
+            )
+            rendered.add(name)
+            if name not in path:
+                render_requirements(requirement, depth + 1, path | {name})
+
+    def render_root(name: str) -> None:
+        package = packages[name]
+        lines.append(f"{package.name}=={package.version or '?'}")
+        rendered.add(name)
+        render_requirements(package, 1, {name})
+
+    for name in sorted(packages):
+        if name not in required:
+            render_root(name)
+
+    # Packages required only within a cycle have no root, they are rendered on their own.
+    for name in sorted(packages):
+        if name not in rendered:
+            render_root(name)
+
+    return "\n".join(lines) + "\n"
+
+
+def get_dependency_graph(lock_path: str = "Pipfile.lock") -> str:
+    """Get dependency graph of the project with the given lock file.
+
+    Raises OSError if the lock file cannot be read and ValueError if it is not a valid lock file.
+    """
+    with open(lock_path) as lock_file:
+        content = lock_file.read()
+
+    key = hashlib.sha256(content.encode()).hexdigest()
+    graph = _CACHE.get(key)
+    if graph is None and _CACHE_DIRECTORY is not None:
+        try:
+            with open(
+                os.path.join(_CACHE_DIRECTORY, "dependency-graph", key)
+            ) as graph_file:
+                graph = graph_file.read()
+        except FileNotFoundError:
+            pass
+
+    if graph is None:
+        lock = json.loads(content)
+        if not isinstance(lock, dict):
+            raise ValueError(f"File {lock_path!r} is not a valid Pipfile.lock")
+
+        index_urls = [
+            source["url"] for source in (lock.get("_meta") or {}).get("sources") or []
+        ]
+        packages = _get_locked_packages(lock)
+        complete = _resolve_requirements(packages, index_urls)
+        graph = _render(packages)
+
+        if not complete:
+            # Requirements missing now can be obtained next time, the graph is not kept.
+            _LOGGER.debug("Dependency graph of lock file %s is incomplete", key)
+            return graph
+
+        if _CACHE_DIRECTORY is not None:
+            graph_directory = os.path.join(_CACHE_DIRECTORY, "dependency-graph")
+            os.makedirs(graph_directory, exist_ok=True)
+            # Write atomically, concurrent jobs can read the same entry.
+            with tempfile.NamedTemporaryFile(
+                "w", dir=graph_directory, delete=False
+            ) as graph_file:
+                graph_file.write(graph)
+            os.replace(graph_file.name, os.path.join(graph_directory, key))
+    else:
+        _LOGGER.debug("Using cached dependency graph of lock file %s", key)
+
+    _CACHE[key] = graph
+    _CACHE.move_to_end(key)
+    while len(_CACHE) > _CACHE_SIZE:
+        _CACHE.popitem(last=False)
+
+    return graph
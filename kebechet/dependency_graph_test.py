@@ -0,0 +1,90 @@
+"""Tests for dependency graphs computed out of Pipfile.lock."""
+
+import json
+
+import pytest
+
+from kebechet import dependency_graph
+from kebechet.managers.manager import ManagerBase
+
+_LOCK = {
+    "_meta": {"sources": [{"url": "https://pypi.org/simple"}]},
+    "default": {
+        "flask": {"version": "==2.1.0"},
+        "click": {"version": "==8.1.0"},
+    },
+    "develop": {},
+}
+
+
+class TestDependencyGraph:
+    """Test graphs are rendered and cached only when complete."""
+
+    @pytest.fixture(autouse=True)
+    def index(self, tmp_path, monkeypatch):
+        """Serve requirements from a dictionary instead of a package index, cache graphs in a temporary directory."""
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(dependency_graph, "_CACHE", dependency_graph.OrderedDict())
+        monkeypatch.setattr(dependency_graph, "_CACHE_DIRECTORY", str(tmp_path))
+        self.requires_dist = {
+            ("flask", "2.1.0"): ["click>=8.0"],
+            ("click", "8.1.0"): [],
+        }
+        self.requested = []
+
+        def get_all_requires_dist(releases, index_urls=None):
+            releases = list(releases)
+            self.requested.extend(releases)
+            return {release: self.requires_dist.get(release) for release in releases}
+
+        monkeypatch.setattr(
+            dependency_graph.package_index,
+            "get_all_requires_dist",
+            get_all_requires_dist,
+        )
+
+    @staticmethod
+    def _write_lock(lock: dict) -> None:
+        """Write the given Pipfile.lock into the working directory."""
+        with open("Pipfile.lock", "w") as lock_file:
+            json.dump(lock, lock_file)
+
+    def test_cached(self, tmp_path):
+        """Test a complete graph is rendered once and kept."""
+        self._write_lock(_LOCK)
+        graph = dependency_graph.get_dependency_graph()
+
+        assert graph == "flask==2.1.0\n  - click [required: >=8.0, installed: 8.1.0]\n"
+        assert dependency_graph.get_dependency_graph() == graph
+        assert len(self.requested) == 2
+        assert len(list((tmp_path / "dependency-graph").iterdir())) == 1
+
+    def test_incomplete_not_cached(self, tmp_path):
+        """Test a graph missing requirements of a package is not kept."""
+        del self.requires_dist[("flask", "2.1.0")]
+        self._write_lock(_LOCK)
+        dependency_graph.get_dependency_graph()
+
+        assert not (tmp_path / "dependency-graph").exists()
+        assert not dependency_graph._CACHE
+
+        self.requires_dist[("flask", "2.1.0")] = ["click>=8.0"]
+        assert "- click" in dependency_graph.get_dependency_graph()
+
+    @pytest.mark.parametrize(
+        "default",
+        [
+            {"flask": "==2.1.0"},
+            {"flask": {"version": 2}},
+            ["flask"],
+        ],
+    )
+    def test_malformed_reported(self, default):
+        """Test malformed entries are reported when the graph is obtained gracefully."""
+        self._write_lock({"default": default})
+
+        with pytest.raises(ValueError):
+            dependency_graph.get_dependency_graph()
+        assert ManagerBase.get_dependency_graph(graceful=True).startswith(
+            "Unable to obtain dependency graph"
+        )
@@ -17,7 +17,10 @@
 
 """Exceptions and errors that can be found in Kebechet."""
 
-from delegator import Command
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .subprocess_runner import CommandResult
 
 
 class KebechetException(Exception):
@@ -31,7 +34,7 @@ class ConfigurationError(KebechetException):
 class PipenvError(KebechetException):
     """Raised on missing/invalid Pipenv or Pipenv.lock file."""
 
-    def __init__(self, command: Command, *args, **kwargs):
+    def __init__(self, command: "CommandResult", *args, **kwargs):
         """Asssign values for exception so that they can be used in issue reports automatically."""
         self.command = command.cmd
         self.stdout = command.out
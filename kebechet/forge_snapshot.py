@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# Kebechet
+# Copyright(C) 2022 Kevin Postlethwait
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Issues, pull requests and metadata of a project obtained once and shared by managers run on the project."""
+
+import logging
+from collections import defaultdict
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from ogr.abstract import GitProject, Issue, IssueStatus, PRStatus, PullRequest
+
+from . import github_graphql
+from . import pagination
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class _Listing:
+    """Items of a paginated listing obtained so far, further pages are requested only when needed."""
+
+    def __init__(
+        self, iterator_factory: Callable[[], Iterator], key: Callable[[object], str]
+    ) -> None:
+        """Create an empty listing, the iterator is created on first use."""
+        self._iterator_factory = iterator_factory
+        self._iterator: Optional[Iterator] = None
+        self._complete = False
+        self._key = key
+        self.items: List = []
+        self.index: Dict[str, List] = defaultdict(list)
+        self._ids: Set[int] = set()
+
+    def add(self, item) -> None:
+        """Add an item to the listing, items already present are ignored."""
+        # Pages shift if items are created while listing, the same item can be listed twice.
+        if item.id in self._ids:
+            return
+        self._ids.add(item.id)
+        self.items.append(item)
+        self.index[self._key(item)].append(item)
+
+    def __iter__(self) -> Iterator:
+        """Iterate over the items, request further pages once the items obtained so far are consumed."""
+        position = 0
+        while True:
+            if position < len(self.items):
+                yield self.items[position]
+                position += 1
+                continue
+
+            if self._complete:
+                return
+
+            if self._iterator is None:
+                self._iterator = self._iterator_factory()
+
+            try:
+                self.add(next(self._iterator))
+            except StopIteration:
+                self._complete = True
+                self._iterator = None
+
+
+class ForgeSnapshot:
+    """Run-scoped view of a project, listings are obtained lazily and indexed for lookups.
+
+    Lookups by title match titles in the issue listing, lookups by branch use filters of the forge. Both stop
+    requesting pages once a match is found, their results are kept for the rest of the run. Issues and pull
+    requests created through the snapshot are added to it. Issues closed during the run are not reported as open
+    as their status is kept by the issue objects handed out. Pull requests closed during the run have to be
+    discarded explicitly, obtaining their status costs an API call on GitHub.
+
+    If enabled for GitHub, open issues with their comments and open pull requests are obtained in batched GraphQL
+    queries instead, lookups are then answered from the batch (see kebechet.github_graphql).
+    """
+
+    def __init__(self, project: GitProject) -> None:
+        """Create an empty snapshot of the given project."""
+        self.project = project
+        self._default_branch: Optional[str] = None
+        self._batch = (
+            github_graphql.Batch(project)  # type: ignore
+            if github_graphql.is_enabled(project)
+            else None
+        )
+        self._issues = self._create_issue_listing()
+        # Listings of pull requests keyed by status and source branch, None stands for all the branches.
+        self._pull_requests: Dict[Tuple[PRStatus, Optional[str]], _Listing] = {}
+        self._discarded_pull_requests: Set[int] = set()
+
+    def _create_issue_listing(self) -> _Listing:
+        """Create listing of open issues of the project."""
+        if self._batch is not None:
+            batch = self._batch
+            return _Listing(
+                lambda: iter(batch.get_issues()),
+                key=lambda issue: issue.title,  # type: ignore
+            )
+
+        return _Listing(
+            lambda: pagination.iter_issues(self.project),
+            key=lambda issue: issue.title,  # type: ignore
+        )
+
+    def _get_pull_request_listing(
+        self, status: PRStatus, branch: Optional[str] = None
+    ) -> _Listing:
+        """Get listing of pull requests in the given status, optionally only those from the given branch."""
+        key = (status, branch)
+        if key in self._pull_requests:
+            return self._pull_requests[key]
+
+        if self._batch is not None and status == PRStatus.open:
+            batch = self._batch
+            self._pull_requests[key] = _Listing(
+                lambda: (
+                    pr
+                    for pr in batch.get_pull_requests()
+                    if branch is None or pr.source_branch == branch
+                ),
+                key=lambda pr: pr.source_branch,  # type: ignore
+            )
+        else:
+            self._pull_requests[key] = _Listing(
+                lambda: pagination.iter_pull_requests(
+                    self.project, status=status, branch=branch
+                ),
+                key=lambda pr: pr.source_branch,  # type: ignore
+            )
+        return self._pull_requests[key]
+
+    def _is_open(self, pull_request: PullRequest, status: PRStatus) -> bool:
+        """Check whether a pull request listed in the given status was not closed during the run."""
+        return (
+            status != PRStatus.open
+            or pull_request.id not in self._discarded_pull_requests
+        )
+
+    @property
+    def default_branch(self) -> str:
+        """Get default branch of the project."""
+        if self._default_branch is None:
+            self._default_branch = self.project.default_branch
+        return self._default_branch
+
+    def get_issue_list(self) -> List[Issue]:
+        """Get open issues of the project."""
+        return [issue for issue in self._issues if issue.status == IssueStatus.open]
+
+    def get_issue_by_title(self, title: str) -> Optional[Issue]:
+        """Get an open issue with the given title, the newest one if there are more."""
+        for issue in self._issues.index.get(title, []):
+            if issue.status == IssueStatus.open:
+                return issue
+
+        # The listing is requested lazily, it stops once a match is found. Listings are shared by all the lookups
+        # of the run, unlike searches they cost no requests against the search rate limit.
+        for issue in self._issues:
+            if issue.title == title and issue.status == IssueStatus.open:
+                return issue
+
+        return None
+
+    def get_pr_list(self, status: PRStatus = PRStatus.open) -> List[PullRequest]:
+        """Get pull requests of the project in the given status."""
+        return [
+            pr
+            for pr in self._get_pull_request_listing(status)
+            if self._is_open(pr, status)
+        ]
+
+    def get_prs_by_branch(
+        self,
+        branch: str,
+        status: PRStatus = PRStatus.open,
+        limit: Optional[int] = None,
+    ) -> List[PullRequest]:
+        """Get pull requests in the given status which are using the given source branch.
+
+        If limit is given, listing stops once the given number of pull requests is found.
+        """
+        result = []
+        for pr in self._get_pull_request_listing(status, branch):
+            if pr.source_branch == branch and self._is_open(pr, status):
+                result.append(pr)
+                if limit is not None and len(result) >= limit:
+                    break
+        return result
+
+    def create_issue(self, title: str, body: str, **kwargs) -> Issue:
+        """Create an issue in the project and add it to the snapshot."""
+        issue = self.project.create_issue(title=title, body=body, **kwargs)
+        self._issues.add(issue)
+        return issue
+
+    def add_pull_request(self, pull_request: PullRequest) -> None:
+        """Add a pull request opened during the run to the snapshot."""
+        for status, branch in self._pull_requests:
+            if status in (PRStatus.open, PRStatus.all) and branch in (
+                None,
+                pull_request.source_branch,
+            ):
+                self._pull_requests[(status, branch)].add(pull_request)
+
+    def discard_pull_request(self, pull_request: PullRequest) -> None:
+        """Do not report a pull request closed during the run as open."""
+        self._discarded_pull_requests.add(pull_request.id)
+
+    def invalidate(self) -> None:
+        """Drop all the data obtained, they are obtained again on next use."""
+        self._default_branch = None
+        if self._batch is not None:
+            self._batch = github_graphql.Batch(self.project)  # type: ignore
+        self._issues = self._create_issue_listing()
+        self._pull_requests = {}
+        self._discarded_pull_requests = set()
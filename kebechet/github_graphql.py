@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+# Kebechet
+# Copyright(C) 2022 Kevin Postlethwait
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Batched retrieval of open issues with their comments and open pull requests of a GitHub project.
+
+Listing issues and pull requests over REST costs a request per page, listing comments of each issue costs another
+request per issue. A single GraphQL query obtains all of them. Issues and pull requests are handed out as objects
+which answer what the query obtained (title, author, labels, comments, ...) from its data; anything else, including
+changes such as comments or closing, is done by the ogr object requested on first such use. The batch is used only
+when enabled by KEBECHET_GITHUB_GRAPHQL.
+"""
+
+import logging
+import os
+import re
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import requests
+from github import GithubException, RateLimitExceededException
+from ogr.abstract import GitProject, Issue, IssueStatus, PRStatus, PullRequest
+from ogr.exceptions import IssueTrackerDisabled
+from ogr.services.github import GithubProject
+
+_LOGGER = logging.getLogger(__name__)
+
+_ENABLED = bool(int(os.getenv("KEBECHET_GITHUB_GRAPHQL", 0)))
+# Number of issues (pull requests) obtained in a single query, each issue carries up to 100 comments.
+_PAGE_SIZE = int(os.getenv("KEBECHET_GITHUB_GRAPHQL_PAGE_SIZE", 50))
+_URL = os.getenv("KEBECHET_GITHUB_GRAPHQL_URL", "https://api.github.com/graphql")
+_TIMEOUT = float(os.getenv("KEBECHET_GITHUB_GRAPHQL_TIMEOUT", 30))
+
+_ACTOR_FIELDS = "author { __typename login }"
+_LABEL_FIELDS = "labels(first: 50) { nodes { name color description } }"
+
+_QUERY = f"""
+query(
+  $owner: String!, $name: String!, $pageSize: Int!,
+  $issuesCursor: String, $pullRequestsCursor: String,
+  $withIssues: Boolean!, $withPullRequests: Boolean!
+) {{
+  repository(owner: $owner, name: $name) {{
+    issues(
+      first: $pageSize, after: $issuesCursor, states: OPEN,
+      orderBy: {{field: CREATED_AT, direction: DESC}}
+    ) @include(if: $withIssues) {{
+      pageInfo {{ hasNextPage endCursor }}
+      nodes {{
+        number title body state createdAt url {_ACTOR_FIELDS} {_LABEL_FIELDS}
+        comments(first: 100) {{
+          totalCount
+          nodes {{ databaseId body createdAt updatedAt url {_ACTOR_FIELDS} }}
+        }}
+      }}
+    }}
+    pullRequests(
+      first: $pageSize, after: $pullRequestsCursor, states: OPEN,
+      orderBy: {{field: CREATED_AT, direction: DESC}}
+    ) @include(if: $withPullRequests) {{
+      pageInfo {{ hasNextPage endCursor }}
+      nodes {{
+        number title body state merged createdAt url {_ACTOR_FIELDS} {_LABEL_FIELDS}
+        headRefName headRefOid baseRefName
+      }}
+    }}
+  }}
+}}
+"""
+
+
+def is_enabled(project: GitProject) -> bool:
+    """Check whether issues and pull requests of the given project are obtained in a batch."""
+    return _ENABLED and isinstance(project, GithubProject)
+
+
+def _get_login(node: Dict[str, Any]) -> str:
+    """Get login of the author of the given node, as reported by the REST API."""
+    author = node.get("author")
+    if author is None:
+        # Accounts which were deleted are reported as the ghost user.
+        return "ghost"
+
+    # REST API reports apps with a suffix.
+    if author["__typename"] == "Bot":
+        return f"{author['login']}[bot]"
+
+    return author["login"]
+
+
+def _get_datetime(value: str) -> datetime:
+    """Parse a timestamp reported by GitHub, naive UTC datetime is returned as PyGithub does."""
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ")
+
+
+class Label(NamedTuple):
+    """Label of an issue or a pull request."""
+
+    name: str
+    color: str
+    description: Optional[str]
+
+
+class Comment(NamedTuple):
+    """Comment of an issue."""
+
+    id: int
+    body: str
+    author: str
+    created: datetime
+    edited: datetime
+
+
+def _get_labels(node: Dict[str, Any]) -> List[Label]:
+    """Get labels of the given node."""
+    return [
+        Label(label["name"], label["color"], label["description"])
+        for label in node["labels"]["nodes"]
+    ]
+
+
+class _BatchedObject:
+    """Issue or pull request obtained in the batch, what the batch did not obtain is delegated to ogr."""
+
+    def __init__(self, project: GithubProject, node: Dict[str, Any]) -> None:
+        """Create the object out of the given GraphQL node."""
+        self.project = project
+        self._node = node
+        self._object: Any = None
+
+    def _request_object(self) -> Any:
+        """Request the ogr object."""
+        raise NotImplementedError
+
+    def _get_object(self) -> Any:
+        """Get the ogr object, it is requested on first use."""
+        if self._object is None:
+            _LOGGER.debug("Requesting %s %d", type(self).__name__, self.id)
+            self._object = self._request_object()
+        return self._object
+
+    def __getattr__(self, name: str) -> Any:
+        """Delegate to the ogr object anything the batch did not obtain."""
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._get_object(), name)
+
+    @property
+    def id(self) -> int:
+        return self._node["number"]
+
+    @property
+    def title(self) -> str:
+        return self._node["title"]
+
+    @property
+    def description(self) -> str:
+        return self._node["body"]
+
+    @property
+    def author(self) -> str:
+        return _get_login(self._node)
+
+    @property
+    def url(self) -> str:
+        return self._node["url"]
+
+    @property
+    def created(self) -> datetime:
+        return _get_datetime(self._node["createdAt"])
+
+    @property
+    def labels(self) -> List[Label]:
+        """Get labels the object had when the batch was obtained."""
+        return _get_labels(self._node)
+
+
+class BatchedIssue(_BatchedObject):
+    """Issue obtained in the batch together with its comments, unless it has too many of them."""
+
+    def __init__(self, project: GithubProject, node: Dict[str, Any]) -> None:
+        """Create the issue, comments are kept if the batch carried all of them."""
+        super().__init__(project, node)
+        comments = node["comments"]
+        self._comments: Optional[List[Comment]] = None
+        if comments["totalCount"] <= len(comments["nodes"]):
+            self._comments = [
+                Comment(
+                    comment["databaseId"],
+                    comment["body"],
+                    _get_login(comment),
+                    _get_datetime(comment["createdAt"]),
+                    _get_datetime(comment["updatedAt"]),
+                )
+                for comment in comments["nodes"]
+            ]
+
+    def _request_object(self) -> Issue:
+        return self.project.get_issue(self.id)
+
+    @property
+    def status(self) -> IssueStatus:
+        # Issues closed during the run are closed through the ogr object, it knows their status.
+        if self._object is not None:
+            return self._object.status
+        return IssueStatus[self._node["state"].lower()]
+
+    def get_comments(
+        self,
+        filter_regex: Optional[str] = None,
+        reverse: bool = False,
+        author: Optional[str] = None,
+    ) -> List[Any]:
+        """Get comments of the issue, they are requested only if the batch did not carry all of them."""
+        if self._comments is None:
+            return list(
+                self._get_object().get_comments(
+                    filter_regex=filter_regex, reverse=reverse, author=author
+                )
+            )
+
+        comments = list(reversed(self._comments) if reverse else self._comments)
+        if filter_regex is not None:
+            pattern = re.compile(filter_regex)
+            comments = [c for c in comments if pattern.search(c.body)]
+        if author is not None:
+            comments = [c for c in comments if c.author == author]
+        return comments
+
+    def comment(self, body: str) -> Any:
+        """Comment on the issue, the comment is added to the comments obtained in the batch."""
+        comment = self._get_object().comment(body)
+        if self._comments is not None:
+            self._comments.append(
+                Comment(
+                    comment.id, body, comment.author, comment.created, comment.edited
+                )
+            )
+        return comment
+
+
+class BatchedPullRequest(_BatchedObject):
+    """Pull request obtained in the batch."""
+
+    def _request_object(self) -> PullRequest:
+        return self.project.get_pr(self.id)
+
+    @property
+    def status(self) -> PRStatus:
+        # Pull requests closed during the run are discarded by the snapshot, their status is not checked again.
+        if self._node["merged"]:
+            return PRStatus.merged
+        return PRStatus[self._node["state"].lower()]
+
+    @property
+    def source_branch(self) -> str:
+        return self._node["headRefName"]
+
+    @property
+    def target_branch(self) -> str:
+        return self._node["baseRefName"]
+
+    @property
+    def head_commit(self) -> str:
+        return self._node["headRefOid"]
+
+
+def _query(project: GithubProject, variables: Dict[str, Any]) -> Dict[str, Any]:
+    """Issue the query with the given variables, return data it obtained."""
+    token = project.service.authentication.get_token(project.namespace, project.repo)
+    response = requests.post(
+        _URL,
+        json={"query": _QUERY, "variables": variables},
+        headers={"Authorization": f"bearer {token}"} if token else {},
+        timeout=_TIMEOUT,
+    )
+    try:
+        data = response.json()
+    except ValueError:
+        data = {"message": response.text}
+
+    if response.status_code in (403, 429) and (
+        response.headers.get("X-RateLimit-Remaining") == "0"
+        or "Retry-After" in response.headers
+    ):
+        raise RateLimitExceededException(
+            response.status_code, data, dict(response.headers)
+        )
+    if response.status_code != 200 or data.get("errors"):
+        raise GithubException(response.status_code, data, dict(response.headers))
+
+    return data["data"]
+
+
+class Batch:
+    """Open issues and open pull requests of a GitHub project obtained in batched GraphQL queries."""
+
+    def __init__(self, project: GithubProject) -> None:
+        """Create an empty batch, queries are issued on first use."""
+        self.project = project
+        self._issues: Optional[List[BatchedIssue]] = None
+        self._pull_requests: Optional[List[BatchedPullRequest]] = None
+
+    def _fetch(self) -> None:
+        """Obtain all the open issues and pull requests, both are paginated in the same queries."""
+        issues: List[BatchedIssue] = []
+        pull_requests: List[BatchedPullRequest] = []
+        cursors: Dict[str, Tuple[bool, Optional[str]]] = {
+            "issues": (self.project.has_issues, None),
+            "pullRequests": (True, None),
+        }
+
+        queries = 0
+        while any(has_next for has_next, _ in cursors.values()):
+            data = _query(
+                self.project,
+                {
+                    "owner": self.project.namespace,
+                    "name": self.project.repo,
+                    "pageSize": _PAGE_SIZE,
+                    "issuesCursor": cursors["issues"][1],
+                    "pullRequestsCursor": cursors["pullRequests"][1],
+                    "withIssues": cursors["issues"][0],
+                    "withPullRequests": cursors["pullRequests"][0],
+                },
+            )
+            queries += 1
+            repository = data["repository"]
+            for field, has_next in list(cursors.items()):
+                if not has_next[0]:
+                    continue
+
+                connection = repository[field]
+                for node in connection["nodes"]:
+                    if field == "issues":
+                        issues.append(BatchedIssue(self.project, node))
+                    else:
+                        pull_requests.append(BatchedPullRequest(self.project, node))
+
+                page_info = connection["pageInfo"]
+                cursors[field] = (page_info["hasNextPage"], page_info["endCursor"])
+
+        _LOGGER.debug(
+            "Obtained %d issues and %d pull requests of %s/%s in %d GraphQL queries",
+            len(issues),
+            len(pull_requests),
+            self.project.namespace,
+            self.project.repo,
+            queries,
+        )
+        self._issues = issues
+        self._pull_requests = pull_requests
+
+    def get_issues(self) -> List[BatchedIssue]:
+        """Get open issues of the project, newest first."""
+        if not self.project.has_issues:
+            raise IssueTrackerDisabled()
+
+        if self._issues is None:
+            self._fetch()
+        return self._issues  # type: ignore
+
+    def get_pull_requests(self) -> List[BatchedPullRequest]:
+        """Get open pull requests of the project, newest first."""
+        if self._pull_requests is None:
+            self._fetch()
+        return self._pull_requests  # type: ignore
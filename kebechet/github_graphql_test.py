@@ -0,0 +1,222 @@
+"""Tests for batched retrieval of issues and pull requests over GraphQL."""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import github
+import pytest
+from ogr.abstract import IssueStatus, PRStatus
+from ogr.services.github import GithubService
+
+from kebechet import github_graphql
+
+_AUTHOR = {"__typename": "User", "login": "fridex"}
+_BOT = {"__typename": "Bot", "login": "khebhut"}
+_NO_LABELS = {"nodes": []}
+
+
+def _graphql_data(with_issues: bool, with_pull_requests: bool) -> dict:
+    """Get data of a repository with an issue carrying all its comments and a pull request."""
+    repository = {}
+    if with_issues:
+        repository["issues"] = {
+            "pageInfo": {"hasNextPage": False, "endCursor": None},
+            "nodes": [
+                {
+                    "number": 7,
+                    "title": "Automatic update of dependencies failed",
+                    "body": "Pipenv failed",
+                    "state": "OPEN",
+                    "createdAt": "2023-01-02T03:04:05Z",
+                    "url": "https://github.com/thoth-station/kebechet/issues/7",
+                    "author": _BOT,
+                    "labels": {
+                        "nodes": [
+                            {"name": "bot", "color": "ededed", "description": None}
+                        ]
+                    },
+                    "comments": {
+                        "totalCount": 2,
+                        "nodes": [
+                            {
+                                "databaseId": 1,
+                                "body": "Still failing at abc",
+                                "createdAt": "2023-01-03T00:00:00Z",
+                                "updatedAt": "2023-01-03T00:00:00Z",
+                                "url": "https://github.com/thoth-station/kebechet/issues/7#1",
+                                "author": _BOT,
+                            },
+                            {
+                                "databaseId": 2,
+                                "body": "Thanks",
+                                "createdAt": "2023-01-04T00:00:00Z",
+                                "updatedAt": "2023-01-04T00:00:00Z",
+                                "url": "https://github.com/thoth-station/kebechet/issues/7#2",
+                                "author": None,
+                            },
+                        ],
+                    },
+                }
+            ],
+        }
+    if with_pull_requests:
+        repository["pullRequests"] = {
+            "pageInfo": {"hasNextPage": False, "endCursor": None},
+            "nodes": [
+                {
+                    "number": 8,
+                    "title": "Release of version 1.0.0",
+                    "body": "Hey!",
+                    "state": "OPEN",
+                    "merged": False,
+                    "createdAt": "2023-01-02T03:04:05Z",
+                    "url": "https://github.com/thoth-station/kebechet/pull/8",
+                    "author": _AUTHOR,
+                    "labels": _NO_LABELS,
+                    "headRefName": "v1.0.0",
+                    "headRefOid": "abc",
+                    "baseRefName": "master",
+                }
+            ],
+        }
+    return {"data": {"repository": repository}}
+
+
+class _GithubHandler(BaseHTTPRequestHandler):
+    """Answer GraphQL queries and the REST requests ogr issues on delegation."""
+
+    def _send(self, body: dict, status: int = 200) -> None:
+        """Send a JSON response."""
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self) -> None:  # noqa: N802
+        """Serve the repository and its issue."""
+        self.server.requests.append(("GET", self.path, None))  # type: ignore
+        if self.path == "/repos/thoth-station/kebechet":
+            self._send(
+                {
+                    "id": 1,
+                    "name": "kebechet",
+                    "full_name": "thoth-station/kebechet",
+                    "owner": {"login": "thoth-station"},
+                    "url": f"{self.server.url}/repos/thoth-station/kebechet",  # type: ignore
+                    "has_issues": True,
+                }
+            )
+        elif self.path == "/repos/thoth-station/kebechet/issues/7":
+            self._send(
+                {
+                    "number": 7,
+                    "state": "open",
+                    "url": f"{self.server.url}/repos/thoth-station/kebechet/issues/7",  # type: ignore
+                }
+            )
+        else:
+            self._send({"message": "Not Found"}, 404)
+
+    def do_POST(self) -> None:  # noqa: N802
+        """Answer the query and create comments."""
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append(("POST", self.path, body))  # type: ignore
+        if self.path == "/graphql":
+            variables = body["variables"]
+            self._send(
+                _graphql_data(variables["withIssues"], variables["withPullRequests"])
+            )
+        elif self.path == "/repos/thoth-station/kebechet/issues/7/comments":
+            self._send(
+                {
+                    "id": 3,
+                    "body": body["body"],
+                    "user": {"login": "khebhut[bot]"},
+                    "created_at": "2023-01-05T00:00:00Z",
+                    "updated_at": "2023-01-05T00:00:00Z",
+                },
+                201,
+            )
+        else:
+            self._send({"message": "Not Found"}, 404)
+
+    def log_message(self, *_) -> None:
+        """Keep the test output clean."""
+
+
+@pytest.fixture
+def batch(monkeypatch):
+    """Get a batch of a project whose clients talk to a local server instead of GitHub."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _GithubHandler)
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"  # type: ignore
+    server.requests = []  # type: ignore
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(github_graphql, "_URL", f"{server.url}/graphql")  # type: ignore
+    project = GithubService(token="token").get_project(
+        namespace="thoth-station", repo="kebechet"
+    )
+    project._github_instance = github.Github("token", base_url=server.url)  # type: ignore
+    yield github_graphql.Batch(project), server.requests  # type: ignore
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+class TestBatch:
+    """Test issues and pull requests are answered from the batch."""
+
+    def test_issues(self, batch):
+        """Test issues with comments and labels are obtained in a single query."""
+        batch, requests = batch
+        (issue,) = batch.get_issues()
+        (pull_request,) = batch.get_pull_requests()
+
+        assert [r[1] for r in requests] == ["/repos/thoth-station/kebechet", "/graphql"]
+        assert requests[1][2]["variables"]["withIssues"] is True
+        assert issue.id == 7
+        assert issue.title == "Automatic update of dependencies failed"
+        assert issue.author == "khebhut[bot]"
+        assert issue.status == IssueStatus.open
+        assert issue.created.year == 2023
+        assert [label.name for label in issue.labels] == ["bot"]
+        assert [c.body for c in issue.get_comments()] == [
+            "Still failing at abc",
+            "Thanks",
+        ]
+        assert [c.author for c in issue.get_comments(reverse=True)] == [
+            "ghost",
+            "khebhut[bot]",
+        ]
+        assert len(issue.get_comments(filter_regex="abc", author="khebhut[bot]")) == 1
+
+        assert pull_request.id == 8
+        assert pull_request.status == PRStatus.open
+        assert pull_request.source_branch == "v1.0.0"
+        assert pull_request.target_branch == "master"
+        assert pull_request.labels == []
+        assert len(requests) == 2
+
+    def test_comment_delegated(self, batch):
+        """Test changes are done through the ogr issue, the comment is added to the batch."""
+        batch, requests = batch
+        (issue,) = batch.get_issues()
+        issue.comment("Still failing at def")
+
+        assert requests[-1][:2] == (
+            "POST",
+            "/repos/thoth-station/kebechet/issues/7/comments",
+        )
+        assert [c.body for c in issue.get_comments()][-1] == "Still failing at def"
+
+    def test_errors(self, batch, monkeypatch):
+        """Test errors reported by GraphQL are raised."""
+        batch, _ = batch
+        monkeypatch.setattr(
+            github_graphql, "_URL", github_graphql._URL.replace("graphql", "missing")
+        )
+        with pytest.raises(github.GithubException):
+            batch.get_pull_requests()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# Kebechet
+# Copyright(C) 2022 Kevin Postlethwait
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Cache of responses of Python package indexes shared by all the managers and processes on a node.
+
+Responses are stored in an SQLite database in the package cache directory, the database is memory mapped
+so that lookups done by concurrent workers are served from the page cache. Entries are used for a TTL,
+afterwards they are revalidated using ETag and Last-Modified headers the index sent with them.
+"""
+
+import atexit
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Dict, NamedTuple, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+_LOGGER = logging.getLogger(__name__)
+
+_CACHE_DIRECTORY = os.getenv("KEBECHET_PACKAGE_CACHE_DIRECTORY", None)
+# Entries older than this many seconds are revalidated with the index before they are used.
+_TTL = float(os.getenv("KEBECHET_PACKAGE_CACHE_TTL", 600))
+# Projects and releases missing on the index can be published any time, negative entries are kept at most this long.
+_NOT_FOUND_TTL = float(os.getenv("KEBECHET_PACKAGE_CACHE_NOT_FOUND_TTL", 60))
+# Size of the memory mapped part of the database in bytes.
+_MMAP_SIZE = int(os.getenv("KEBECHET_PACKAGE_CACHE_MMAP_SIZE", 256 * 1024 * 1024))
+_TIMEOUT = float(os.getenv("KEBECHET_PACKAGE_INDEX_TIMEOUT", 10))
+
+# Only responses stating the state of a project are kept, anything else is retried next time.
+_CACHED_STATUS_CODES = frozenset((200, 404))
+# Headers the callers rely on, other headers are not stored.
+_STORED_HEADERS = ("Content-Type", "X-PyPI-Last-Serial")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    fetched REAL NOT NULL,
+    status_code INTEGER NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    headers TEXT NOT NULL,
+    content BLOB NOT NULL
+)
+"""
+
+_CONNECTIONS = threading.local()
+
+
+class Response(NamedTuple):
+    """A response of a package index, possibly served from the cache."""
+
+    status_code: int
+    headers: CaseInsensitiveDict
+    content: bytes
+
+    @property
+    def text(self) -> str:
+        """Get content of the response decoded."""
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self) -> Any:
+        """Get content of the response parsed as JSON."""
+        return json.loads(self.content)
+
+
+def share_across_processes() -> None:
+    """Make sure the cache is shared with processes forked from now on.
+
+    If no cache directory is configured, a private temporary one is created and removed when this process exits.
+    """
+    global _CACHE_DIRECTORY
+
+    if _CACHE_DIRECTORY is not None:
+        return
+
+    _CACHE_DIRECTORY = tempfile.mkdtemp(prefix="kebechet-packages-")
+    pid = os.getpid()
+
+    def _cleanup() -> None:
+        # Forked processes inherit exit handlers, only the creator removes the directory.
+        if os.getpid() == pid:
+            shutil.rmtree(_CACHE_DIRECTORY, ignore_errors=True)  # type: ignore
+
+    atexit.register(_cleanup)
+
+
+def _get_connection() -> sqlite3.Connection:
+    """Get connection to the cache database, connections are not shared across threads and processes."""
+    connection = getattr(_CONNECTIONS, "connection", None)
+    if connection is not None and _CONNECTIONS.pid == os.getpid():
+        return connection
+
+    share_across_processes()
+    os.makedirs(_CACHE_DIRECTORY, exist_ok=True)  # type: ignore
+    connection = sqlite3.connect(
+        os.path.join(_CACHE_DIRECTORY, "index.sqlite"),  # type: ignore
+        timeout=_TIMEOUT,
+        isolation_level=None,
+    )
+    # Readers do not block the writer and the other way round.
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute(f"PRAGMA mmap_size={_MMAP_SIZE:d}")
+    connection.execute(_SCHEMA)
+
+    _CONNECTIONS.connection = connection
+    _CONNECTIONS.pid = os.getpid()
+    return connection
+
+
+def _load(key: str) -> Optional[Dict[str, Any]]:
+    """Load the entry with the given key."""
+    try:
+        row = (
+            _get_connection()
+            .execute(
+                "SELECT fetched, status_code, etag, last_modified, headers, content FROM responses WHERE key = ?",
+                (key,),
+            )
+            .fetchone()
+        )
+    except sqlite3.Error as exc:
+        _LOGGER.warning("Failed to read package index cache: %s", str(exc))
+        return None
+
+    if row is None:
+        return None
+
+    fetched, status_code, etag, last_modified, headers, content = row
+    return {
+        "fetched": fetched,
+        "etag": etag,
+        "last_modified": last_modified,
+        "response": Response(
+            status_code, CaseInsensitiveDict(json.loads(headers)), content
+        ),
+    }
+
+
+def _store(key: str, response: Response) -> None:
+    """Store the given response under the given key."""
+    try:
+        _get_connection().execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                key,
+                time.time(),
+                response.status_code,
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified"),
+                json.dumps(
+                    {
+                        h: response.headers[h]
+                        for h in _STORED_HEADERS
+                        if h in response.headers
+                    }
+                ),
+                response.content,
+            ),
+        )
+    except sqlite3.Error as exc:
+        _LOGGER.warning("Failed to write package index cache: %s", str(exc))
+
+
+def _touch(key: str) -> None:
+    """Mark the entry with the given key as fresh."""
+    try:
+        _get_connection().execute(
+            "UPDATE responses SET fetched = ? WHERE key = ?", (time.time(), key)
+        )
+    except sqlite3.Error as exc:
+        _LOGGER.warning("Failed to write package index cache: %s", str(exc))
+
+
+def request(
+    method: str,
+    url: str,
+    headers: Optional[Dict[str, str]] = None,
+    ttl: Optional[float] = None,
+) -> Response:
+    """Issue the given request to a package index unless a fresh response is cached.
+
+    Entries older than ttl seconds (the configured TTL by default) are revalidated, entries of missing projects
+    and releases are revalidated once they are older than the not found TTL at the latest. If the index cannot be
+    reached, a stale entry is used if present, otherwise requests.RequestException is raised.
+    """
+    headers = dict(headers or {})
+    key = f"{method} {url} {headers.get('Accept', '')}"
+    ttl = _TTL if ttl is None else ttl
+
+    entry = _load(key)
+    if entry is not None:
+        if entry["response"].status_code != 200:
+            ttl = min(ttl, _NOT_FOUND_TTL)
+        if time.time() - entry["fetched"] < ttl:
+            return entry["response"]
+
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    try:
+        raw_response = requests.request(
+            method, url, headers=headers, timeout=_TIMEOUT, allow_redirects=True
+        )
+    except requests.RequestException as exc:
+        if entry is None:
+            raise
+
+        _LOGGER.debug("Using stale response of %s %s: %s", method, url, str(exc))
+        return entry["response"]
+
+    if raw_response.status_code == 304 and entry is not None:
+        _touch(key)
+        return entry["response"]
+
+    response = Response(
+        raw_response.status_code,
+        CaseInsensitiveDict(raw_response.headers),
+        raw_response.content,
+    )
+    if response.status_code in _CACHED_STATUS_CODES:
+        _store(key, response)
+    elif entry is not None:
+        _LOGGER.debug(
+            "Using stale response of %s %s: HTTP %d",
+            method,
+            url,
+            response.status_code,
+        )
+        return entry["response"]
+
+    return response
+
+
+def get(
+    url: str, headers: Optional[Dict[str, str]] = None, ttl: Optional[float] = None
+) -> Response:
+    """Issue a GET request to a package index unless a fresh response is cached."""
+    return request("GET", url, headers=headers, ttl=ttl)
+
+
+def head(url: str, ttl: Optional[float] = None) -> Response:
+    """Issue a HEAD request to a package index unless a fresh response is cached."""
+    return request("HEAD", url, ttl=ttl)
@@ -0,0 +1,144 @@
+"""Tests for the cache of package index responses."""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from kebechet import index_cache
+
+_ETAG = '"v1"'
+
+
+class _IndexHandler(BaseHTTPRequestHandler):
+    """Serve a project page with an ETag, conditional requests are answered with 304."""
+
+    def do_GET(self) -> None:  # noqa: N802
+        """Serve the page and record the request."""
+        self.server.requests.append(dict(self.headers))  # type: ignore
+        if self.path == "/missing/":
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if self.path == "/error/" and len(self.server.requests) > 1:  # type: ignore
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if self.headers.get("If-None-Match") == _ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        content = b'<a href="six-1.16.0.tar.gz">six-1.16.0.tar.gz</a>'
+        self.send_response(200)
+        self.send_header("ETag", _ETAG)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("X-PyPI-Last-Serial", "42")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *_) -> None:
+        """Keep the test output clean."""
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    """Run a package index on a free port with the cache in a temporary directory."""
+    monkeypatch.setattr(index_cache, "_CACHE_DIRECTORY", str(tmp_path))
+    monkeypatch.setattr(index_cache, "_CONNECTIONS", threading.local())
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _IndexHandler)
+    server.requests = []  # type: ignore
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def _url(server: ThreadingHTTPServer, path: str) -> str:
+    """Get URL of the given path on the index."""
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+
+class TestIndexCache:
+    """Test responses are cached and revalidated."""
+
+    def test_fresh(self, index):
+        """Test a fresh entry is served without a request."""
+        first = index_cache.get(_url(index, "/simple/six/"))
+        second = index_cache.get(_url(index, "/simple/six/"))
+
+        assert len(index.requests) == 1
+        assert second.content == first.content
+        assert second.status_code == 200
+        assert second.headers["X-PyPI-Last-Serial"] == "42"
+        assert "six-1.16.0" in second.text
+
+    def test_revalidated(self, index):
+        """Test a stale entry is revalidated using its ETag and kept on 304."""
+        first = index_cache.get(_url(index, "/simple/six/"), ttl=0)
+        second = index_cache.get(_url(index, "/simple/six/"), ttl=0)
+
+        assert len(index.requests) == 2
+        assert "If-None-Match" not in index.requests[0]
+        assert index.requests[1]["If-None-Match"] == _ETAG
+        assert second.content == first.content
+
+    def test_accept_part_of_key(self, index):
+        """Test responses of different representations are cached separately."""
+        index_cache.get(_url(index, "/simple/six/"))
+        index_cache.get(
+            _url(index, "/simple/six/"),
+            headers={"Accept": "application/vnd.pypi.simple.v1+json"},
+        )
+
+        assert len(index.requests) == 2
+
+    def test_not_found_cached(self, index):
+        """Test a missing project is cached as well."""
+        for _ in range(2):
+            assert index_cache.get(_url(index, "/missing/")).status_code == 404
+
+        assert len(index.requests) == 1
+
+    def test_not_found_expires(self, index, monkeypatch):
+        """Test a missing project is asked for again once the not found TTL passed, found ones do not expire."""
+        monkeypatch.setattr(index_cache, "_NOT_FOUND_TTL", 0)
+        for _ in range(2):
+            assert (
+                index_cache.get(_url(index, "/missing/"), ttl=float("inf")).status_code
+                == 404
+            )
+        index_cache.get(_url(index, "/simple/six/"), ttl=float("inf"))
+        index_cache.get(_url(index, "/simple/six/"), ttl=float("inf"))
+
+        assert len(index.requests) == 3
+
+    def test_stale_on_error(self, index):
+        """Test a stale entry is used when the index fails."""
+        first = index_cache.get(_url(index, "/error/"), ttl=0)
+        second = index_cache.get(_url(index, "/error/"), ttl=0)
+
+        assert len(index.requests) == 2
+        assert second.content == first.content
+
+    def test_stale_unreachable(self, index, monkeypatch):
+        """Test a stale entry is used when the index cannot be reached, the error is raised without one."""
+        first = index_cache.get(_url(index, "/simple/six/"), ttl=0)
+
+        def _request(*_, **__):
+            raise requests.ConnectionError("Index is down")
+
+        monkeypatch.setattr(index_cache.requests, "request", _request)
+        assert (
+            index_cache.get(_url(index, "/simple/six/"), ttl=0).content == first.content
+        )
+        with pytest.raises(requests.ConnectionError):
+            index_cache.get(_url(index, "/simple/other/"))
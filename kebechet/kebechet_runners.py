@@ -18,30 +18,45 @@
 """Methods for running Kebechet."""
 
 import logging
+import multiprocessing
+import multiprocessing.connection
 import os
+import time
 import urllib3
+import yaml
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict, Any, List, Optional, Tuple
 
 from .utils import (
-    download_kebechet_config,
+    CloneSession,
+    get_kebechet_config,
     create_ogr_service,
     _create_issue_from_exception,
 )
 from .payload_parser import PayloadParser
 from .config import _Config
+from .forge_snapshot import ForgeSnapshot
+from . import index_cache
+from . import rate_limit
+from . import subprocess_runner
+from . import token_cache
 
+from kebechet.managers.manager import get_environment_details
 from kebechet.managers import (
     REGISTERED_MANAGERS,
     ConfigInitializer,
     ManagerFailedException,
 )
 from . import __version__ as keb_version
-from github import GithubException
+from github import GithubException, RateLimitExceededException
+from ogr.services.base import BaseGitService
 from requests.exceptions import SSLError
 
 _LOGGER = logging.getLogger("kebechet")
 
 CREATE_SUPPORT_ISSUE = bool(os.getenv("KEBECHET_CREATE_SUPPORT_ISSUE", False))
+# Number of managers run concurrently on a repository, managers are run one after another by default.
+MANAGER_CONCURRENCY = int(os.getenv("KEBECHET_MANAGER_CONCURRENCY", 1))
 
 
 def _parse_url_4_args(url: str) -> Tuple[str, str, str, str]:
@@ -135,19 +150,146 @@ def run_analysis(
     )
 
 
+def _run_manager(
+    manager_name: str,
+    manager_configuration: Dict[str, Any],
+    slug: str,
+    ogr_service: BaseGitService,
+    service_type: str,
+    parsed_payload: Optional[Dict[Any, Any]],
+    metadata: Optional[Dict[str, Any]],
+    runtime_environments: List[str],
+    clone_session: Optional[CloneSession] = None,
+    config: Optional[_Config] = None,
+    snapshot: Optional[ForgeSnapshot] = None,
+) -> None:
+    """Run the given manager, report errors which are not expected."""
+    kebechet_manager = REGISTERED_MANAGERS[manager_name]
+    namespace, repo = slug.split("/", maxsplit=1)
+    if manager_name in rate_limit.HEAVY_MANAGERS:
+        rate_limit.wait(
+            rate_limit.get_key(ogr_service, namespace, repo), rate_limit.MANAGER_COST
+        )
+    _LOGGER.info("Running manager %r for %r", manager_name, slug)
+
+    instance = None
+    try:
+        instance = kebechet_manager(
+            slug=slug,
+            service=ogr_service,
+            service_type=service_type,
+            parsed_payload=parsed_payload,
+            metadata=metadata,
+            runtime_environments=runtime_environments,
+            clone_session=clone_session,
+            config=config,
+            snapshot=snapshot,
+        )
+        instance.run(**manager_configuration)
+    except RateLimitExceededException as exc:
+        _LOGGER.error(
+            "Manager %r ran out of rate limit for %r, skipping", manager_name, slug
+        )
+        rate_limit.observe_exhausted(
+            rate_limit.get_key(ogr_service, namespace, repo),
+            rate_limit.get_retry_after(exc.headers),
+        )
+    except Exception as exc:  # noqa F841
+        _LOGGER.exception(
+            "An error occurred during run of manager %r %r for %r, skipping",
+            manager_name,
+            kebechet_manager,
+            slug,
+        )
+        if (
+            isinstance(exc, GithubException)
+            and exc.status == 410
+            and isinstance(exc.data, dict)
+            and (message := exc.data.get("message")) is not None
+            and "issue" in message.lower()  # type: ignore
+            and "disable" in message.lower()  # type: ignore
+        ):
+            _LOGGER.info("Cannot open issue because it is disabled on this repo.")
+            return
+        elif isinstance(exc, GithubException) and exc.status >= 500:
+            raise exc  # reraise server error as the response could be flaky (behaviour dependent on retry policy).
+        elif isinstance(exc, ConnectionError):
+            return
+        elif isinstance(exc, SSLError):
+            return
+        elif isinstance(exc, ManagerFailedException):
+            return
+
+        if CREATE_SUPPORT_ISSUE:
+            _create_issue_from_exception(
+                keb_version=keb_version,
+                manager_name=manager_name,
+                ogr_service=ogr_service,
+                slug=slug,
+                exc=exc,
+            )
+    finally:
+        if instance is not None:
+            rate_limit.observe(instance.project)
+
+
+def _run_manager_in_process(
+    service_type: str,
+    service_url: Optional[str],
+    token: Optional[str],
+    **manager_kwargs: Any,
+) -> None:
+    """Run the given manager in a worker process, the process talks to the service using its own session."""
+    subprocess_runner.terminate_on_sigterm()
+    ogr_service = create_ogr_service(
+        service_type=service_type,
+        service_url=service_url,
+        token=token,
+        github_app_id=os.getenv("GITHUB_APP_ID"),
+        github_private_key_path=os.getenv("GITHUB_PRIVATE_KEY_PATH"),
+    )
+    _run_manager(ogr_service=ogr_service, service_type=service_type, **manager_kwargs)
+
+
 def run(
     service_type: str,
     namespace: str,
     project: str,
     service_url: Optional[str],
-    enabled_managers: List[str] = list(REGISTERED_MANAGERS.keys()),
+    enabled_managers: Optional[List[str]] = None,
     parsed_payload: Optional[Dict[Any, Any]] = None,
     metadata: Optional[Dict[str, Any]] = None,
     analysis_id: Optional[str] = None,
     runtime_environment: Optional[str] = None,
+    concurrency: int = MANAGER_CONCURRENCY,
+    token: Optional[str] = None,
+    config: Optional[_Config] = None,
 ) -> None:
-    """Run Kebechet using provided YAML configuration file."""
-    token = os.getenv(f"{service_type.upper()}_KEBECHET_TOKEN")
+    """Run Kebechet using provided YAML configuration file.
+
+    If concurrency is greater than one, managers are run in a pool of the given size, each in its own process.
+    If no configuration is supplied, it is obtained from the repository. All the registered managers are enabled
+    unless enabled_managers are stated.
+    """
+    if enabled_managers is None:
+        enabled_managers = list(REGISTERED_MANAGERS)
+
+    slug = f"{namespace}/{project}"
+
+    # Managers are not even instantiated (which talks to the service) if they do not act on the event.
+    if not any(
+        REGISTERED_MANAGERS.acts_on(manager_name, parsed_payload)
+        for manager_name in enabled_managers
+        if manager_name in REGISTERED_MANAGERS
+    ):
+        _LOGGER.info(
+            "No manager acts on %r events, skipping %r",
+            parsed_payload.get("event") if parsed_payload else None,
+            slug,
+        )
+        return
+
+    token = token or os.getenv(f"{service_type.upper()}_KEBECHET_TOKEN")
 
     ogr_service = create_ogr_service(
         service_type=service_type,
@@ -157,19 +299,31 @@ def run(
         github_private_key_path=os.getenv("GITHUB_PRIVATE_KEY_PATH"),
     )
 
-    slug = f"{namespace}/{project}"
+    # Issues, pull requests and the default branch are obtained once for all the managers run in this process.
+    snapshot = ForgeSnapshot(ogr_service.get_project(namespace=namespace, repo=project))
 
-    try:
-        with download_kebechet_config(ogr_service, namespace, project) as f:
-            config = _Config.from_file(f)
-    except FileNotFoundError:
-        _LOGGER.info("No Kebechet found in repo. Opening PR with simple configuration.")
-        ConfigInitializer(
-            slug=slug,
-            service=ogr_service,
-            service_type=service_type,
-        ).run()
-        return
+    # Configuration read from the repository is shared with managers so that they do not parse it on their own.
+    repository_config: Optional[_Config] = None
+    if config is None:
+        try:
+            config = repository_config = get_kebechet_config(
+                ogr_service, namespace, project, branch=snapshot.default_branch
+            )
+        except FileNotFoundError:
+            _LOGGER.info(
+                "No Kebechet found in repo. Opening PR with simple configuration."
+            )
+            ConfigInitializer(
+                slug=slug,
+                service=ogr_service,
+                service_type=service_type,
+                snapshot=snapshot,
+            ).run()
+            return
+
+    # Responses obtained so far tell how much of the rate limit is left.
+    rate_limit.observe(snapshot.project)
+    budget_key = rate_limit.get_key(ogr_service, namespace, project)
 
     managers = config.managers
     runtime_environments: List[str]
@@ -184,6 +338,7 @@ def run(
     else:
         runtime_environments = []
 
+    to_run = []
     for manager in managers:
         # We do pops on dict, which changes it. Let's create a soft duplicate so if a user uses
         # YAML references, we do not break.
@@ -214,61 +369,278 @@ def run(
             )
             continue
 
-        kebechet_manager = REGISTERED_MANAGERS.get(manager_name)
-        if not kebechet_manager:
+        if manager_name not in REGISTERED_MANAGERS:
             _LOGGER.error("Unable to find requested manager %r, skipping", manager_name)
             continue
 
-        _LOGGER.info("Running manager %r for %r", manager_name, slug)
-        manager_configuration = manager.get("configuration") or {}
+        if not REGISTERED_MANAGERS.acts_on(manager_name, parsed_payload):
+            _LOGGER.debug(
+                "Skipping manager %r because it does not act on %r events.",
+                manager_name,
+                parsed_payload.get("event"),  # type: ignore
+            )
+            continue
+
+        low_priority = manager_name in rate_limit.LOW_PRIORITY_MANAGERS
+        if low_priority and rate_limit.is_low(budget_key):
+            _LOGGER.info(
+                "Deferring manager %r for %r, rate limit budget is low",
+                manager_name,
+                slug,
+            )
+            continue
+
+        manager_configuration = dict(manager.get("configuration") or {})
 
         if analysis_id:
             manager_configuration["analysis_id"] = analysis_id
 
-        try:
-            if manager_configuration.pop("enabled", True):
-                instance = kebechet_manager(
+        if manager_configuration.pop("enabled", True):
+            to_run.append((manager_name, manager_configuration, runtime_environments))
+
+    if concurrency > 1 and len(to_run) > 1:
+        rate_limit.share_across_processes()
+        index_cache.share_across_processes()
+        # Managers run in separate processes - they change the working directory when operating on sources.
+        with ProcessPoolExecutor(
+            max_workers=concurrency, mp_context=multiprocessing.get_context("fork")
+        ) as executor:
+            futures = [
+                executor.submit(
+                    _run_manager_in_process,
+                    manager_name=manager_name,
+                    manager_configuration=manager_configuration,
                     slug=slug,
-                    service=ogr_service,
                     service_type=service_type,
+                    service_url=service_url,
+                    token=token,
                     parsed_payload=parsed_payload,
                     metadata=metadata,
                     runtime_environments=runtime_environments,
+                    config=repository_config,
                 )
-                instance.run(**manager_configuration)
-        except Exception as exc:  # noqa F841
-            _LOGGER.exception(
-                "An error occurred during run of manager %r %r for %r, skipping",
-                manager,
-                kebechet_manager,
-                slug,
-            )
-            if (
-                isinstance(exc, GithubException)
-                and exc.status == 410
-                and isinstance(exc.data, dict)
-                and (message := exc.data.get("message")) is not None
-                and "issue" in message.lower()  # type: ignore
-                and "disable" in message.lower()  # type: ignore
-            ):
-                _LOGGER.info("Cannot open issue because it is disabled on this repo.")
-                continue
-            elif isinstance(exc, GithubException) and exc.status >= 500:
-                raise exc  # reraise server error as the response could be flaky (behaviour dependent on retry policy).
-            elif isinstance(exc, ConnectionError):
-                continue
-            elif isinstance(exc, SSLError):
-                continue
-            elif isinstance(exc, ManagerFailedException):
-                continue
-
-            if CREATE_SUPPORT_ISSUE:
-                _create_issue_from_exception(
-                    keb_version=keb_version,
+                for manager_name, manager_configuration, runtime_environments in to_run
+            ]
+            for future in futures:
+                # Errors which are not handled by the manager run are propagated, as in the sequential run.
+                future.result()
+    else:
+        # All the managers share one clone of the repository, it is reset between the managers.
+        with CloneSession() as clone_session:
+            for manager_name, manager_configuration, runtime_environments in to_run:
+                _run_manager(
                     manager_name=manager_name,
-                    ogr_service=ogr_service,
+                    manager_configuration=manager_configuration,
                     slug=slug,
-                    exc=exc,
+                    ogr_service=ogr_service,
+                    service_type=service_type,
+                    parsed_payload=parsed_payload,
+                    metadata=metadata,
+                    runtime_environments=runtime_environments,
+                    clone_session=clone_session,
+                    config=repository_config,
+                    snapshot=snapshot,
                 )
 
     _LOGGER.info("Finished management for %r", slug)
+
+
+def _get_fleet_token(repository: Dict[str, Any]) -> Optional[str]:
+    """Get token stated for a repository in the fleet configuration, environment variables are substituted."""
+    return repository["token"].format(**os.environ) if repository.get("token") else None
+
+
+def _get_fleet_budget_key(
+    repository: Dict[str, Any], service_type: str, service_url: Optional[str]
+) -> Optional[str]:
+    """Get key of the rate limit budget a run on the repository stated in the fleet configuration uses."""
+    try:
+        token = _get_fleet_token(repository)
+    except KeyError:
+        token = None
+
+    namespace, project = repository["slug"].split("/", maxsplit=1)
+    # The service is created as in the run, without issuing any request; the forked run reuses it.
+    ogr_service = create_ogr_service(
+        service_type=service_type,
+        service_url=service_url,
+        token=token or os.getenv(f"{service_type.upper()}_KEBECHET_TOKEN"),
+        github_app_id=os.getenv("GITHUB_APP_ID"),
+        github_private_key_path=os.getenv("GITHUB_PRIVATE_KEY_PATH"),
+    )
+    return rate_limit.get_key(ogr_service, namespace, project)
+
+
+def _pop_fleet_repository(
+    to_run: List[Dict[str, Any]],
+    started: Dict[Optional[str], float],
+    service_type: str,
+    service_url: Optional[str],
+) -> Tuple[Optional[Dict[str, Any]], float]:
+    """Pop the next repository whose rate limit budget allows starting it, otherwise get time to wait for one.
+
+    Repositories using a low budget are started the delay reported for the budget after the previous one, other
+    repositories are not held back by them.
+    """
+    now = time.monotonic()
+    wait = float("inf")
+    for index in range(len(to_run) - 1, -1, -1):
+        budget_key = _get_fleet_budget_key(to_run[index], service_type, service_url)
+        delay = rate_limit.get_delay(budget_key, rate_limit.REPOSITORY_COST)
+        start = started.setdefault(budget_key, now) + delay
+        if start <= now:
+            started[budget_key] = now
+            return to_run.pop(index), 0.0
+        wait = min(wait, start - now)
+
+    return None, wait
+
+
+def _run_fleet_repository(
+    repository: Dict[str, Any],
+    service_type: str,
+    service_url: Optional[str],
+) -> None:
+    """Run Kebechet on a repository stated in the fleet configuration, managers are configured by the entry."""
+    # The run is terminated on timeout, commands it runs are killed together with it.
+    subprocess_runner.terminate_on_sigterm()
+    namespace, project = repository["slug"].split("/", maxsplit=1)
+    try:
+        token = _get_fleet_token(repository)
+    except KeyError as exc:
+        _LOGGER.warning(
+            "Token for %r references an unset environment variable %s, using the default token",
+            repository["slug"],
+            str(exc),
+        )
+        token = None
+
+    run(
+        service_type=service_type,
+        namespace=namespace,
+        project=project,
+        service_url=service_url,
+        token=token,
+        config=_Config({"managers": repository.get("managers") or []}),
+    )
+
+
+def run_fleet(
+    config_path: str,
+    service_type: str,
+    service_url: Optional[str] = None,
+    workers: int = 4,
+    timeout: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Run Kebechet on all the repositories stated in the fleet configuration file, return summary of the run."""
+    with open(config_path) as config_file:
+        repositories = (yaml.safe_load(config_file) or {}).get("repositories") or []
+
+    results = []
+    to_run = []
+    for repository in repositories:
+        if not repository.get("slug") or "/" not in repository["slug"]:
+            _LOGGER.error(
+                "Invalid repository entry in %r, ignoring: %r", config_path, repository
+            )
+            results.append(
+                {
+                    "slug": repository.get("slug"),
+                    "status": "invalid",
+                    "exit_code": None,
+                    "duration": 0.0,
+                }
+            )
+            continue
+        to_run.append(repository)
+
+    _LOGGER.info(
+        "Running Kebechet on %d repositories using %d workers", len(to_run), workers
+    )
+    start = time.monotonic()
+    # Installation tokens requested for a repository are reused for other repositories of the same installation.
+    token_cache.share_across_processes()
+    # Repositories are started more slowly once the budget reported by already finished runs gets low.
+    rate_limit.share_across_processes()
+    # Package index responses obtained by a run are reused by other runs.
+    index_cache.share_across_processes()
+    # Runs report the environment in pull requests and issues, pipenv is run once instead of in each run.
+    get_environment_details()
+    context = multiprocessing.get_context("fork")
+    # Each repository is processed in a process forked from this warm interpreter.
+    running: Dict[Any, Tuple[Dict[str, Any], float]] = {}
+    to_run.reverse()
+    # Time the last repository using a budget was started (or the budget was first seen), keyed by the budget.
+    started: Dict[Optional[str], float] = {}
+    not_before = 0.0
+    while to_run or running:
+        while to_run and len(running) < workers and time.monotonic() >= not_before:
+            repository, delay = _pop_fleet_repository(
+                to_run, started, service_type, service_url
+            )
+            if repository is None:
+                _LOGGER.info(
+                    "Rate limit budgets are low, next repository is started in %.1f seconds",
+                    delay,
+                )
+                not_before = time.monotonic() + delay
+                break
+
+            process = context.Process(
+                target=_run_fleet_repository,
+                args=(repository, service_type, service_url),
+                name=f"kebechet-{repository['slug']}",
+            )
+            process.start()
+            running[process] = (repository, time.monotonic())
+
+        multiprocessing.connection.wait(
+            [process.sentinel for process in running], timeout=1
+        )
+
+        for process, (repository, process_start) in list(running.items()):
+            duration = time.monotonic() - process_start
+            if process.is_alive():
+                if timeout is None or duration < timeout:
+                    continue
+
+                _LOGGER.error(
+                    "Run on %r did not finish in %s seconds, terminating",
+                    repository["slug"],
+                    timeout,
+                )
+                process.terminate()
+                process.join()
+                status = "timeout"
+            elif process.exitcode == 0:
+                status = "success"
+            else:
+                status = "failed"
+
+            del running[process]
+            results.append(
+                {
+                    "slug": repository["slug"],
+                    "status": status,
+                    "exit_code": process.exitcode,
+                    "duration": round(duration, 3),
+                }
+            )
+
+    summary: Dict[str, Any] = {
+        "total": len(results),
+        "duration": round(time.monotonic() - start, 3),
+        "repositories": results,
+    }
+    for status in ("success", "failed", "timeout", "invalid"):
+        summary[status] = sum(1 for r in results if r["status"] == status)
+
+    _LOGGER.info(
+        "Fleet run finished in %s seconds: %d succeeded, %d failed, %d timed out, %d invalid",
+        summary["duration"],
+        summary["success"],
+        summary["failed"],
+        summary["timeout"],
+        summary["invalid"],
+    )
+    return summary
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# Kebechet
+# Copyright(C) 2022 Kevin Postlethwait
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Cache of dependency resolution results keyed by inputs of the resolution.
+
+Resolution of the same inputs gives a different result only once a new version of any of the packages involved
+is released. An entry is therefore reused only if the inputs (Pipfile, requirements.in files including the files
+they include or constrain with, Python version, pipenv version, indexes) are the same and the package index reports
+no change of any package in the resolved lock since the entry was stored. Resolutions involving packages installed
+from VCS, URLs or local paths are not cached, their changes cannot be detected. Entries expire after a TTL so that
+results are refreshed even if the index does not report all the changes.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import platform
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import toml
+from packaging.utils import canonicalize_name
+
+from . import lockfile
+from . import package_index
+from .exception import PipenvError
+from .managers.manager import get_pipenv_version
+
+_LOGGER = logging.getLogger(__name__)
+
+_CACHE_DIRECTORY = os.getenv("KEBECHET_LOCK_CACHE_DIRECTORY", None)
+# Entries older than this many seconds are not used, 0 disables the cache.
+_TTL = float(os.getenv("KEBECHET_LOCK_CACHE_TTL", 24 * 60 * 60))
+
+# Files in the working directory the resolution depends on.
+_INPUT_FILES = ("Pipfile", "requirements.in", "requirements-dev.in")
+# Files in the working directory the resolution writes by default.
+_OUTPUT_FILES = ("Pipfile.lock",)
+
+_DEFAULT_INDEX_URL = "https://pypi.org/simple"
+_CONSTRAINT_OPTIONS = ("-c", "--constraint")
+# Keys of Pipfile and Pipfile.lock entries of packages not installed from a package index.
+_NON_INDEX_KEYS = ("git", "hg", "svn", "bzr", "path", "file", "url")
+
+_CACHE: Dict[str, dict] = {}
+
+
+def _read(path: str) -> Optional[str]:
+    """Read the given file, None if it does not exist."""
+    try:
+        with open(path) as input_file:
+            return input_file.read()
+    except FileNotFoundError:
+        return None
+
+
+def _load_pipfile() -> Optional[dict]:
+    """Load Pipfile in the working directory, None if there is none."""
+    pipfile_content = _read("Pipfile")
+    return toml.loads(pipfile_content) if pipfile_content is not None else None
+
+
+def _get_index_urls(pipfile: Optional[dict]) -> List[str]:
+    """Get URLs of package indexes stated in the given Pipfile, the configured mirror or PyPI otherwise."""
+    index_urls = [source["url"] for source in (pipfile or {}).get("source") or []]
+    return index_urls or [os.getenv("PIPENV_PYPI_MIRROR") or _DEFAULT_INDEX_URL]
+
+
+def _get_requirements_lines(path: str) -> List[str]:
+    """Get logical lines of the given requirements file, included and constraint files are expanded."""
+    lines = []
+    for file_path, _, line in lockfile.iter_lines(path):
+        if line.startswith(_CONSTRAINT_OPTIONS):
+            constraints_path = os.path.join(
+                os.path.dirname(file_path), lockfile.get_option_value(line)
+            )
+            lines.extend(f"-c {c}" for c in _get_requirements_lines(constraints_path))
+        else:
+            lines.append(line)
+
+    return lines
+
+
+def _is_from_index(entry: Any) -> bool:
+    """Check whether the given Pipfile or Pipfile.lock entry is installed from a package index."""
+    return not isinstance(entry, dict) or not any(k in entry for k in _NON_INDEX_KEYS)
+
+
+def _get_inputs() -> Tuple[Optional[dict], List[str], List[str]]:
+    """Get canonical inputs of resolution in the working directory, index URLs and names of direct dependencies.
+
+    Inputs are None if the resolution depends on something changes of which cannot be detected, such as
+    packages installed from VCS, URLs or local paths.
+    """
+    inputs: dict = {"mirror": os.getenv("PIPENV_PYPI_MIRROR")}
+    names: List[str] = []
+
+    pipfile = _load_pipfile()
+    index_urls = _get_index_urls(pipfile)
+    python_version = None
+    if pipfile is not None:
+        # Formatting, comments and order of entries do not change the resolution.
+        inputs["Pipfile"] = pipfile
+        python_version = (pipfile.get("requires") or {}).get("python_version")
+        for section in ("packages", "dev-packages"):
+            for name, entry in (pipfile.get(section) or {}).items():
+                if not _is_from_index(entry):
+                    return None, index_urls, names
+                names.append(name)
+
+    for file_name in _INPUT_FILES[1:]:
+        if not os.path.isfile(file_name):
+            continue
+
+        try:
+            lines = _get_requirements_lines(file_name)
+            requirements = [
+                lockfile.Requirement.parse(line)
+                for line in lines
+                if not line.startswith("-") or line.startswith(("-e", "--editable"))
+            ]
+        except (OSError, ValueError) as exc:
+            _LOGGER.debug("Cannot track inputs stated in %s: %s", file_name, str(exc))
+            return None, index_urls, names
+
+        if any(requirement.url is not None for requirement in requirements):
+            return None, index_urls, names
+
+        inputs[file_name] = sorted(lines)
+        names.extend(requirement.name for requirement in requirements)  # type: ignore
+
+    # Markers are evaluated for the interpreter pipenv runs with unless the Pipfile states the version.
+    inputs["python_version"] = python_version or ".".join(
+        platform.python_version_tuple()[:2]
+    )
+    try:
+        # Resolvers of different pipenv releases (with pip-tools vendored) can give different results.
+        inputs["pipenv"] = get_pipenv_version()
+    except PipenvError:
+        return None, index_urls, names
+
+    inputs["index_urls"] = index_urls
+    return inputs, index_urls, names
+
+
+def get_index_urls() -> List[str]:
+    """Get URLs of package indexes resolution in the working directory uses."""
+    return _get_index_urls(_load_pipfile())
+
+
+def _get_locked_packages(lock_content: str) -> Dict[str, Any]:
+    """Get entries of all the packages stated in the given Pipfile.lock, keyed by name."""
+    lock = json.loads(lock_content)
+    return {
+        name: entry
+        for section in ("default", "develop")
+        for name, entry in (lock.get(section) or {}).items()
+    }
+
+
+def _load(key: str) -> Optional[dict]:
+    """Load the entry with the given key."""
+    entry = _CACHE.get(key)
+    if entry is None and _CACHE_DIRECTORY is not None:
+        try:
+            with open(os.path.join(_CACHE_DIRECTORY, key)) as entry_file:
+                entry = json.load(entry_file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    return entry
+
+
+def _store(key: str, entry: dict) -> None:
+    """Store the entry under the given key."""
+    _CACHE[key] = entry
+    if _CACHE_DIRECTORY is not None:
+        os.makedirs(_CACHE_DIRECTORY, exist_ok=True)
+        # Write atomically, concurrent jobs can read the same entry.
+        with tempfile.NamedTemporaryFile(
+            "w", dir=_CACHE_DIRECTORY, delete=False
+        ) as entry_file:
+            json.dump(entry, entry_file)
+        os.replace(entry_file.name, os.path.join(_CACHE_DIRECTORY, key))
+
+
+def run_lock(
+    cmd: str, run: Callable[[str], str], output_files: Tuple[str, ...] = _OUTPUT_FILES
+) -> str:
+    """Run the given resolution command (using run) in the working directory unless its result is cached.
+
+    Return output of the command; output_files written by the resolution are restored from the cache on a hit.
+    """
+    if not _TTL:
+        return run(cmd)
+
+    inputs, index_urls, direct_dependencies = _get_inputs()
+    if inputs is None:
+        _LOGGER.debug(
+            "Changes of inputs of %r cannot be detected, not using cache", cmd
+        )
+        return run(cmd)
+
+    key = hashlib.sha256(
+        json.dumps({"cmd": cmd.strip(), "inputs": inputs}, sort_keys=True).encode()
+    ).hexdigest()
+
+    entry = _load(key)
+    if entry is not None and time.time() - entry["created"] < _TTL:
+        # Serials are revalidated with the index, a cached response could hide a new release.
+        serials = package_index.get_all_last_serials(
+            entry["serials"].keys(), index_urls=index_urls, max_age=0
+        )
+        if serials == entry["serials"]:
+            _LOGGER.info("Inputs of %r did not change, reusing resolution result", cmd)
+            for file_name, content in entry["files"].items():
+                with open(file_name, "w") as output_file:
+                    output_file.write(content)
+            return entry["out"]
+
+        _LOGGER.debug(
+            "Packages %r changed since %r was cached",
+            sorted(
+                name
+                for name, serial in serials.items()
+                if serial != entry["serials"][name]
+            ),
+            cmd,
+        )
+
+    out = run(cmd)
+
+    files = {
+        name: content for name in output_files if (content := _read(name)) is not None
+    }
+    locked = (
+        _get_locked_packages(files["Pipfile.lock"]) if "Pipfile.lock" in files else {}
+    )
+    if not all(_is_from_index(entry) for entry in locked.values()):
+        _LOGGER.debug(
+            "Resolved stack of %r is not installed from package indexes only, not caching",
+            cmd,
+        )
+        return out
+
+    serials = package_index.get_all_last_serials(
+        direct_dependencies + list(locked), index_urls=index_urls, max_age=0
+    )
+    if not serials or any(serial is None for serial in serials.values()):
+        # Changes of some packages cannot be detected, the result cannot be reused safely.
+        _LOGGER.debug(
+            "Index does not report changes of all the packages, not caching %r", cmd
+        )
+        return out
+
+    _store(
+        key,
+        {
+            "created": time.time(),
+            "out": out,
+            "files": files,
+            "serials": {
+                canonicalize_name(name): serial for name, serial in serials.items()
+            },
+        },
+    )
+    return out
@@ -0,0 +1,137 @@
+"""Tests for caching of dependency resolution results."""
+
+import json
+
+import pytest
+
+from kebechet import lock_cache
+
+
+class TestRunLock:
+    """Test reuse of resolution results."""
+
+    @pytest.fixture(autouse=True)
+    def environment(self, tmp_path, monkeypatch):
+        """Run in an empty directory with an empty cache and an index reporting fixed serials."""
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(lock_cache, "_CACHE", {})
+        monkeypatch.setattr(lock_cache, "_CACHE_DIRECTORY", None)
+        monkeypatch.setattr(lock_cache, "get_pipenv_version", lambda: "2020.11.15")
+        self.serials = {}
+        self.max_ages = []
+
+        def get_all_last_serials(names, index_urls, max_age=None):
+            self.max_ages.append(max_age)
+            return {name: self.serials.get(name, 1) for name in names}
+
+        monkeypatch.setattr(
+            lock_cache.package_index, "get_all_last_serials", get_all_last_serials
+        )
+
+    def _lock(self, lock=None):
+        """Run the lock, report whether the resolution was run."""
+        runs = []
+
+        def run(cmd):
+            runs.append(cmd)
+            with open("Pipfile.lock", "w") as lock_file:
+                json.dump(
+                    lock or {"default": {"six": {"version": "==1.16.0"}}}, lock_file
+                )
+            return "six==1.16.0\n"
+
+        assert lock_cache.run_lock("pipenv lock -r", run) == "six==1.16.0\n"
+        return bool(runs)
+
+    def test_reuse(self, tmp_path):
+        """Test the result is reused while inputs and serials do not change, serials are revalidated."""
+        (tmp_path / "requirements.in").write_text("six\n")
+
+        assert self._lock()
+        assert not self._lock()
+        assert set(self.max_ages) == {0}
+
+        self.serials["six"] = 2
+        assert self._lock()
+
+    def test_included_files(self, tmp_path):
+        """Test changes of included and constraint files are detected."""
+        (tmp_path / "requirements.in").write_text("-r base.in\n-c constraints.txt\n")
+        (tmp_path / "base.in").write_text("six\n")
+        (tmp_path / "constraints.txt").write_text("six<2\n")
+
+        assert self._lock()
+        assert not self._lock()
+
+        (tmp_path / "base.in").write_text("six>=1.16\n")
+        assert self._lock()
+        assert not self._lock()
+
+        (tmp_path / "constraints.txt").write_text("six<1.17\n")
+        assert self._lock()
+
+    def test_pipenv_version(self, tmp_path, monkeypatch):
+        """Test a different pipenv version does not reuse results."""
+        (tmp_path / "requirements.in").write_text("six\n")
+
+        assert self._lock()
+        monkeypatch.setattr(lock_cache, "get_pipenv_version", lambda: "2022.1.8")
+        assert self._lock()
+
+    @pytest.mark.parametrize(
+        "file_name,content",
+        [
+            (
+                "requirements.in",
+                "-e git+https://github.com/thoth-station/kebechet#egg=kebechet\n",
+            ),
+            ("requirements.in", "./vendor/six\n"),
+            (
+                "Pipfile",
+                '[packages]\nkebechet = {git = "https://github.com/thoth-station/kebechet"}\n',
+            ),
+            ("Pipfile", '[packages]\nsix = {path = "./vendor/six"}\n'),
+        ],
+    )
+    def test_not_from_index(self, tmp_path, file_name, content):
+        """Test resolutions involving packages not installed from an index are not cached."""
+        (tmp_path / file_name).write_text(content)
+
+        assert self._lock()
+        assert self._lock()
+
+    def test_resolved_not_from_index(self, tmp_path):
+        """Test results stating packages installed from VCS are not cached."""
+        (tmp_path / "Pipfile").write_text('[packages]\nsix = "*"\n')
+        lock = {
+            "default": {
+                "six": {"version": "==1.16.0"},
+                "foo": {"git": "https://example.com/foo"},
+            }
+        }
+
+        assert self._lock(lock)
+        assert self._lock(lock)
+
+    def test_output_files_restored(self, tmp_path):
+        """Test files the resolution creates from requirements.in are restored on a hit."""
+        (tmp_path / "requirements.in").write_text("six\n")
+        runs = []
+
+        def run(cmd):
+            runs.append(cmd)
+            (tmp_path / "Pipfile").write_text('[packages]\nsix = "*"\n')
+            (tmp_path / "Pipfile.lock").write_text(
+                json.dumps({"default": {"six": {"version": "==1.16.0"}}})
+            )
+            return ""
+
+        output_files = ("Pipfile", "Pipfile.lock")
+        lock_cache.run_lock("pipenv lock -r requirements.in", run, output_files)
+        (tmp_path / "Pipfile").unlink()
+        (tmp_path / "Pipfile.lock").unlink()
+        lock_cache.run_lock("pipenv lock -r requirements.in", run, output_files)
+
+        assert len(runs) == 1
+        assert (tmp_path / "Pipfile").read_text() == '[packages]\nsix = "*"\n'
+        assert "six" in json.loads((tmp_path / "Pipfile.lock").read_text())["default"]
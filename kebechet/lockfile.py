@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+# Kebechet
+# Copyright(C) 2022 Kevin Postlethwait
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Models of lock files and requirements files, parsed once and indexed for lookups by canonical package name.
+
+Requirements files are read as a stream of logical lines, continuation lines are joined, comments dropped
+and files included by -r options followed. Each line becomes a compact Requirement, pinned requirements of
+a locked stack become LockedPackage instances.
+"""
+
+import json
+import os
+import re
+from typing import Dict, Iterator, Optional, Tuple
+
+from packaging import requirements
+from packaging.utils import canonicalize_name
+
+SECTIONS = ("default", "develop")
+
+_RE_COMMENT = re.compile(r"(^|\s+)#.*$")
+_RE_HASH = re.compile(r"\s*--hash[=\s]+(\S+)")
+_RE_EGG = re.compile(r"#egg=([^&\s\[]+)")
+_INCLUDE_OPTIONS = ("-r", "--requirement")
+_EDITABLE_OPTIONS = ("-e", "--editable")
+
+
+class PipfileLock:
+    """Content of Pipfile.lock indexed by section and canonical package name."""
+
+    __slots__ = ("_sections", "pipfile_hash")
+
+    def __init__(self, content: dict) -> None:
+        """Index the given parsed content of Pipfile.lock."""
+        # Hash of the Pipfile the lock was computed for.
+        self.pipfile_hash: Optional[str] = (
+            (content.get("_meta") or {}).get("hash") or {}
+        ).get("sha256")
+        self._sections: Dict[str, Dict[str, dict]] = {
+            section: {
+                canonicalize_name(name): entry
+                for name, entry in (content.get(section) or {}).items()
+            }
+            for section in SECTIONS
+        }
+
+    @classmethod
+    def load(cls, path: str = "Pipfile.lock") -> "PipfileLock":
+        """Load and index the given Pipfile.lock."""
+        with open(path) as lock_file:
+            return cls(json.load(lock_file))
+
+    def get(self, name: str, section: str = "default") -> Optional[dict]:
+        """Get entry of the given package in the given section, None if it is not locked."""
+        return self._sections[section].get(canonicalize_name(name))
+
+    def get_version(self, name: str, section: str = "default") -> Optional[str]:
+        """Get version the given package is pinned to, None if it is not locked or not pinned to a version."""
+        entry = self.get(name, section) or {}
+        version = entry.get("version")
+        return version[len("==") :] if version and version.startswith("==") else None
+
+    def diff(
+        self, other: "PipfileLock", section: str = "default"
+    ) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+        """Get packages of the section whose versions differ in the other lock as old and new version.
+
+        Packages are keyed by canonical name, packages missing in one of the locks or not pinned to a version
+        there are stated with version None.
+        """
+        result = {}
+        for key in self._sections[section].keys() | other._sections[section].keys():
+            version = self.get_version(key, section)
+            other_version = other.get_version(key, section)
+            if version != other_version:
+                result[key] = (version, other_version)
+
+        return result
+
+
+def get_option_value(line: str) -> str:
+    """Get value of the option stated on the given line, both "-r file" and "--requirement=file" forms are accepted."""
+    option, _, value = line.partition(
+        "=" if line.startswith("--") and "=" in line.split()[0] else " "
+    )
+    if not value and not line.startswith("--"):
+        # Value of a short option can follow it immediately, as in "-rfile".
+        return line[2:].strip()
+
+    return value.strip()
+
+
+class Requirement:
+    """A requirement stated on a line of a requirements file."""
+
+    __slots__ = (
+        "name",
+        "key",
+        "specifier",
+        "extras",
+        "marker",
+        "url",
+        "hashes",
+        "editable",
+    )
+
+    def __init__(
+        self,
+        name: Optional[str],
+        specifier: str = "",
+        extras: Tuple[str, ...] = (),
+        marker: Optional[str] = None,
+        url: Optional[str] = None,
+        hashes: Tuple[str, ...] = (),
+        editable: bool = False,
+    ) -> None:
+        """Create a requirement, the canonical name used for lookups is computed once.
+
+        Projects installed from a URL or a path without an egg fragment have no name.
+        """
+        self.name = name
+        self.key = canonicalize_name(name) if name is not None else None
+        self.specifier = specifier
+        self.extras = extras
+        self.marker = marker
+        self.url = url
+        self.hashes = hashes
+        self.editable = editable
+
+    def __repr__(self) -> str:
+        """Represent the requirement as stated in a requirements file."""
+        extras = f"[{','.join(self.extras)}]" if self.extras else ""
+        marker = f"; {self.marker}" if self.marker else ""
+        name = f"{self.name} @ " if self.name and self.url else self.name or ""
+        return f"{self.__class__.__name__}({name}{extras}{self.url or self.specifier}{marker})"
+
+    @property
+    def pinned_version(self) -> Optional[str]:
+        """Get version the requirement pins, None if it does not pin a single version."""
+        if (
+            self.url is None
+            and self.specifier.startswith("==")
+            and "," not in self.specifier
+        ):
+            version = self.specifier[len("==") :]
+            if not version.endswith("*"):
+                return version
+
+        return None
+
+    @classmethod
+    def parse(cls, line: str) -> "Requirement":
+        """Parse a logical line of a requirements file, ValueError is raised if it cannot be parsed."""
+        editable = line.startswith(_EDITABLE_OPTIONS)
+        if editable:
+            line = get_option_value(line)
+
+        hashes = tuple(_RE_HASH.findall(line))
+        line = _RE_HASH.sub("", line).strip()
+
+        if not editable:
+            try:
+                requirement = requirements.Requirement(line)
+            except requirements.InvalidRequirement:
+                if "://" not in line and not line.startswith((".", "/")):
+                    raise
+            else:
+                return cls(
+                    name=requirement.name,
+                    specifier=str(requirement.specifier),
+                    extras=tuple(sorted(requirement.extras)),
+                    marker=str(requirement.marker) if requirement.marker else None,
+                    url=requirement.url,
+                    hashes=hashes,
+                )
+
+        # A plain URL or path, the name is stated only as egg fragment if at all.
+        match = _RE_EGG.search(line)
+        return cls(
+            name=match.group(1) if match else None,
+            url=line,
+            hashes=hashes,
+            editable=editable,
+        )
+
+
+class LockedPackage:
+    """A package pinned to a version in a locked software stack."""
+
+    __slots__ = ("name", "key", "version", "extras", "marker", "hashes")
+
+    def __init__(
+        self,
+        name: str,
+        version: str,
+        extras: Tuple[str, ...] = (),
+        marker: Optional[str] = None,
+        hashes: Tuple[str, ...] = (),
+    ) -> None:
+        """Create a locked package, the canonical name used for lookups is computed once."""
+        self.name = name
+        self.key = canonicalize_name(name)
+        self.version = version
+        self.extras = extras
+        self.marker = marker
+        self.hashes = hashes
+
+    def __repr__(self) -> str:
+        """Represent the package as pinned in a requirements file."""
+        return f"{self.__class__.__name__}({self.name}=={self.version})"
+
+
+def iter_lines(path: str) -> Iterator[Tuple[str, int, str]]:
+    """Iterate over logical lines of the given requirements file as tuples of file path, line number and line.
+
+    Continuation lines are joined, comments and blank lines are skipped and files included using -r options
+    are read in place of the option.
+    """
+    with open(path) as requirements_file:
+        logical_line = ""
+        line_number = 0
+        for number, physical_line in enumerate(requirements_file, start=1):
+            physical_line = physical_line.rstrip("\n")
+            if not logical_line:
+                line_number = number
+
+            if physical_line.endswith("\\"):
+                logical_line += physical_line[:-1]
+                continue
+
+            line = _RE_COMMENT.sub("", logical_line + physical_line).strip()
+            logical_line = ""
+            if not line:
+                continue
+
+            if line.startswith(_INCLUDE_OPTIONS):
+                yield from iter_lines(
+                    os.path.join(os.path.dirname(path), get_option_value(line))
+                )
+                continue
+
+            yield path, line_number, line
+
+        if logical_line.strip():
+            yield path, line_number, _RE_COMMENT.sub("", logical_line).strip()
+
+
+def parse_requirements(path: str) -> Iterator[Requirement]:
+    """Parse the given requirements file, options other than -r and -e are skipped.
+
+    ValueError is raised for lines which cannot be parsed, the message states the file and the line number.
+    """
+    for file_path, line_number, line in iter_lines(path):
+        if line.startswith("-") and not line.startswith(_EDITABLE_OPTIONS):
+            continue
+
+        try:
+            yield Requirement.parse(line)
+        except ValueError as exc:
+            raise ValueError(f"{file_path}:{line_number}: {str(exc)}") from exc
+
+
+class RequirementsLock:
+    """A fully pinned down software stack stated in a requirements file, indexed by canonical package name.
+
+    Requirements installed from a URL, a path or in editable mode are not pinned to a version, they are
+    not part of the model.
+    """
+
+    __slots__ = ("_packages",)
+
+    def __init__(self, packages: Dict[str, LockedPackage]) -> None:
+        """Create the model out of locked packages keyed by canonical name."""
+        self._packages = packages
+
+    @classmethod
+    def load(cls, path: str) -> "RequirementsLock":
+        """Load the given requirements file, ValueError is raised if a requirement is not pinned to a version."""
+        packages = {}
+        for requirement in parse_requirements(path):
+            if requirement.url is not None:
+                continue
+
+            version = requirement.pinned_version
+            if version is None:
+                raise ValueError(
+                    f"{requirement.name}{requirement.specifier!s} is not fully qualified dependency"
+                )
+
+            packages[requirement.key] = LockedPackage(
+                name=requirement.name,
+                version=version,
+                extras=requirement.extras,
+                marker=requirement.marker,
+                hashes=requirement.hashes,
+            )
+
+        return cls(packages)
+
+    def __contains__(self, name: str) -> bool:
+        """Check whether the given package is locked."""
+        return canonicalize_name(name) in self._packages
+
+    def __iter__(self) -> Iterator[LockedPackage]:
+        """Iterate over locked packages."""
+        return iter(self._packages.values())
+
+    def __len__(self) -> int:
+        """Get number of locked packages."""
+        return len(self._packages)
+
+    def get(self, name: str) -> Optional[LockedPackage]:
+        """Get the given locked package, None if it is not locked."""
+        return self._packages.get(canonicalize_name(name))
+
+    def diff(
+        self, other: "RequirementsLock"
+    ) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+        """Get packages whose versions differ in the other lock as old and new version, keyed by canonical name.
+
+        Packages missing in one of the locks are stated with version None.
+        """
+        result = {}
+        for key in self._packages.keys() | other._packages.keys():
+            package, other_package = self._packages.get(key), other._packages.get(key)
+            version = package.version if package is not None else None
+            other_version = other_package.version if other_package is not None else None
+            if version != other_version:
+                result[key] = (version, other_version)
+
+        return result
@@ -0,0 +1,140 @@
+"""Tests for lock file and requirements file models."""
+
+import pytest
+
+from kebechet.lockfile import (
+    PipfileLock,
+    Requirement,
+    RequirementsLock,
+    parse_requirements,
+)
+
+
+class TestRequirementsLock:
+    """Test parsing of requirements files."""
+
+    def test_parse_requirements(self, tmp_path):
+        """Test continuation lines, comments, hashes, markers, extras and included files."""
+        (tmp_path / "base.in").write_text("six>=1.0  # compatibility\n")
+        (tmp_path / "requirements.in").write_text(
+            "# direct dependencies\n"
+            "-r base.in\n"
+            "--index-url https://pypi.org/simple\n"
+            "Flask[async]~=2.0 ; python_version >= '3.8'\n"
+            "-e git+https://github.com/thoth-station/kebechet#egg=kebechet\n"
+            "requests \\\n"
+            "    >=2.0\n"
+        )
+
+        parsed = list(parse_requirements(str(tmp_path / "requirements.in")))
+
+        assert [r.key for r in parsed] == ["six", "flask", "kebechet", "requests"]
+        assert parsed[1].extras == ("async",)
+        assert parsed[1].specifier == "~=2.0"
+        assert parsed[1].marker == 'python_version >= "3.8"'
+        assert parsed[2].editable and parsed[2].url is not None
+        assert parsed[3].specifier == ">=2.0"
+
+    def test_load(self, tmp_path):
+        """Test loading a fully pinned down stack and diffing it."""
+        old_path = tmp_path / "old.txt"
+        old_path.write_text(
+            "-i https://pypi.org/simple\n"
+            "Flask==2.0.1 \\\n"
+            "    --hash=sha256:aaa \\\n"
+            "    --hash=sha256:bbb\n"
+            "six==1.15.0\n"
+        )
+        new_path = tmp_path / "new.txt"
+        new_path.write_text("flask==2.1.0\nsix==1.15.0\nrequests==2.28.0\n")
+
+        old, new = RequirementsLock.load(str(old_path)), RequirementsLock.load(
+            str(new_path)
+        )
+
+        assert len(old) == 2 and "FLASK" in old
+        assert old.get("flask").hashes == ("sha256:aaa", "sha256:bbb")
+        assert old.diff(new) == {
+            "flask": ("2.0.1", "2.1.0"),
+            "requests": (None, "2.28.0"),
+        }
+
+    def test_load_not_pinned(self, tmp_path):
+        """Test a requirement not pinned to a version is reported."""
+        path = tmp_path / "requirements.txt"
+        path.write_text("six==1.15.0\nflask>=2.0\n")
+
+        with pytest.raises(ValueError, match="flask>=2.0"):
+            RequirementsLock.load(str(path))
+
+    @pytest.mark.parametrize(
+        "line",
+        [
+            "-e .",
+            "--editable=.",
+            "-e git+https://github.com/thoth-station/kebechet",
+            "./vendor/six",
+            "/opt/wheels/six-1.15.0-py3-none-any.whl",
+        ],
+    )
+    def test_unnamed(self, tmp_path, line):
+        """Test projects installed from a URL or a path without egg fragment are kept without a name."""
+        requirements_in = tmp_path / "requirements.in"
+        requirements_in.write_text(f"six>=1.0\n{line}\n")
+        requirements_txt = tmp_path / "requirements.txt"
+        requirements_txt.write_text(f"six==1.15.0\n{line}\n")
+
+        parsed = list(parse_requirements(str(requirements_in)))
+        assert [r.key for r in parsed] == ["six", None]
+        assert parsed[1].url is not None and parsed[1].pinned_version is None
+
+        requirements_lock = RequirementsLock.load(str(requirements_txt))
+        assert [p.key for p in requirements_lock] == ["six"]
+
+    @pytest.mark.parametrize(
+        "line,pinned_version",
+        [
+            ("six==1.15.0", "1.15.0"),
+            ("six==1.*", None),
+            ("six>=1.0,==1.15.0", None),
+            ("six @ https://example.com/six-1.15.0.tar.gz", None),
+        ],
+    )
+    def test_pinned_version(self, line, pinned_version):
+        """Test detection of requirements pinned to a single version."""
+        assert Requirement.parse(line).pinned_version == pinned_version
+
+
+class TestPipfileLock:
+    """Test the model of Pipfile.lock."""
+
+    def test_diff(self):
+        """Test versions are compared per section, packages not pinned to a version have none."""
+        old = PipfileLock(
+            {
+                "default": {
+                    "Flask": {"version": "==2.0.1"},
+                    "six": {"version": "==1.15.0"},
+                    "kebechet": {"git": "https://github.com/thoth-station/kebechet"},
+                },
+                "develop": {"pytest": {"version": "==7.0.0"}},
+            }
+        )
+        new = PipfileLock(
+            {
+                "default": {
+                    "flask": {"version": "==2.1.0"},
+                    "six": {"version": "==1.15.0"},
+                    "kebechet": {"git": "https://github.com/thoth-station/kebechet"},
+                    "requests": {"version": "==2.28.0"},
+                },
+                "develop": {},
+            }
+        )
+
+        assert old.get_version("FLASK") == "2.0.1"
+        assert old.diff(new) == {
+            "flask": ("2.0.1", "2.1.0"),
+            "requests": (None, "2.28.0"),
+        }
+        assert old.diff(new, "develop") == {"pytest": ("7.0.0", None)}
@@ -1,22 +1,30 @@
 """Managers implemented in Kebechet."""
 
+import importlib
+
 from .exceptions import ManagerFailedException  # noqa F401
-from .info import InfoManager
-from .update import UpdateManager
-from .version import VersionManager  # noqa F401
-from .pipfile_requirements import PipfileRequirementsManager
-from .thoth_advise import ThothAdviseManager
-from .thoth_provenance import ThothProvenanceManager
-from .label_bot import ThothLabelBotManager
-from .config_initializer import ConfigInitializer  # noqa F401
-from .manager import ManagerBase  # noqa F401
+from .registry import ManagerRegistry, _BUILTIN_MANAGERS
+
+# Managers are imported on first use, importing all of them pulls in pipenv internals, thoth-glyph, thamos, ...
+REGISTERED_MANAGERS = ManagerRegistry(_BUILTIN_MANAGERS)
 
-REGISTERED_MANAGERS = {
-    "update": UpdateManager,
-    "info": InfoManager,
-    "version": VersionManager,
-    "pipfile-requirements": PipfileRequirementsManager,
-    "label-bot": ThothLabelBotManager,
-    "thoth-advise": ThothAdviseManager,
-    "thoth-provenance": ThothProvenanceManager,
+_LAZY_ATTRIBUTES = {
+    "InfoManager": ".info",
+    "UpdateManager": ".update",
+    "VersionManager": ".version",
+    "PipfileRequirementsManager": ".pipfile_requirements",
+    "ThothAdviseManager": ".thoth_advise",
+    "ThothProvenanceManager": ".thoth_provenance",
+    "ThothLabelBotManager": ".label_bot",
+    "ConfigInitializer": ".config_initializer",
+    "ManagerBase": ".manager",
 }
+
+
+def __getattr__(name: str):
+    """Import manager classes lazily on attribute access."""
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    return getattr(importlib.import_module(module_name, __name__), name)
@@ -21,6 +21,7 @@ import logging
 import typing
 import importlib.resources as pkg_resources
 
+from kebechet.managers.events import EVENTS_SUPPORTED
 from kebechet.managers.manager import ManagerBase
 from kebechet.utils import cloned_repo
 from . import resources
@@ -29,8 +30,7 @@ from ogr.abstract import PRStatus
 _INFO_ISSUE_NAME = "Kebechet info"
 
 _LOGGER = logging.getLogger(__name__)
-# Github and Gitlab events on which the manager acts upon.
-_EVENTS_SUPPORTED = ["issues", "issue"]
+_EVENTS_SUPPORTED = EVENTS_SUPPORTED["config-initializer"]
 
 
 _PR_BODY = """## Automatic configuration initialization
@@ -60,13 +60,15 @@ _BRANCH_NAME = "kebechet-initial-thoth-config"
 class ConfigInitializer(ManagerBase):
     """Manager for submitting information about running Kebechet instance."""
 
+    events_supported = _EVENTS_SUPPORTED
+
     def run(self) -> typing.Optional[dict]:  # type: ignore
         """Check for info issue and close it with a report."""
         thoth_config = pkg_resources.read_text(resources, "simple.thoth.yaml")
 
-        with cloned_repo(self, depth=1, branch=self.project.default_branch) as repo:
+        with cloned_repo(self, depth=1, branch=self.default_branch) as repo:
             self.repo = repo
-            prs = self.get_prs_by_branch(_BRANCH_NAME, status=PRStatus.all)
+            prs = self.get_prs_by_branch(_BRANCH_NAME, status=PRStatus.all, limit=1)
             if len(prs) > 0:
                 _LOGGER.debug("PR initializing .thoth.yaml already exists skipping...")
                 return None
@@ -81,6 +83,6 @@ class ConfigInitializer(ManagerBase):
             self.create_pr(
                 title="Thoth Configuration Initialization",
                 body=_PR_BODY,
-                target_branch=self.project.default_branch,
+                target_branch=self.default_branch,
                 source_branch=_BRANCH_NAME,
             )
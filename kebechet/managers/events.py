@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# Kebechet
+# Copyright(C) 2022 Kevin Postlethwait
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Webhook events managers act on, kept apart from the managers so that they can be checked without importing them."""
+
+from typing import Any, Dict, List, Optional
+
+# Github and Gitlab events on which the managers act upon.
+EVENTS_SUPPORTED: Dict[str, List[str]] = {
+    "config-initializer": ["issues", "issue"],
+    "info": ["issues", "issue"],
+    "label-bot": ["issues", "issue"],
+    "pipfile-requirements": ["push", "merge_request"],
+    "thoth-advise": ["push", "issues", "issue", "merge_request"],
+    "thoth-provenance": ["push", "issues", "issue", "merge_request"],
+    "update": ["push", "issues", "issue", "merge_request"],
+    "version": ["issues", "issue", "pull_request"],
+}
+
+
+def acts_on(
+    events_supported: Optional[List[str]], parsed_payload: Optional[Dict[str, Any]]
+) -> bool:
+    """Check whether any of the events carried by the payload is supported, runs without payload always act.
+
+    Payloads merged from several webhook events list all of them in "events", see kebechet.server.
+    """
+    if not parsed_payload or events_supported is None:
+        return True
+
+    events = parsed_payload.get("events") or [parsed_payload.get("event")]
+    return bool(set(events).intersection(events_supported))
@@ -20,6 +20,7 @@
 import logging
 import typing
 
+from kebechet.managers.events import EVENTS_SUPPORTED
 from kebechet.managers.manager import ManagerBase
 from kebechet.utils import cloned_repo
 
@@ -28,17 +29,18 @@ from .messages import INFO_REPORT
 _INFO_ISSUE_NAME = "Kebechet info"
 
 _LOGGER = logging.getLogger(__name__)
-# Github and Gitlab events on which the manager acts upon.
-_EVENTS_SUPPORTED = ["issues", "issue"]
+_EVENTS_SUPPORTED = EVENTS_SUPPORTED["info"]
 
 
 class InfoManager(ManagerBase):
     """Manager for submitting information about running Kebechet instance."""
 
+    events_supported = _EVENTS_SUPPORTED
+
     def run(self) -> typing.Optional[dict]:  # type: ignore
         """Check for info issue and close it with a report."""
         if self.parsed_payload:
-            if self.parsed_payload.get("event") not in _EVENTS_SUPPORTED:
+            if not self.acts_on(self.parsed_payload):
                 _LOGGER.info(
                     "Info manager doesn't act on %r events.",
                     self.parsed_payload.get("event"),
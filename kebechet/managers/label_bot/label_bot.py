@@ -18,6 +18,7 @@
 """AI powered labels for all your issues."""
 
 import logging
+from kebechet.managers.events import EVENTS_SUPPORTED
 from kebechet.managers.manager import ManagerBase
 import typing
 import os
@@ -26,8 +27,7 @@ import json
 
 _LOGGER = logging.getLogger(__name__)
 
-# Github and Gitlab events on which the manager acts upon.
-_EVENTS_SUPPORTED = ["issues", "issue"]
+_EVENTS_SUPPORTED = EVENTS_SUPPORTED["label-bot"]
 
 _GITHUB_LABEL_BOT_API = os.getenv("LABELBOT_URL")
 _MINIMUM_CONFIDENCE = 0.5
@@ -45,6 +45,8 @@ _ISSUES_TO_IGNORE = [
 class ThothLabelBotManager(ManagerBase):
     """Labels issue using Thoth Github Issue classifier."""
 
+    events_supported = _EVENTS_SUPPORTED
+
     def assign_label(self, response_dict: dict) -> typing.Tuple[typing.Any, float]:
         """Return the label with the highest confidence in the response."""
         label_confidence = []
@@ -57,7 +59,7 @@ class ThothLabelBotManager(ManagerBase):
     def run(self) -> typing.Optional[dict]:  # type: ignore
         """Check for info issue and close it with a report."""
         if self.parsed_payload:
-            if self.parsed_payload.get("event") not in _EVENTS_SUPPORTED:
+            if not self.acts_on(self.parsed_payload):
                 _LOGGER.info(
                     "Label manager doesn't act on %r events.",
                     self.parsed_payload.get("event"),
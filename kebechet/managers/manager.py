@@ -22,24 +22,70 @@ import platform
 import typing
 import git
 import os
-from typing import Dict, List, Optional
-from functools import partial
+from typing import Dict, List, NamedTuple, Optional
+from functools import lru_cache, partial
 
-import delegator
 import kebechet
 
 from kebechet.exception import PipenvError
 from ogr.services.base import BaseGitService
 from ogr.abstract import Issue, PullRequest, PRStatus
 
+from kebechet import rate_limit
+from kebechet import subprocess_runner
 from kebechet import utils
+from kebechet.config import _Config
+from kebechet.forge_snapshot import ForgeSnapshot
+from kebechet.managers import events
 
 _LOGGER = logging.getLogger(__name__)
 
 
+class EnvironmentDetails(NamedTuple):
+    """Details of the environment in which Kebechet runs, reported in pull requests and issues opened."""
+
+    kebechet_version: str
+    python_version: str
+    platform: str
+    pipenv_version: str
+
+    def __str__(self) -> str:
+        """Format the details for a pull request or an issue body."""
+        return f"""
+Kebechet version: {self.kebechet_version}
+Python version: {self.python_version}
+Platform: {self.platform}
+pipenv version: {self.pipenv_version}
+"""
+
+
+@lru_cache(maxsize=1)
+def get_pipenv_version() -> str:
+    """Get version of pipenv, it does not change during the process lifetime; failures are not cached."""
+    return ManagerBase.run_pipenv("pipenv --version")
+
+
+def get_environment_details() -> EnvironmentDetails:
+    """Get details of the environment in which Kebechet runs, pipenv is run only on the first call."""
+    try:
+        pipenv_version = get_pipenv_version()
+    except PipenvError as exc:
+        pipenv_version = f"Failed to obtain pipenv version:\n{exc.stderr}"
+
+    return EnvironmentDetails(
+        kebechet_version=kebechet.__version__,
+        python_version=platform.python_version(),
+        platform=platform.platform(),
+        pipenv_version=pipenv_version,
+    )
+
+
 class ManagerBase:
     """A base class for manager instances holding common and useful utilities."""
 
+    # Webhook events the manager acts on, None if the manager acts on any event.
+    events_supported: Optional[List[str]] = None
+
     def __init__(
         self,
         slug: str,
@@ -48,6 +94,9 @@ class ManagerBase:
         parsed_payload: Optional[dict] = None,
         metadata: Optional[dict] = None,
         runtime_environments: List[str] = None,
+        clone_session: Optional[utils.CloneSession] = None,
+        config: Optional[_Config] = None,
+        snapshot: Optional[ForgeSnapshot] = None,
     ):
         """Initialize manager instance for talking to services."""
         self.service_url: str = service.instance_url  # type: ignore
@@ -67,6 +116,17 @@ class ManagerBase:
         self._repo: git.Repo = None
         self.metadata = metadata
         self.runtime_environments = runtime_environments
+        # Clone shared with other managers run on the same repository, see kebechet.utils.cloned_repo.
+        self.clone_session = clone_session
+        # Parsed .thoth.yaml of the repository if it was obtained by the runner.
+        self.config = config
+        # Issues, pull requests and metadata of the project shared with other managers run on the same project.
+        self.snapshot = snapshot or ForgeSnapshot(self.project)
+
+    @property
+    def default_branch(self) -> str:
+        """Get default branch of the project."""
+        return self.snapshot.default_branch
 
     @property
     def repo(self):
@@ -78,37 +138,28 @@ class ManagerBase:
         """Set repository information and all derived information needed."""
         self._repo = repo
 
+    @classmethod
+    def acts_on(cls, parsed_payload: Optional[dict]) -> bool:
+        """Check whether the manager acts on any of the events carried by the payload."""
+        return events.acts_on(cls.events_supported, parsed_payload)
+
     @classmethod
     def get_environment_details(
         cls, as_dict=False
     ) -> typing.Union[str, typing.Dict[str, str]]:
-        """Get details for environment in which Kebechet runs."""
-        try:
-            pipenv_version = cls.run_pipenv("pipenv --version")
-        except PipenvError as exc:
-            pipenv_version = f"Failed to obtain pipenv version:\n{exc.stderr}"
-
+        """Get details for environment in which Kebechet runs, see get_environment_details for a structured object."""
+        environment_details = get_environment_details()
         return (
-            f"""
-Kebechet version: {kebechet.__version__}
-Python version: {platform.python_version()}
-Platform: {platform.platform()}
-pipenv version: {pipenv_version}
-"""
+            str(environment_details)
             if not as_dict
-            else {
-                "kebechet_version": kebechet.__version__,
-                "python_version": platform.python_version(),
-                "platform": platform.platform(),
-                "pipenv_version": pipenv_version,
-            }
+            else dict(environment_details._asdict())
         )
 
     @staticmethod
     def run_pipenv(cmd: str):
         """Run pipenv, raise :ref:kebechet.exception.PipenvError on any error holding all the information."""
         _LOGGER.debug(f"Running pipenv command {cmd!r}")
-        result = delegator.run(cmd)
+        result = subprocess_runner.run(cmd)
         if result.return_code != 0:
             _LOGGER.warning(result.err)
             raise PipenvError(result)
@@ -117,29 +168,34 @@ pipenv version: {pipenv_version}
 
     @classmethod
     def get_dependency_graph(cls, graceful: bool = False):
-        """Get dependency graph of the project."""
+        """Get dependency graph of the project as stated in Pipfile.lock, the locked environment is not installed."""
+        # Imported on use, requirement parsing is not needed by most of the runs.
+        from kebechet import dependency_graph
+
         try:
-            cls.run_pipenv(
-                "pipenv sync --dev"
-            )  # use sync so that deps are from Pipfile.lock
-            return cls.run_pipenv("pipenv graph")
-        except PipenvError as exc:
+            return dependency_graph.get_dependency_graph("Pipfile.lock")
+        except (OSError, ValueError) as exc:
             if not graceful:
                 raise
-            return f"Unable to obtain dependency graph:\n\n{exc.stderr}"
+            return f"Unable to obtain dependency graph:\n\n{exc}"
 
     def get_issue_by_title(self, title: str) -> Optional[Issue]:
         """Get an ogr.Issue object with a matching title."""
-        return utils.get_issue_by_title(self.project, title)
+        return self.snapshot.get_issue_by_title(title)
+
+    def get_prs_by_branch(
+        self, branch: str, status=PRStatus.open, limit: Optional[int] = None
+    ) -> List[PullRequest]:
+        """Get a list of ogr.PullRequest objects which are using the supplied branch name.
+
+        If limit is given, listing stops once the given number of pull requests is found.
+        """
+        return self.snapshot.get_prs_by_branch(branch, status=status, limit=limit)
 
-    def get_prs_by_branch(self, branch: str, status=PRStatus.open) -> List[PullRequest]:
-        """Get a list of ogr.PullRequest objects which are using the supplied branch name."""
-        to_ret = []
-        self.project.get_pr_list
-        for pr in self.project.get_pr_list(status=status):
-            if pr.source_branch == branch:
-                to_ret.append(pr)
-        return to_ret
+    def create_issue(self, title: str, body: str, **kwargs) -> Issue:
+        """Create an issue, the issue is visible to subsequent lookups done by managers in the run."""
+        rate_limit.pace_content_creation()
+        return self.snapshot.create_issue(title=title, body=body, **kwargs)
 
     def delete_remote_branch(self, branch: str):
         """Delete a remote branch without using pure git."""
@@ -155,12 +211,14 @@ pipenv version: {pipenv_version}
         if issue is None:
             _LOGGER.debug(f"Issue {title} not found, not closing.")
             return
+        rate_limit.pace_content_creation()
         issue.comment(comment)
         issue.close()
 
     def create_pr(self, title: str, body: str, source_branch: str, target_branch: str):
         """Create a PR but defaults to opening PR within a fork rather than on parent fork."""
-        return self.project.create_pr(
+        rate_limit.pace_content_creation()
+        pr = self.project.create_pr(
             title=title,
             body=body + f"\n<details>"
             f"<summary>Environment details</summary>"
@@ -169,6 +227,8 @@ pipenv version: {pipenv_version}
             source_branch=source_branch,
             fork_username=self.project.namespace if self.project.is_fork else None,
         )
+        self.snapshot.add_pull_request(pr)
+        return pr
 
     def _git_commit_push(
         self, commit_msg: str, branch_name: str, files: list, force_push: bool = False
@@ -188,6 +248,7 @@ pipenv version: {pipenv_version}
     def pr_comment(self, id: int, body: str):
         """Comment on the PR."""
         pr = self.project.get_pr(id)
+        rate_limit.pace_content_creation()
         pr.comment(body=body)
 
     def run(self, labels: list) -> typing.Optional[dict]:
@@ -21,6 +21,7 @@ import logging
 import tempfile
 from typing import Optional
 
+from kebechet.managers.events import EVENTS_SUPPORTED
 from kebechet.managers.manager import ManagerBase
 from kebechet.utils import cloned_repo
 
@@ -30,13 +31,14 @@ from pipenv.vendor.requirementslib.models.lockfile import Lockfile
 from github.GithubException import UnknownObjectException
 
 _LOGGER = logging.getLogger(__name__)
-# Github and Gitlab events on which the manager acts upon.
-_EVENTS_SUPPORTED = ["push", "merge_request"]
+_EVENTS_SUPPORTED = EVENTS_SUPPORTED["pipfile-requirements"]
 
 
 class PipfileRequirementsManager(ManagerBase):
     """Keep requirements.txt in sync with Pipfile or Pipfile.lock."""
 
+    events_supported = _EVENTS_SUPPORTED
+
     def _create_missing_pipenv_files_issue(self, file_name):
         issue_title = (
             f"Kebechet Pipfile Requirements Manager: no {file_name} found in repo"
@@ -56,12 +58,12 @@ class PipfileRequirementsManager(ManagerBase):
         issue = self.get_issue_by_title(issue_title)
         if issue:
             return
-        self.project.create_issue(title=issue_title, body=body)
+        self.create_issue(title=issue_title, body=body)
 
     def _remote_reqs_txt_eql_new_reqs(
         self, requirements: list, ref: Optional[str] = None
     ) -> bool:
-        ref = self.project.default_branch if ref is None else ref
+        ref = self.default_branch if ref is None else ref
         try:
             file_contents = self.project.get_file_content(
                 path="requirements.txt", ref=ref
@@ -75,7 +77,7 @@ class PipfileRequirementsManager(ManagerBase):
     def run(self, lockfile: bool = False) -> None:  # type: ignore
         """Keep your requirements.txt in sync with Pipfile/Pipfile.lock."""
         if self.parsed_payload:
-            if self.parsed_payload.get("event") not in _EVENTS_SUPPORTED:
+            if not self.acts_on(self.parsed_payload):
                 _LOGGER.info(
                     "PipfileRequirementsManager doesn't act on %r events.",
                     self.parsed_payload.get("event"),
@@ -115,6 +117,7 @@ class PipfileRequirementsManager(ManagerBase):
             for pr in self.get_prs_by_branch(branch_name):
                 pr.comment("requirements.txt up to date")
                 pr.close()
+                self.snapshot.discard_pull_request(pr)
             with cloned_repo(self) as repo:
                 self.repo = repo
                 self.delete_remote_branch(f"origin/{branch_name}")
@@ -141,10 +144,10 @@ class PipfileRequirementsManager(ManagerBase):
                 files=["requirements.txt"],
                 force_push=True,
             )
-            if not self.get_prs_by_branch(branch_name):
+            if not self.get_prs_by_branch(branch_name, limit=1):
                 self.create_pr(
                     title=f"Syncing requirements.txt using {'Pipfile.lock' if lockfile else 'Pipfile'}",
                     body="Automatic update of requirements.txt content.",
                     source_branch=branch_name,
-                    target_branch=self.project.default_branch,
+                    target_branch=self.default_branch,
                 )
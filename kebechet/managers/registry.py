@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# Kebechet
+# Copyright(C) 2022 Kevin Postlethwait
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Registry of managers, manager classes are imported on first use."""
+
+import importlib
+import logging
+import os
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, Optional, Type
+
+from .events import EVENTS_SUPPORTED, acts_on
+
+_LOGGER = logging.getLogger(__name__)
+
+# Managers shipped with Kebechet, the value is a dotted path to the manager class.
+_BUILTIN_MANAGERS = {
+    "update": "kebechet.managers.update.update:UpdateManager",
+    "info": "kebechet.managers.info.info:InfoManager",
+    "version": "kebechet.managers.version.version:VersionManager",
+    "pipfile-requirements": "kebechet.managers.pipfile_requirements.pipfile_requirements:PipfileRequirementsManager",
+    "label-bot": "kebechet.managers.label_bot.label_bot:ThothLabelBotManager",
+    "thoth-advise": "kebechet.managers.thoth_advise.thoth_advise:ThothAdviseManager",
+    "thoth-provenance": "kebechet.managers.thoth_provenance.thoth_provenance:ThothProvenanceManager",
+}
+
+# Third party managers can be registered by installed packages using entry points in this group.
+ENTRY_POINT_GROUP = "kebechet.managers"
+_ENTRY_POINTS_ENABLED = bool(int(os.getenv("KEBECHET_MANAGER_ENTRY_POINTS", 0)))
+
+
+def _import_object(path: str) -> Any:
+    """Import an object given its dotted path in the form of module:attribute."""
+    module_name, attribute = path.split(":", maxsplit=1)
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def _get_entry_points() -> Dict[str, str]:
+    """Get managers registered by installed packages, mapping of manager name to a dotted path."""
+    from importlib.metadata import entry_points
+
+    try:
+        group = entry_points(group=ENTRY_POINT_GROUP)  # type: ignore
+    except TypeError:  # Python < 3.10
+        group = entry_points().get(ENTRY_POINT_GROUP, [])
+
+    return {entry_point.name: entry_point.value for entry_point in group}
+
+
+class ManagerRegistry(Mapping):
+    """Mapping of manager names to manager classes, a manager module is imported once its class is requested.
+
+    Checking which managers act on an event does not import them for managers stated in kebechet.managers.events.
+    """
+
+    def __init__(
+        self, managers: Dict[str, str], entry_points: bool = _ENTRY_POINTS_ENABLED
+    ) -> None:
+        """Create registry from a mapping of manager names to dotted paths."""
+        self._paths = dict(managers)
+        self._entry_points = entry_points
+        self._entry_points_loaded = False
+        self._classes: Dict[str, Type] = {}
+
+    def _load_entry_points(self) -> None:
+        """Add managers registered using entry points, built-in managers take precedence."""
+        if not self._entry_points or self._entry_points_loaded:
+            return
+
+        self._entry_points_loaded = True
+        for name, path in _get_entry_points().items():
+            if name in self._paths:
+                _LOGGER.warning(
+                    "Manager %r registered by entry point %r is already registered, ignoring",
+                    name,
+                    path,
+                )
+                continue
+            self._paths[name] = path
+
+    def __getitem__(self, name: str) -> Type:
+        """Get manager class, import it if it was not imported yet."""
+        manager_class = self._classes.get(name)
+        if manager_class is not None:
+            return manager_class
+
+        if name not in self:
+            raise KeyError(name)
+
+        manager_class = _import_object(self._paths[name])
+        self._classes[name] = manager_class
+        return manager_class
+
+    def __contains__(self, name: object) -> bool:
+        """Check whether the manager is registered without importing it."""
+        if name not in self._paths:
+            self._load_entry_points()
+        return name in self._paths
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over names of registered managers."""
+        self._load_entry_points()
+        return iter(self._paths)
+
+    def __len__(self) -> int:
+        """Get number of registered managers."""
+        self._load_entry_points()
+        return len(self._paths)
+
+    def acts_on(self, name: str, parsed_payload: Optional[Dict[str, Any]]) -> bool:
+        """Check whether the given manager acts on the payload, the manager is imported only if necessary."""
+        if name not in self._classes and name in EVENTS_SUPPORTED:
+            return acts_on(EVENTS_SUPPORTED[name], parsed_payload)
+
+        return self[name].acts_on(parsed_payload)
@@ -32,6 +32,7 @@ from kebechet.managers.exceptions import DependencyManagementError  # noqa F401
 from kebechet.exception import InternalError  # noqa F401
 from kebechet.exception import PipenvError  # noqa F401
 from kebechet.utils import cloned_repo
+from kebechet.managers.events import EVENTS_SUPPORTED
 from kebechet.managers.manager import ManagerBase
 from thoth.common import ThothAdviserIntegrationEnum, cwd
 from thoth.common.enums import InternalTriggerEnum
@@ -56,8 +57,7 @@ from .messages import (
 
 _BRANCH_NAME = "kebechet-thoth"
 _LOGGER = logging.getLogger(__name__)
-# Github and Gitlab events on which the manager acts upon.
-_EVENTS_SUPPORTED = ["push", "issues", "issue", "merge_request"]
+_EVENTS_SUPPORTED = EVENTS_SUPPORTED["thoth-advise"]
 
 ADVISE_ISSUE_TITLE = "Kebechet Advise"
 
@@ -99,6 +99,8 @@ def _runtime_env_name_from_advise_response(response: dict):
 class ThothAdviseManager(ManagerBase):
     """Manage updates of dependencies using Thoth."""
 
+    events_supported = _EVENTS_SUPPORTED
+
     def __init__(self, *args, **kwargs):
         """Initialize ThothAdvise manager."""
         # We do API calls once for merge requests and we cache them for later use.
@@ -113,6 +115,14 @@ class ThothAdviseManager(ManagerBase):
         """Get SHA of the current head commit."""
         return self.repo.head.commit.hexsha
 
+    def _get_thoth_config(self) -> dict:
+        """Get parsed .thoth.yaml, configuration obtained by the runner is used if available."""
+        if self.config is not None:
+            return self.config.config
+
+        with open(".thoth.yaml", "r") as f:
+            return yaml.safe_load(f)
+
     def _construct_branch_name(self, analysis_id: str) -> str:
         """Construct branch name for the updated dependency."""
         return f"{_BRANCH_NAME}-{analysis_id[:26]}"
@@ -134,8 +144,7 @@ class ThothAdviseManager(ManagerBase):
         else:
             body = DEFAULT_PR_BODY.format(document_id=metadata["document_id"])
 
-        with open(".thoth.yaml", "r") as f:
-            thoth_config = yaml.safe_load(f)
+        thoth_config = self._get_thoth_config()
         overlays_dir = thoth_config.get("overlays_dir")
         full_name = (
             f"{overlays_dir}/{self.runtime_environment}"
@@ -145,7 +154,7 @@ class ThothAdviseManager(ManagerBase):
 
         body = f"# Automatic Update of {full_name} runtime-environment\n" + body
         # Delete branch if it didn't change Pipfile.lock
-        diff = self.repo.git.diff(self.project.default_branch, files)
+        diff = self.repo.git.diff(self.default_branch, files)
         if diff == "":
             _LOGGER.info("No changes necessary, exiting...")
             return None
@@ -167,7 +176,7 @@ class ThothAdviseManager(ManagerBase):
         pr = self.create_pr(
             title=commit_msg,
             body=body,
-            target_branch=self.project.default_branch,
+            target_branch=self.default_branch,
             source_branch=branch_name,
         )
         pr.add_label(*labels)
@@ -175,8 +184,7 @@ class ThothAdviseManager(ManagerBase):
         return pr
 
     def _write_advise(self, adv_results: dict):
-        with open(".thoth.yaml", "r") as f:
-            thoth_config = yaml.safe_load(f)
+        thoth_config = self._get_thoth_config()
         overlays_dir = thoth_config.get("overlays_dir")
         requirements_lock = adv_results["report"]["products"][0]["project"][
             "requirements_locked"
@@ -278,14 +286,14 @@ class ThothAdviseManager(ManagerBase):
     def run(self, labels: list, analysis_id=None):
         """Run Thoth Advising Bot."""
         if self.parsed_payload:
-            if self.parsed_payload.get("event") not in _EVENTS_SUPPORTED:
+            if not self.acts_on(self.parsed_payload):
                 _LOGGER.info(
                     "ThothAdviseManager doesn't act on %r events.",
                     self.parsed_payload.get("event"),
                 )
                 return
 
-        self._issue_list = self.project.get_issue_list()
+        self._issue_list = self.snapshot.get_issue_list()
         self._close_advise_issues4users_lacking_perms()
         self._tracking_issue = self._close_all_but_oldest_issue()
 
@@ -299,11 +307,10 @@ class ThothAdviseManager(ManagerBase):
                 )
                 return
 
-            with cloned_repo(self, self.project.default_branch, depth=1) as repo:
+            with cloned_repo(self, self.default_branch, depth=1) as repo:
                 self.repo = repo
 
-                with open(".thoth.yaml", "r") as f:
-                    thoth_config = yaml.safe_load(f)
+                thoth_config = self._get_thoth_config()
                 for e in self.runtime_environments or []:
                     try:
                         analysis_id = lib.advise_here(
@@ -342,14 +349,14 @@ class ThothAdviseManager(ManagerBase):
                         return False
             return True
         else:
-            with cloned_repo(self, self.project.default_branch, depth=1) as repo:
+            with cloned_repo(self, self.default_branch, depth=1) as repo:
                 self.repo = repo
                 _LOGGER.info("Using analysis results from %s", analysis_id)
                 res = lib.get_analysis_results(analysis_id)
                 if self._metadata_indicates_internal_trigger():
                     self._tracking_issue = None  # internal trigger advise results should not be tracked by issue
                 branch_name = self._construct_branch_name(analysis_id)
-                self._cached_merge_requests = self.project.get_pr_list()
+                self._cached_merge_requests = self.snapshot.get_pr_list()
 
                 if res is None:
                     _LOGGER.error(
@@ -357,8 +364,7 @@ class ThothAdviseManager(ManagerBase):
                     )
                     return False
                 _LOGGER.debug(json.dumps(res))
-                with open(".thoth.yaml", "r") as f:
-                    thoth_config = yaml.safe_load(f)
+                thoth_config = self._get_thoth_config()
                 overlays_dir = thoth_config.get("overlays_dir")
                 self.runtime_environment = _runtime_env_name_from_advise_response(
                     res[0]
@@ -29,6 +29,7 @@ import git  # noqa F401
 from kebechet.managers.exceptions import DependencyManagementError  # noqa F401
 from kebechet.exception import InternalError  # noqa F401
 from kebechet.exception import PipenvError  # noqa F401
+from kebechet.managers.events import EVENTS_SUPPORTED
 from kebechet.managers.manager import ManagerBase
 from kebechet.utils import cloned_repo
 
@@ -36,13 +37,14 @@ from kebechet.utils import cloned_repo
 _LOGGER = logging.getLogger(__name__)
 
 _BRANCH_NAME = "kebechet_thoth"
-# Github and Gitlab events on which the manager acts upon.
-_EVENTS_SUPPORTED = ["push", "issues", "issue", "merge_request"]
+_EVENTS_SUPPORTED = EVENTS_SUPPORTED["thoth-provenance"]
 
 
 class ThothProvenanceManager(ManagerBase):
     """Manage source issues of dependencies."""
 
+    events_supported = _EVENTS_SUPPORTED
+
     def __init__(self, *args, **kwargs):
         """Initialize ThothProvenance manager."""
         self._cached_merge_requests = None
@@ -71,12 +73,12 @@ class ThothProvenanceManager(ManagerBase):
         issue = self.get_issue_by_title(issue_title)
 
         if issue is None:
-            self.project.create_issue(title=issue_title, body=text_block, labels=labels)
+            self.create_issue(title=issue_title, body=text_block, labels=labels)
 
     def run(self, labels: list, analysis_id: Optional[str] = None):
         """Run the provenance check bot."""
         if self.parsed_payload:
-            if self.parsed_payload.get("event") not in _EVENTS_SUPPORTED:
+            if not self.acts_on(self.parsed_payload):
                 _LOGGER.info(
                     "ThothProvenanceManager doesn't act on %r events.",
                     self.parsed_payload.get("event"),
@@ -92,7 +94,7 @@ class ThothProvenanceManager(ManagerBase):
                     )
                     issue = self.get_issue_by_title("Missing pipenv files")
                     if issue is None:
-                        self.project.create_issue(
+                        self.create_issue(
                             title="Missing pipenv files",
                             body="Check your repository to make sure Pipfile and Pipfile.lock exist.",
                             labels=labels,
@@ -23,7 +23,6 @@ import os
 import logging
 import toml
 import re
-import json
 import typing
 from typing import Optional
 from itertools import chain
@@ -32,12 +31,19 @@ from datetime import datetime
 
 import git
 from ogr.abstract import Issue, PullRequest, PRStatus
+from packaging.specifiers import SpecifierSet
 from packaging.utils import canonicalize_name
+from packaging.version import InvalidVersion, Version
 from pipenv.patched.piptools.sync import PACKAGES_TO_IGNORE
+from pipenv.patched.pipfile.api import Pipfile as PipenvPipfile
 
 from kebechet.managers.exceptions import DependencyManagementError
 from kebechet.exception import InternalError
 from kebechet.exception import PipenvError
+from kebechet import lock_cache
+from kebechet.lockfile import PipfileLock, RequirementsLock, parse_requirements
+from kebechet import package_index
+from kebechet.managers.events import EVENTS_SUPPORTED
 from kebechet.managers.manager import ManagerBase
 from kebechet.utils import cloned_repo
 
@@ -61,7 +67,8 @@ from thamos.exceptions import (
 )
 
 _LOGGER = logging.getLogger(__name__)
-_RE_VERSION_DELIMITER = re.compile("(==|===|<=|>=|~=|!=|<|>|\\[)")
+# Check the package index for newer releases of direct dependencies before running the lock.
+_PRE_LOCK_CHECK = bool(int(os.getenv("KEBECHET_UPDATE_PRE_LOCK_CHECK", 1)))
 
 _ISSUE_FAILED_TO_UPDATE_DEPENDENCIES = (
     "Failed to update dependencies to their latest version for {env_name} environment"
@@ -84,8 +91,7 @@ _UPDATE_MERGE_REQUEST_TITLE = (
 )
 _UPDATE_COMMIT_MSG = ":arrow_up: " + _UPDATE_MERGE_REQUEST_TITLE
 
-# Github and Gitlab events on which the manager acts upon.
-_EVENTS_SUPPORTED = ["push", "issues", "issue", "merge_request"]
+_EVENTS_SUPPORTED = EVENTS_SUPPORTED["update"]
 
 # Note: We cannot use pipenv as a library (at least not now - version 2018.05.18) - there is a need to call it
 # as a subprocess as pipenv keeps path to the virtual environment in the global context that is not
@@ -105,6 +111,8 @@ def _string2branch_name(string: str):
 class UpdateManager(ManagerBase):
     """Manage updates of dependencies."""
 
+    events_supported = _EVENTS_SUPPORTED
+
     def __init__(self, *args, **kwargs):
         """Initialize update manager."""
         self._repo = None
@@ -135,35 +143,31 @@ class UpdateManager(ManagerBase):
         return os.getcwd()[len(top_level) + 1 :]
 
     @staticmethod
-    def _get_dependency_version(dependency: str, is_dev: bool) -> str:
-        """Get version of the given dependency from Pipfile.lock."""
+    def _load_pipfile_lock() -> PipfileLock:
+        """Load Pipfile.lock present in the working directory."""
         try:
-            with open("Pipfile.lock") as pipfile_lock:
-                pipfile_lock_content = json.load(pipfile_lock)
+            return PipfileLock.load("Pipfile.lock")
         except Exception as exc:
             # TODO: open a PR to fix this
             raise DependencyManagementError(
                 f"Failed to load Pipfile.lock file: {str(exc)}"
             ) from exc
 
-        # We look for normalized dependency in Pipfile.lock.
-        normalized_dependency = canonicalize_name(dependency)
-
+    @staticmethod
+    def _get_dependency_version(
+        dependency: str, is_dev: bool, pipfile_lock: PipfileLock
+    ) -> str:
+        """Get version of the given dependency from Pipfile.lock."""
         if (
-            normalized_dependency in PACKAGES_TO_IGNORE
+            canonicalize_name(dependency) in PACKAGES_TO_IGNORE
             or dependency in PACKAGES_TO_IGNORE
         ):
             _LOGGER.debug("Skipping... dependency is locked by pipenv.")
             return ""
 
-        package_info = pipfile_lock_content["develop" if is_dev else "default"].get(
-            normalized_dependency, {}
+        package_info = (
+            pipfile_lock.get(dependency, "develop" if is_dev else "default") or {}
         )
-        if not package_info:
-            # if not kept as normalized depedency in Pipfile.lock.
-            package_info = pipfile_lock_content["develop" if is_dev else "default"].get(
-                dependency, {}
-            )
 
         version = package_info.get("version")
         if version is None and package_info.get("git"):
@@ -219,24 +223,22 @@ class UpdateManager(ManagerBase):
         and generated Pipfile.lock from it.
         """
         input_file = "requirements-dev.in" if req_dev else "requirements.in"
-        with open(input_file, "r") as requirements_in_file:
-            content = requirements_in_file.read()
-
-        direct_dependencies = set()
-        for line in content.splitlines():
-            if line.strip().startswith("#"):
-                continue
-
-            # TODO: we could reuse pip or pipenv functionality here to parse file.
-            package_name = _RE_VERSION_DELIMITER.split(line)[0]
-            direct_dependencies.add(package_name.lower())
-
-        return direct_dependencies
+        try:
+            return {
+                requirement.name.lower()
+                for requirement in parse_requirements(input_file)
+                if requirement.name is not None
+            }
+        except ValueError as exc:
+            raise DependencyManagementError(
+                f"Failed to parse {input_file}: {str(exc)}"
+            ) from exc
 
     @classmethod
     def _get_direct_dependencies_version(cls, strict=True) -> dict:
         """Get versions of all direct dependencies based on the currently present Pipfile.lock."""
         default, develop = cls._get_direct_dependencies()
+        pipfile_lock = cls._load_pipfile_lock()
 
         result = {}
         default, develop = (
@@ -245,7 +247,9 @@ class UpdateManager(ManagerBase):
         )
         for dependency, is_dev in chain(default, develop):
             try:
-                version = cls._get_dependency_version(dependency, is_dev=is_dev)
+                version = cls._get_dependency_version(
+                    dependency, is_dev=is_dev, pipfile_lock=pipfile_lock
+                )
                 result[dependency] = {"version": version, "dev": is_dev}
             except InternalError as exc:
                 if strict:
@@ -256,37 +260,19 @@ class UpdateManager(ManagerBase):
         return result
 
     @staticmethod
-    def _get_requirements_txt_dependencies(req_dev: bool) -> dict:
-        """Gather dependencies from fully pinned down stack.
+    def _load_requirements_lock(req_dev: bool) -> RequirementsLock:
+        """Load fully pinned down stack.
 
-        Gather dependencies from either requirements.txt or requirements-dev.txt file,
+        Load either requirements.txt or requirements-dev.txt file,
         our requirements.txt and requirements-dev.txt holds fully pinned down stack.
         """
-        result = {}
         input_file = "requirements-dev.txt" if req_dev else "requirements.txt"
-        with open(input_file, "r") as requirements_file:
-            content = requirements_file.read()
-
-        for line in content.splitlines():
-            line = line.strip()
-
-            if line.startswith(("#", "-")) or not line:
-                continue
-
-            package_and_version = line.split("==", maxsplit=1)
-            if len(package_and_version) != 2:
-                raise DependencyManagementError(
-                    f"File {input_file} does not state fully locked "
-                    f"dependencies: {line!r} is not fully qualified dependency"
-                )
-            package_name, package_version = package_and_version
-            result[package_name] = {
-                # FIXME: tabs?
-                "version": package_version.split(r" ", maxsplit=1)[0],
-                "dev": False,
-            }
-
-        return result
+        try:
+            return RequirementsLock.load(input_file)
+        except ValueError as exc:
+            raise DependencyManagementError(
+                f"File {input_file} does not state fully locked dependencies: {str(exc)}"
+            ) from exc
 
     def _open_merge_request_update(
         self,
@@ -310,7 +296,7 @@ class UpdateManager(ManagerBase):
         merge_request = self.create_pr(
             title=_UPDATE_MERGE_REQUEST_TITLE.format(env_name=self.runtime_environment),
             body=body,
-            target_branch=self.project.default_branch,
+            target_branch=self.default_branch,
             source_branch=_string2branch_name(
                 _UPDATE_BRANCH_NAME.format(env_name=self.runtime_environment)
             ),
@@ -320,39 +306,192 @@ class UpdateManager(ManagerBase):
         self._pr_list.append(merge_request.url)
         return merge_request
 
-    def _get_all_outdated(self, old_direct_dependencies: dict) -> dict:
-        """Get all outdated packages based on Pipfile.lock."""
-        new_direct_dependencies = self._get_direct_dependencies_version()
+    @staticmethod
+    def _get_outdated(
+        changed: typing.Dict[str, typing.Tuple[Optional[str], Optional[str]]],
+        direct_dependencies: typing.Iterable[str],
+        is_dev: bool,
+    ) -> dict:
+        """Get direct dependencies out of packages whose versions changed, keyed by name as stated."""
+        result = {}
+        for package_name in direct_dependencies:
+            key = canonicalize_name(package_name)
+            if key not in changed or key in PACKAGES_TO_IGNORE:
+                continue
 
+            old_version, new_version = changed[key]
+            _LOGGER.debug(
+                f"Found new update for {package_name}: {old_version} -> {new_version} (dev: {is_dev})"
+            )
+            result[package_name] = {
+                "dev": is_dev,
+                "old_version": old_version,
+                "new_version": new_version,
+            }
+
+        return result
+
+    @classmethod
+    def _get_pipfile_lock_outdated(
+        cls, old_lock: PipfileLock, new_lock: PipfileLock
+    ) -> dict:
+        """Get direct dependencies stated in Pipfile whose versions differ in the given locks."""
+        default, develop = cls._get_direct_dependencies()
+        return {
+            **cls._get_outdated(old_lock.diff(new_lock, "default"), default, False),
+            **cls._get_outdated(old_lock.diff(new_lock, "develop"), develop, True),
+        }
+
+    @staticmethod
+    def _get_direct_dependencies_specifiers(
+        pipenv_used: bool, req_dev: bool
+    ) -> typing.Tuple[dict, bool]:
+        """Get version specifiers of direct dependencies and whether pre-releases are allowed.
+
+        Dependencies which do not come from a package index (VCS, local paths, URLs) are not stated.
+        """
         result = {}
-        for package_name in old_direct_dependencies.keys():
-            if old_direct_dependencies[package_name][
-                "version"
-            ] != new_direct_dependencies.get(package_name, {}).get("version"):
-                old_version = old_direct_dependencies[package_name]["version"]
-                new_version = new_direct_dependencies.get(package_name, {}).get(
-                    "version"
+        if pipenv_used:
+            try:
+                pipfile_content = toml.load("Pipfile")
+            except Exception as exc:
+                raise DependencyManagementError(
+                    f"Failed to load Pipfile: {str(exc)}"
+                ) from exc
+
+            for section in ("packages", "dev-packages"):
+                for package_name, entry in (pipfile_content.get(section) or {}).items():
+                    if isinstance(entry, dict):
+                        if any(k in entry for k in ("git", "path", "file", "editable")):
+                            continue
+                        entry = entry.get("version", "*")
+
+                    result[
+                        canonicalize_name(
+                            UpdateManager._remove_extra_deps(package_name)
+                        )
+                    ] = SpecifierSet("" if entry == "*" else entry)
+
+            allow_prereleases = bool(
+                (pipfile_content.get("pipenv") or {}).get("allow_prereleases")
+            )
+            return result, allow_prereleases
+
+        input_file = "requirements-dev.in" if req_dev else "requirements.in"
+        for requirement in parse_requirements(input_file):
+            if requirement.url is None:
+                result[requirement.key] = SpecifierSet(requirement.specifier)
+
+        return result, False
+
+    def _is_pipfile_lock_stale(self) -> bool:
+        """Check whether Pipfile.lock was computed for a different Pipfile than the present one."""
+        try:
+            pipfile_hash = PipenvPipfile.load("Pipfile", inject_env=False).hash
+            return self._load_pipfile_lock().pipfile_hash != pipfile_hash
+        except Exception as exc:
+            _LOGGER.debug("Cannot compare Pipfile.lock hash: %s", str(exc))
+            return True
+
+    def _has_update_candidates(
+        self, old_direct_dependencies: dict, pipenv_used: bool, req_dev: bool
+    ) -> bool:
+        """Check whether the lock needs to be run, i.e. whether it can change any direct dependency.
+
+        That is the case if the lock is out of sync with the stated direct dependencies or the package index
+        offers a newer release of any of them. The check is conservative, whenever it cannot be decided (the
+        index cannot be queried, ...) the lock is run.
+        """
+        if not _PRE_LOCK_CHECK:
+            return True
+
+        if pipenv_used and self._is_pipfile_lock_stale():
+            _LOGGER.debug("Pipfile.lock is out of date with Pipfile")
+            return True
+
+        try:
+            specifiers, allow_prereleases = self._get_direct_dependencies_specifiers(
+                pipenv_used=pipenv_used, req_dev=req_dev
+            )
+        except (DependencyManagementError, ValueError) as exc:
+            _LOGGER.debug("Cannot check for update candidates: %s", str(exc))
+            return True
+
+        locked = {
+            canonicalize_name(package_name): info["version"]
+            for package_name, info in old_direct_dependencies.items()
+        }
+        pinned = {}
+        for package_name, specifier in specifiers.items():
+            version = locked.get(package_name)
+            if version is None:
+                _LOGGER.debug("Dependency %r is not locked", package_name)
+                return True
+
+            if not version:
+                # Packages locked by pipenv itself carry no version.
+                continue
+
+            try:
+                pinned_version = Version(version)
+            except InvalidVersion:
+                return True
+
+            if not specifier.contains(pinned_version, prereleases=True):
+                _LOGGER.debug(
+                    "Locked %s==%s does not satisfy %r",
+                    package_name,
+                    version,
+                    str(specifier),
                 )
-                is_dev = old_direct_dependencies[package_name]["dev"]
+                return True
+
+            pinned[package_name] = pinned_version
 
+        available = package_index.get_all_versions(
+            pinned.keys(), index_urls=lock_cache.get_index_urls()
+        )
+        for package_name, pinned_version in pinned.items():
+            versions = available.get(package_name)
+            if versions is None:
+                _LOGGER.debug("Cannot obtain releases of %r", package_name)
+                return True
+
+            candidates = [
+                v
+                for v in specifiers[package_name].filter(
+                    versions,
+                    prereleases=allow_prereleases or pinned_version.is_prerelease,
+                )
+                if v > pinned_version
+            ]
+            if candidates:
                 _LOGGER.debug(
-                    f"Found new update for {package_name}: {old_version} -> {new_version} (dev: {is_dev})"
+                    "Found update candidate for %s: %s -> %s",
+                    package_name,
+                    pinned_version,
+                    candidates[-1],
                 )
-                result[package_name] = {
-                    "dev": is_dev,  # This should not change
-                    "old_version": old_version,
-                    "new_version": new_version,
-                }
+                return True
 
-        return result
+        return False
 
     @classmethod
     def _pipenv_lock_requirements(cls, output_file: str) -> None:
         """Perform pipenv lock into requirements.txt or requirements-dev.txt file."""
-        result = cls.run_pipenv("pipenv lock -r ")
+        result = lock_cache.run_lock("pipenv lock -r ", cls.run_pipenv)
         with open(output_file, "w") as requirements_file:
             requirements_file.write(result)
 
+    def _lock_requirements(self, req_dev: bool) -> None:
+        """Create a pipenv environment from requirements.in or requirements-dev.in file and lock it."""
+        if req_dev:
+            self._create_pipenv_environment(input_file="requirements-dev.in")
+            self._pipenv_lock_requirements("requirements-dev.txt")
+        else:
+            self._create_pipenv_environment(input_file="requirements.in")
+            self._pipenv_lock_requirements("requirements.txt")
+
     def _create_update(
         self,
         body: str,
@@ -378,7 +517,7 @@ class UpdateManager(ManagerBase):
                 raise e
             title = f"Uninitialized Overlay Dir ({self.runtime_environment})"
             if not self.get_issue_by_title(title):
-                self.project.create_issue(
+                self.create_issue(
                     title=title,
                     body=self.create_github_body(
                         template=UNINIT_OVERLAY_DIR_BODY,
@@ -415,10 +554,18 @@ class UpdateManager(ManagerBase):
         """Create a pipenv environment - Pipfile and Pipfile.lock from requirements.in or requirements-dev.in file."""
         if os.path.isfile(input_file) and input_file == "requirements.in":
             _LOGGER.info(f"Installing dependencies from {input_file}")
-            cls.run_pipenv(f"pipenv lock -r {input_file}")
+            lock_cache.run_lock(
+                f"pipenv lock -r {input_file}",
+                cls.run_pipenv,
+                output_files=("Pipfile", "Pipfile.lock"),
+            )
         elif os.path.isfile(input_file) and input_file == "requirements-dev.in":
             _LOGGER.info(f"Installing dependencies from {input_file}")
-            cls.run_pipenv(f"pipenv lock -r {input_file} --dev")
+            lock_cache.run_lock(
+                f"pipenv lock -r {input_file} --dev",
+                cls.run_pipenv,
+                output_files=("Pipfile", "Pipfile.lock"),
+            )
         else:
             raise DependencyManagementError(
                 "No dependency management found in the repo - no Pipfile nor requirements.in nor requirements-dev.in"
@@ -431,10 +578,10 @@ class UpdateManager(ManagerBase):
         # We use lock_func to optimize run - it will be called only if actual locking needs to be performed.
         if not pipenv_used and not os.path.isfile("requirements.txt") and not req_dev:
             _LOGGER.info("Initial lock based on requirements.in will be done")
-            lock_func = partial(self._pipenv_lock_requirements, "requirements.txt")
+            lock_func = partial(self._lock_requirements, req_dev=False)
         elif not pipenv_used and not os.path.isfile("requirements-dev.txt") and req_dev:
             _LOGGER.info("Initial lock based on requirements-dev.in will be done")
-            lock_func = partial(self._pipenv_lock_requirements, "requirements-dev.txt")
+            lock_func = partial(self._lock_requirements, req_dev=True)
         elif pipenv_used and not os.path.isfile("Pipfile.lock"):
             _LOGGER.info("Initial lock based on Pipfile will be done")
             lock_func = partial(self.run_pipenv, "pipenv lock")
@@ -458,7 +605,7 @@ class UpdateManager(ManagerBase):
             pr = self.create_pr(
                 title=commit_msg,
                 body="",
-                target_branch=self.project.default_branch,
+                target_branch=self.default_branch,
                 source_branch=branch_name,
             )
             pr.add_label(*labels)
@@ -476,7 +623,8 @@ class UpdateManager(ManagerBase):
                 )
                 return False
 
-            rebase_pr_branch_and_comment(self.repo, pr)
+            if rebase_pr_branch_and_comment(self.repo, pr):
+                self.snapshot.discard_pull_request(pr)
         else:
             raise DependencyManagementError(
                 f"Found two or more pull requests for initial requirements lock for branch {branch_name}"
@@ -488,7 +636,7 @@ class UpdateManager(ManagerBase):
     def _pipenv_update_all(cls):
         """Update all dependencies to their latest version."""
         _LOGGER.info("Updating all dependencies to their latest version")
-        cls.run_pipenv("pipenv lock --dev")
+        lock_cache.run_lock("pipenv lock --dev", cls.run_pipenv)
         return None
 
     def _add_refresh_comment(self, exc: PipenvError, issue: Issue):
@@ -566,7 +714,7 @@ class UpdateManager(ManagerBase):
                 _ISSUE_INITIAL_LOCK_NAME.format(env_name=self.runtime_environment)
             )
             if issue is None:
-                self.project.create_issue(
+                self.create_issue(
                     title=_ISSUE_INITIAL_LOCK_NAME.format(
                         env_name=self.runtime_environment
                     ),
@@ -611,7 +759,7 @@ class UpdateManager(ManagerBase):
             )
         )
         if issue is None:
-            self.project.create_issue(
+            self.create_issue(
                 title=_ISSUE_FAILED_TO_UPDATE_DEPENDENCIES.format(
                     env_name=self.runtime_environment
                 ),
@@ -645,32 +793,55 @@ class UpdateManager(ManagerBase):
         )
 
         if pipenv_used:
+            old_lock = self._load_pipfile_lock()
             old_direct_dependencies_version = self._get_direct_dependencies_version(
                 strict=False
             )
-            try:
-                self._pipenv_update_all()
-            except PipenvError as exc:
-                self._create_issue_for_pipenv_failure(exc=exc, labels=labels)
-                return {}
-            else:
-                # We were able to update all, close reported issue if any.
-                self.close_issue_and_comment(
-                    title=_ISSUE_FAILED_TO_UPDATE_DEPENDENCIES.format(
-                        env_name=self.runtime_environment
-                    ),
-                    comment=ISSUE_CLOSE_COMMENT.format(sha=self.sha),
+            if self._has_update_candidates(
+                old_direct_dependencies_version, pipenv_used=True, req_dev=req_dev
+            ):
+                try:
+                    self._pipenv_update_all()
+                except PipenvError as exc:
+                    self._create_issue_for_pipenv_failure(exc=exc, labels=labels)
+                    return {}
+                outdated = self._get_pipfile_lock_outdated(
+                    old_lock, self._load_pipfile_lock()
                 )
+            else:
+                _LOGGER.info("No newer release of any direct dependency, skipping lock")
+                outdated = {}
+
+            # We were able to update all (or there is nothing to update), close reported issue if any.
+            self.close_issue_and_comment(
+                title=_ISSUE_FAILED_TO_UPDATE_DEPENDENCIES.format(
+                    env_name=self.runtime_environment
+                ),
+                comment=ISSUE_CLOSE_COMMENT.format(sha=self.sha),
+            )
         else:  # either requirements.txt or requirements-dev.txt
-            old_environment = self._get_requirements_txt_dependencies(req_dev)
+            old_lock = self._load_requirements_lock(req_dev)
             direct_dependencies = self._get_direct_dependencies_requirements(req_dev)
+            direct_keys = {canonicalize_name(name) for name in direct_dependencies}
             old_direct_dependencies_version = {
-                k: v for k, v in old_environment.items() if k in direct_dependencies
+                package.name: {"version": package.version, "dev": False}
+                for package in old_lock
+                if package.key in direct_keys
             }
-            output_file = "requirements-dev.txt" if req_dev else "requirements.txt"
-            self._pipenv_lock_requirements(output_file)
+            if self._has_update_candidates(
+                old_direct_dependencies_version, pipenv_used=False, req_dev=req_dev
+            ):
+                # The pipenv environment is created only once there is something to resolve.
+                self._lock_requirements(req_dev)
+                outdated = self._get_outdated(
+                    old_lock.diff(self._load_requirements_lock(req_dev)),
+                    direct_dependencies,
+                    False,
+                )
+            else:
+                _LOGGER.info("No newer release of any direct dependency, skipping lock")
+                outdated = {}
 
-        outdated = self._get_all_outdated(old_direct_dependencies_version)
         _LOGGER.info(f"Outdated: {outdated}")
 
         # Undo changes made to Pipfile.lock by _pipenv_update_all. # Disabled for now.
@@ -679,7 +850,7 @@ class UpdateManager(ManagerBase):
         result = {}
         if outdated:
             # Do API calls only once, cache results.
-            self._cached_merge_requests = self.project.get_pr_list()
+            self._cached_merge_requests = self.snapshot.get_pr_list()
             body = self._generate_update_body(outdated)
             try:
                 versions = self._create_update(
@@ -692,14 +863,14 @@ class UpdateManager(ManagerBase):
                     result["merge request id"] = versions  # return the merge request id
             except Exception as exc:
                 _LOGGER.exception(
-                    f"Failed to create update for current {self.project.default_branch} {self.sha}: {str(exc)}"
+                    f"Failed to create update for current {self.default_branch} {self.sha}: {str(exc)}"
                 )
         else:
             self.close_issue_and_comment(
                 title=_UPDATE_MERGE_REQUEST_TITLE.format(
                     env_name=self.runtime_environment
                 ),
-                comment=f"Dependencies for default branch, {self.project.default_branch}, already up to date.",
+                comment=f"Dependencies for default branch, {self.default_branch}, already up to date.",
             )
 
         return result
@@ -707,7 +878,7 @@ class UpdateManager(ManagerBase):
     def run(self, labels: list = []) -> Optional[dict]:
         """Create a pull request for each and every direct dependency in the given org/repo (slug)."""
         if self.parsed_payload:
-            if self.parsed_payload.get("event") not in _EVENTS_SUPPORTED:
+            if not self.acts_on(self.parsed_payload):
                 _LOGGER.info(
                     "Update Manager doesn't act on %r events.",
                     self.parsed_payload.get("event"),
@@ -772,7 +943,8 @@ class UpdateManager(ManagerBase):
                             )
                     elif to_rebase:
                         for pr in to_rebase:
-                            rebase_pr_branch_and_comment(repo=self.repo, pr=pr)
+                            if rebase_pr_branch_and_comment(repo=self.repo, pr=pr):
+                                self.snapshot.discard_pull_request(pr)
                         continue
                     if os.path.isfile("Pipfile"):
                         _LOGGER.info("Using Pipfile for dependency management")
@@ -781,16 +953,12 @@ class UpdateManager(ManagerBase):
                             labels, pipenv_used=True, req_dev=False
                         )
                     elif os.path.isfile("requirements.in"):
-                        self._create_pipenv_environment(input_file="requirements.in")
                         _LOGGER.info("Using requirements.in for dependency management")
                         close_no_management_issue()
                         result = self._do_update(
                             labels, pipenv_used=False, req_dev=False
                         )
                         if os.path.isfile("requirements-dev.in"):
-                            self._create_pipenv_environment(
-                                input_file="requirements-dev.in"
-                            )
                             _LOGGER.info(
                                 "Using requirements-dev.in for dependency management"
                             )
@@ -806,7 +974,7 @@ class UpdateManager(ManagerBase):
                             )
                         )
                         if issue is None:
-                            self.project.create_issue(
+                            self.create_issue(
                                 title=_ISSUE_NO_DEPENDENCY_NAME.format(
                                     env_name=self.runtime_environment
                                 ),
@@ -0,0 +1,220 @@
+"""Tests for update manager."""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+from packaging.version import Version
+
+from kebechet.managers import UpdateManager
+from kebechet.managers.update import update
+
+_PIPFILE = """
+[[source]]
+url = "https://pypi.org/simple"
+verify_ssl = true
+name = "pypi"
+
+[packages]
+flask = "{flask}"
+
+[dev-packages]
+pytest = "*"
+"""
+
+
+class TestUpdateCandidates:
+    """Test detection of update candidates done before the lock is run."""
+
+    manager = UpdateManager.__new__(UpdateManager)
+
+    @pytest.fixture
+    def available(self, monkeypatch):
+        """Serve releases from a dictionary instead of a package index."""
+        releases = {
+            "flask": [Version("1.1.0"), Version("2.0.0"), Version("2.1.0")],
+            "pytest": [Version("7.0.0")],
+            "six": [Version("1.15.0"), Version("1.16.0")],
+        }
+        monkeypatch.setattr(
+            update.package_index,
+            "get_all_versions",
+            lambda names, index_urls: {name: releases.get(name) for name in names},
+        )
+        return releases
+
+    @staticmethod
+    def _write_pipenv_files(tmp_path, flask_specifier, flask_version, stale=False):
+        """Write Pipfile and Pipfile.lock computed for it, or for a different Pipfile if stale."""
+        pipfile = tmp_path / "Pipfile"
+        pipfile.write_text(_PIPFILE.format(flask=flask_specifier))
+        pipfile_hash = update.PipenvPipfile.load(str(pipfile), inject_env=False).hash
+        lock = {
+            "_meta": {"hash": {"sha256": "0" * 64 if stale else pipfile_hash}},
+            "default": {"flask": {"version": f"=={flask_version}"}},
+            "develop": {"pytest": {"version": "==7.0.0"}},
+        }
+        (tmp_path / "Pipfile.lock").write_text(json.dumps(lock))
+
+    @pytest.mark.parametrize(
+        "flask_specifier,flask_version,stale,expected",
+        [
+            ("*", "2.1.0", False, False),
+            ("<2.1", "2.0.0", False, False),
+            ("*", "2.0.0", False, True),
+            # The upper bound was tightened, the pin no longer satisfies it.
+            ("<2", "2.1.0", False, True),
+            ("*", "2.1.0", True, True),
+        ],
+    )
+    def test_pipenv(
+        self,
+        tmp_path,
+        monkeypatch,
+        available,
+        flask_specifier,
+        flask_version,
+        stale,
+        expected,
+    ):
+        """Test the lock is run only if it can change a direct dependency."""
+        self._write_pipenv_files(tmp_path, flask_specifier, flask_version, stale)
+        monkeypatch.chdir(tmp_path)
+
+        old = UpdateManager._get_direct_dependencies_version(strict=False)
+        assert (
+            self.manager._has_update_candidates(old, pipenv_used=True, req_dev=False)
+            is expected
+        )
+
+    def test_pipenv_added_dependency(self, tmp_path, monkeypatch, available):
+        """Test a direct dependency missing in the lock forces the lock."""
+        self._write_pipenv_files(tmp_path, "*", "2.1.0")
+        pipfile = tmp_path / "Pipfile"
+        pipfile.write_text(
+            pipfile.read_text().replace("[dev-packages]", 'six = "*"\n[dev-packages]')
+        )
+        monkeypatch.chdir(tmp_path)
+        # Keep the hash in sync so that only the missing dependency is detected.
+        lock = json.loads((tmp_path / "Pipfile.lock").read_text())
+        lock["_meta"]["hash"]["sha256"] = update.PipenvPipfile.load(
+            str(pipfile), inject_env=False
+        ).hash
+        (tmp_path / "Pipfile.lock").write_text(json.dumps(lock))
+
+        old = UpdateManager._get_direct_dependencies_version(strict=False)
+        assert self.manager._has_update_candidates(old, pipenv_used=True, req_dev=False)
+
+    def test_pipfile_lock_outdated(self, tmp_path, monkeypatch):
+        """Test outdated direct dependencies are computed out of the locks before and after the update."""
+        self._write_pipenv_files(tmp_path, "*", "2.0.0")
+        monkeypatch.chdir(tmp_path)
+        old_lock = UpdateManager._load_pipfile_lock()
+        self._write_pipenv_files(tmp_path, "*", "2.1.0")
+
+        assert UpdateManager._get_pipfile_lock_outdated(
+            old_lock, UpdateManager._load_pipfile_lock()
+        ) == {"flask": {"dev": False, "old_version": "2.0.0", "new_version": "2.1.0"}}
+
+    @pytest.mark.parametrize(
+        "requirements_in,six_version,expected",
+        [
+            ("six\n-e .\n", "1.16.0", False),
+            ("six\n", "1.15.0", True),
+            ("six<1.16\n", "1.15.0", False),
+            ("six<1.15\n", "1.15.0", True),
+            ("six\nflask\n", "1.16.0", True),
+        ],
+    )
+    def test_requirements(
+        self, tmp_path, monkeypatch, available, requirements_in, six_version, expected
+    ):
+        """Test the check on requirements.in and requirements.txt files."""
+        (tmp_path / "requirements.in").write_text(requirements_in)
+        (tmp_path / "requirements.txt").write_text(f"six=={six_version}\n-e .\n")
+        monkeypatch.chdir(tmp_path)
+
+        old = {
+            "six": {"version": six_version, "dev": False},
+        }
+        assert (
+            self.manager._has_update_candidates(old, pipenv_used=False, req_dev=False)
+            is expected
+        )
+
+    def test_index_unavailable(self, tmp_path, monkeypatch, available):
+        """Test the lock is run if releases cannot be obtained."""
+        (tmp_path / "requirements.in").write_text("unknown\n")
+        monkeypatch.chdir(tmp_path)
+
+        old = {"unknown": {"version": "1.0.0", "dev": False}}
+        assert self.manager._has_update_candidates(
+            old, pipenv_used=False, req_dev=False
+        )
+
+
+class TestDoUpdate:
+    """Test the update done on requirements.in and requirements.txt files."""
+
+    @pytest.fixture
+    def manager(self, tmp_path, monkeypatch):
+        """Get a manager working on up to date requirements files, record environments created."""
+        (tmp_path / "requirements.in").write_text("six\n")
+        (tmp_path / "requirements.txt").write_text("six==1.16.0\n")
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(
+            update.package_index,
+            "get_all_versions",
+            lambda names, index_urls: {name: [Version("1.16.0")] for name in names},
+        )
+
+        manager = UpdateManager.__new__(UpdateManager)
+        manager.runtime_environment = "default"
+        manager.snapshot = SimpleNamespace(default_branch="master")
+        manager.closed = []
+        manager.environments = []
+        manager._create_or_update_initial_lock = lambda **_: None
+        manager.close_issue_and_comment = lambda title, comment: manager.closed.append(
+            title
+        )
+        manager._create_pipenv_environment = (
+            lambda input_file: manager.environments.append(input_file)
+        )
+        return manager
+
+    def test_no_candidates(self, manager):
+        """Test the pipenv environment is not created if no direct dependency can be updated."""
+        assert manager._do_update([], pipenv_used=False, req_dev=False) == {}
+        assert manager.environments == []
+        assert len(manager.closed) == 1
+
+    def test_candidates(self, manager, monkeypatch):
+        """Test the pipenv environment is created and locked once a direct dependency can be updated."""
+        monkeypatch.setattr(
+            update.package_index,
+            "get_all_versions",
+            lambda names, index_urls: {name: [Version("1.17.0")] for name in names},
+        )
+        locked = []
+
+        def _pipenv_lock_requirements(output_file):
+            locked.append(output_file)
+            with open(output_file, "w") as requirements_file:
+                requirements_file.write("six==1.17.0\n")
+
+        manager._pipenv_lock_requirements = _pipenv_lock_requirements
+        manager._generate_update_body = lambda outdated: manager.outdated.append(
+            outdated
+        )
+        manager.outdated = []
+        manager.snapshot.get_pr_list = lambda: []
+        manager._create_update = lambda **_: 1
+
+        assert manager._do_update([], pipenv_used=False, req_dev=False) == {
+            "merge request id": 1
+        }
+        assert manager.environments == ["requirements.in"]
+        assert locked == ["requirements.txt"]
+        assert manager.outdated == [
+            {"six": {"dev": False, "old_version": "1.16.0", "new_version": "1.17.0"}}
+        ]
@@ -41,7 +41,7 @@ def num_commits_behind(repo: git.Repo, target_branch: str, source_branch: str) -
 def rebase_pr_branch_and_comment(
     repo: git.Repo, pr: PullRequest, close_on_failure: bool = True
 ):
-    """Rebase PR on top of target branch."""
+    """Rebase PR on top of target branch, return True if the PR was closed as it could not be rebased."""
     if pr.status != PRStatus.open:  # PR is still open before attempting rebase.
         return
     num_behind = num_commits_behind(
@@ -60,6 +60,7 @@ def rebase_pr_branch_and_comment(
         if close_on_failure:
             pr.comment(f"Failed to rebase PR on top of {pr.target_branch}.")
             pr.close()
+            return True
         else:
             raise exc
     finally:
@@ -23,7 +23,8 @@ from typing import List, Tuple
 import yaml
 from github.GithubException import GithubException
 
-from kebechet.utils import cloned_repo, get_issue_by_title
+from kebechet.utils import cloned_repo
+from kebechet.managers.events import EVENTS_SUPPORTED
 from kebechet.managers.manager import ManagerBase
 from kebechet.managers.exceptions import ManagerFailedException
 from thoth.glyph import MLModel, Format, ThothGlyphException
@@ -52,8 +53,7 @@ _MULTIPLE_VERSIONS_FOUND_ISSUE_BODY = "Please have only one version string, to f
 _NO_MAINTAINERS_ERROR = "No release maintainers stated for this repository"
 _BODY_TRUNCATED = "The changelog body was truncated, please check CHANGELOG.md for the complete changelog."
 _DIRECT_VERSION_TITLE = " release"
-# Github and Gitlab events on which the manager acts upon.
-_EVENTS_SUPPORTED = ["issues", "issue", "pull_request"]
+_EVENTS_SUPPORTED = EVENTS_SUPPORTED["version"]
 # Maximum number of log messages in a single release. Set due to ultrahook limits.
 _MAX_CHANELOG_SIZE = 300
 
@@ -61,6 +61,8 @@ _MAX_CHANELOG_SIZE = 300
 class VersionManager(ManagerBase):
     """Automatic version management for Python projects."""
 
+    events_supported = _EVENTS_SUPPORTED
+
     # Previous release tag present
     _PREV_RELEASE_TAG = False
 
@@ -76,7 +78,7 @@ class VersionManager(ManagerBase):
             _LOGGER.exception("Failed to load maintainers file")
             issue = self.get_issue_by_title(_NO_MAINTAINERS_ERROR)
             if issue is None:
-                self.project.create_issue(
+                self.create_issue(
                     title=_NO_MAINTAINERS_ERROR,
                     body="This repository is not correctly setup for automated version releases.",
                     labels=self.labels,
@@ -160,7 +162,7 @@ class VersionManager(ManagerBase):
                 body=trigger.construct_pr_body(
                     changelog=changelog, has_prev_release=has_prev_release
                 ),
-                target_branch=self.project.default_branch,
+                target_branch=self.default_branch,
                 source_branch=branch_name,
             )
         except GithubException as ghub_exc:
@@ -195,8 +197,7 @@ class VersionManager(ManagerBase):
         """Check issues for new issue request, if a request exists, issue a new PR with adjusted version in sources."""
         self.labels = labels
         if self.parsed_payload:
-            event_type = self.parsed_payload.get("event")
-            if event_type not in _EVENTS_SUPPORTED:
+            if not self.acts_on(self.parsed_payload):
                 _LOGGER.info(
                     "Version Manager doesn't act on %r events.",
                     self.parsed_payload.get("event"),
@@ -261,11 +262,9 @@ class VersionManager(ManagerBase):
                 label_config = ReleaseLabelConfig.from_dict(release_label_config)
             except ValueError as exc:
                 _LOGGER.warning(constants._INVALID_LABEL_CONFIG_ISSUE_NAME)
-                i = get_issue_by_title(
-                    self.project, constants._INVALID_LABEL_CONFIG_ISSUE_NAME
-                )
+                i = self.get_issue_by_title(constants._INVALID_LABEL_CONFIG_ISSUE_NAME)
                 if i is None:
-                    self.project.create_issue(
+                    self.create_issue(
                         title=constants._INVALID_LABEL_CONFIG_ISSUE_NAME,
                         body=messages.RELEASE_LABEL_CONFIG_INVALID,
                         labels=labels,
@@ -307,7 +306,7 @@ class VersionManager(ManagerBase):
 
         reported_issues = []
         version_update_complete = False
-        for issue in self.project.get_issue_list():
+        for issue in self.snapshot.get_issue_list():
             issue_title = issue.title.strip()
 
             if issue_title.startswith(
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# Kebechet
+# Copyright(C) 2022 Kevin Postlethwait
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Metadata of packages obtained from Python package indexes.
+
+Releases are listed using the simple repository API (PEP 503 and PEP 691) so that any index, including a local
+directory served as file:// URL, can be used. Metadata of releases are obtained from the JSON API where available.
+Responses are kept in the cache shared by all the managers, see index_cache.
+"""
+
+import json
+import logging
+import os
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+from urllib.request import url2pathname
+
+import requests
+from packaging.utils import (
+    InvalidSdistFilename,
+    InvalidWheelFilename,
+    canonicalize_name,
+    parse_sdist_filename,
+    parse_wheel_filename,
+)
+from packaging.version import InvalidVersion, Version
+
+from . import index_cache
+
+_LOGGER = logging.getLogger(__name__)
+
+# Number of requests to package indexes issued concurrently.
+_WORKERS = int(os.getenv("KEBECHET_PACKAGE_INDEX_WORKERS", 8))
+
+_DEFAULT_INDEX_URL = "https://pypi.org/simple"
+
+_SIMPLE_JSON = "application/vnd.pypi.simple.v1+json"
+_SIMPLE_ACCEPT = (
+    f"{_SIMPLE_JSON}, application/vnd.pypi.simple.v1+html;q=0.2, text/html;q=0.01"
+)
+
+# Requirements of released packages do not change, they are kept for the process lifetime.
+_REQUIRES_DIST: Dict[Tuple[str, str], Optional[List[str]]] = {}
+
+
+def get_json_api_url(index_url: str, name: str, version: Optional[str] = None) -> str:
+    """Get URL of the JSON API of the given index for the given package (release if version is given)."""
+    base_url = index_url.rstrip("/")
+    if base_url.endswith("/simple"):
+        base_url = base_url[: -len("/simple")] + "/pypi"
+
+    if version is None:
+        return f"{base_url}/{canonicalize_name(name)}/json"
+
+    return f"{base_url}/{canonicalize_name(name)}/{version}/json"
+
+
+def _fetch_requires_dist(
+    name: str, version: str, index_urls: Iterable[str]
+) -> Optional[List[str]]:
+    """Obtain requirements of the given release from the first index which knows it."""
+    for index_url in index_urls:
+        url = get_json_api_url(index_url, name, version)
+        try:
+            # Metadata of a release do not change once it is published, a missing release is retried.
+            response = index_cache.get(url, ttl=float("inf"))
+        except requests.RequestException as exc:
+            _LOGGER.debug("Failed to obtain metadata from %s: %s", url, str(exc))
+            continue
+
+        if response.status_code != 200:
+            _LOGGER.debug(
+                "Failed to obtain metadata from %s: HTTP %d", url, response.status_code
+            )
+            continue
+
+        try:
+            return response.json()["info"].get("requires_dist") or []
+        except (ValueError, KeyError, TypeError):
+            _LOGGER.debug("Index at %s does not provide JSON API", index_url)
+
+    return None
+
+
+def get_requires_dist(
+    name: str, version: str, index_urls: Optional[Iterable[str]] = None
+) -> Optional[List[str]]:
+    """Get requirements of the given release as stated in its metadata, None if they cannot be obtained."""
+    key = (canonicalize_name(name), version)
+    if key in _REQUIRES_DIST:
+        return _REQUIRES_DIST[key]
+
+    requires_dist = _fetch_requires_dist(
+        name, version, index_urls or [_DEFAULT_INDEX_URL]
+    )
+    # Failures are not kept, the index might be available next time.
+    if requires_dist is not None:
+        _REQUIRES_DIST[key] = requires_dist
+
+    return requires_dist
+
+
+def get_last_serial(
+    name: str,
+    index_urls: Optional[Iterable[str]] = None,
+    max_age: Optional[float] = None,
+) -> Optional[int]:
+    """Get serial of the last change of the given project on the first index which reports it.
+
+    The serial changes with each release (or removal of a release) of the project, None is returned if
+    no index reports it. A cached serial older than max_age seconds (the cache TTL by default) is revalidated.
+    """
+    for index_url in index_urls or [_DEFAULT_INDEX_URL]:
+        url = get_json_api_url(index_url, name)
+        try:
+            response = index_cache.head(url, ttl=max_age)
+        except requests.RequestException as exc:
+            _LOGGER.debug("Failed to obtain serial from %s: %s", url, str(exc))
+            continue
+
+        serial = response.headers.get("X-PyPI-Last-Serial")
+        if response.status_code == 200 and serial is not None:
+            try:
+                return int(serial)
+            except ValueError:
+                pass
+
+        _LOGGER.debug("Index at %s does not report serial of %r", index_url, name)
+
+    return None
+
+
+def get_all_last_serials(
+    names: Iterable[str],
+    index_urls: Optional[Iterable[str]] = None,
+    max_age: Optional[float] = None,
+) -> Dict[str, Optional[int]]:
+    """Get serials of the last change of all the given projects, keyed by canonical name."""
+    index_urls = list(index_urls or [_DEFAULT_INDEX_URL])
+    names = sorted({canonicalize_name(name) for name in names})
+    with ThreadPoolExecutor(max_workers=_WORKERS) as executor:
+        return dict(
+            zip(
+                names,
+                executor.map(
+                    lambda name: get_last_serial(
+                        name, index_urls=index_urls, max_age=max_age
+                    ),
+                    names,
+                ),
+            )
+        )
+
+
+def get_all_requires_dist(
+    releases: Iterable[Tuple[str, str]], index_urls: Optional[Iterable[str]] = None
+) -> Dict[Tuple[str, str], Optional[List[str]]]:
+    """Get requirements of all the given releases, releases not cached are obtained concurrently."""
+    index_urls = list(index_urls or [_DEFAULT_INDEX_URL])
+    releases = list(releases)
+    with ThreadPoolExecutor(max_workers=_WORKERS) as executor:
+        results = executor.map(
+            lambda release: get_requires_dist(*release, index_urls=index_urls),
+            releases,
+        )
+        return dict(zip(releases, results))
+
+
+class _SimplePageParser(HTMLParser):
+    """Collect distribution files listed on an HTML page of the simple repository API."""
+
+    def __init__(self) -> None:
+        """Create a parser with no files collected."""
+        super().__init__()
+        self.files: List[Tuple[str, bool]] = []
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        """Collect file name and yanked status of a link."""
+        if tag != "a":
+            return
+
+        attributes = dict(attrs)
+        href = attributes.get("href")
+        if href:
+            file_name = posixpath.basename(unquote(urlparse(href).path))
+            self.files.append((file_name, "data-yanked" in attributes))
+
+
+def _get_version(file_name: str) -> Optional[Version]:
+    """Get version of the release the given distribution file belongs to."""
+    try:
+        if file_name.endswith(".whl"):
+            return parse_wheel_filename(file_name)[1]
+        elif file_name.endswith((".tar.gz", ".zip")):
+            return parse_sdist_filename(file_name)[1]
+    except (InvalidWheelFilename, InvalidSdistFilename, InvalidVersion):
+        _LOGGER.debug("Ignoring distribution with invalid file name %r", file_name)
+
+    return None
+
+
+def _list_files(index_url: str, name: str) -> Optional[List[Tuple[str, bool]]]:
+    """List distribution files of the given project on the given index with their yanked status."""
+    url = f"{index_url.rstrip('/')}/{canonicalize_name(name)}/"
+
+    if url.startswith("file://"):
+        path = url2pathname(urlparse(url).path)
+        if os.path.isfile(os.path.join(path, "index.html")):
+            with open(os.path.join(path, "index.html")) as page:
+                content_type, body = "text/html", page.read()
+        elif os.path.isdir(path):
+            # A plain directory of distributions.
+            return [(file_name, False) for file_name in os.listdir(path)]
+        else:
+            return None
+    else:
+        try:
+            response = index_cache.get(url, headers={"Accept": _SIMPLE_ACCEPT})
+        except requests.RequestException as exc:
+            _LOGGER.debug("Failed to list releases at %s: %s", url, str(exc))
+            return None
+
+        if response.status_code != 200:
+            _LOGGER.debug(
+                "Failed to list releases at %s: HTTP %d", url, response.status_code
+            )
+            return None
+
+        content_type, body = response.headers.get("Content-Type", ""), response.text
+
+    if content_type.startswith(_SIMPLE_JSON):
+        return [
+            (file_info["filename"], bool(file_info.get("yanked")))
+            for file_info in json.loads(body).get("files") or []
+        ]
+
+    parser = _SimplePageParser()
+    parser.feed(body)
+    return parser.files
+
+
+def get_versions(
+    name: str, index_urls: Optional[Iterable[str]] = None
+) -> Optional[List[Version]]:
+    """Get versions released on the first index which lists the given project, yanked releases are omitted.
+
+    None is returned if no index lists the project.
+    """
+    for index_url in index_urls or [_DEFAULT_INDEX_URL]:
+        files = _list_files(index_url, name)
+        if files is None:
+            continue
+
+        versions = set()
+        for file_name, is_yanked in files:
+            version = _get_version(file_name)
+            if version is not None and not is_yanked:
+                versions.add(version)
+
+        # A release is yanked only if all its files are, yanked files of other releases are ignored.
+        return sorted(versions)
+
+    return None
+
+
+def get_all_versions(
+    names: Iterable[str], index_urls: Optional[Iterable[str]] = None
+) -> Dict[str, Optional[List[Version]]]:
+    """Get versions released for all the given projects, keyed by canonical name."""
+    index_urls = list(index_urls or [_DEFAULT_INDEX_URL])
+    names = sorted({canonicalize_name(name) for name in names})
+    with ThreadPoolExecutor(max_workers=_WORKERS) as executor:
+        return dict(
+            zip(
+                names,
+                executor.map(
+                    lambda name: get_versions(name, index_urls=index_urls), names
+                ),
+            )
+        )
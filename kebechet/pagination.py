@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# Kebechet
+# Copyright(C) 2022 Kevin Postlethwait
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Lazy iteration over paginated issue and pull request listings of forges.
+
+ogr materializes all the pages of a listing before returning it. Iterators here request the next page only once
+the previous one was consumed so that a lookup can stop as soon as it finds what it looks for. Items are listed
+newest first where the forge allows it. Lookups by title and by source branch use filters of the forge where
+available so that only matching items are transferred. The GitHub search API is not used, it is rate limited
+separately and much more strictly than the rest of the API.
+"""
+
+import logging
+from typing import Any, Dict, Iterator, Optional
+
+from github import UnknownObjectException
+from ogr.abstract import GitProject, Issue, IssueStatus, PRStatus, PullRequest
+from ogr.exceptions import IssueTrackerDisabled
+from ogr.services.github import GithubIssue, GithubProject, GithubPullRequest
+from ogr.services.gitlab import GitlabIssue, GitlabProject, GitlabPullRequest
+from ogr.services.pagure import PagureIssue, PagureProject, PagurePullRequest
+
+_LOGGER = logging.getLogger(__name__)
+
+# Number of items requested per page from Pagure, the maximum allowed.
+_PAGURE_PAGE_SIZE = 100
+
+
+def _iter_pagure(
+    project: PagureProject, endpoint: str, key: str, params: Dict[str, Any]
+) -> Iterator[Dict[str, Any]]:
+    """Iterate over raw items of a paginated Pagure listing."""
+    params = dict(params, page=1, per_page=_PAGURE_PAGE_SIZE)
+    while True:
+        response = project._call_project_api(endpoint, params=params)
+        yield from response[key]
+        if not response["pagination"]["next"]:
+            return
+        params["page"] += 1
+
+
+def iter_issues(
+    project: GitProject, status: IssueStatus = IssueStatus.open
+) -> Iterator[Issue]:
+    """Iterate over issues of the project in the given status, pages are requested lazily."""
+    if isinstance(project, GithubProject):
+        if not project.has_issues:
+            raise IssueTrackerDisabled()
+        try:
+            for raw_issue in project.github_repo.get_issues(
+                state=status.name, sort="created", direction="desc"
+            ):
+                # GitHub lists pull requests as issues.
+                if not raw_issue.pull_request:
+                    yield GithubIssue(raw_issue, project)
+        except UnknownObjectException:
+            return
+    elif isinstance(project, GitlabProject):
+        if not project.has_issues:
+            raise IssueTrackerDisabled()
+        for raw_issue in project.gitlab_repo.issues.list(
+            state=status.name if status != IssueStatus.open else "opened",
+            order_by="created_at",
+            sort="desc",
+            iterator=True,
+        ):
+            yield GitlabIssue(raw_issue, project)
+    elif isinstance(project, PagureProject):
+        if not project.has_issues:
+            raise IssueTrackerDisabled()
+        for raw_issue in _iter_pagure(
+            project, "issues", "issues", {"status": status.name.capitalize()}
+        ):
+            yield PagureIssue(raw_issue, project)
+    else:
+        _LOGGER.debug(
+            "Lazy listing of issues is not supported for %r, listing all issues",
+            type(project).__name__,
+        )
+        yield from project.get_issue_list(status=status)
+
+
+def iter_issues_by_title(project: GitProject, title: str) -> Iterator[Issue]:
+    """Iterate over open issues with the given title, newest first."""
+    if isinstance(project, GitlabProject):
+        if not project.has_issues:
+            raise IssueTrackerDisabled()
+        for raw_issue in project.gitlab_repo.issues.list(
+            state="opened",
+            search=title,
+            order_by="created_at",
+            sort="desc",
+            iterator=True,
+            **{"in": "title"},
+        ):
+            if raw_issue.title == title:
+                yield GitlabIssue(raw_issue, project)
+    else:
+        # The GitHub search API has a low rate limit shared by all the jobs of an installation and Pagure has no
+        # search, the listing is filtered on the client.
+        for issue in iter_issues(project):
+            if issue.title == title:
+                yield issue
+
+
+def iter_pull_requests(
+    project: GitProject, status: PRStatus = PRStatus.open, branch: Optional[str] = None
+) -> Iterator[PullRequest]:
+    """Iterate over pull requests of the project in the given status, optionally only those from the given branch.
+
+    Pages are requested lazily. Only pull requests opened from the project itself, not from forks, are matched when
+    filtering on branch.
+    """
+    if isinstance(project, GithubProject) and status != PRStatus.merged:
+        # GitHub does not filter merged pull requests, telling them from closed ones costs a request per pull request.
+        parameters: Dict[str, Any] = {
+            "state": status.name,
+            "sort": "created",
+            "direction": "desc",
+        }
+        if branch is not None:
+            parameters["head"] = f"{project.namespace}:{branch}"
+        try:
+            for raw_pr in project.github_repo.get_pulls(**parameters):
+                yield GithubPullRequest(raw_pr, project)
+        except UnknownObjectException:
+            return
+    elif isinstance(project, GitlabProject):
+        parameters = {
+            "state": status.name if status != PRStatus.open else "opened",
+            "order_by": "created_at",
+            "sort": "desc",
+            "iterator": True,
+        }
+        if branch is not None:
+            parameters["source_branch"] = branch
+        for raw_pr in project.gitlab_repo.mergerequests.list(**parameters):
+            yield GitlabPullRequest(raw_pr, project)
+    else:
+        if isinstance(project, PagureProject):
+            pull_requests: Iterator[PullRequest] = (
+                PagurePullRequest(raw_pr, project)
+                for raw_pr in _iter_pagure(
+                    project,
+                    "pull-requests",
+                    "requests",
+                    {"status": status.name.capitalize()},
+                )
+            )
+        else:
+            pull_requests = iter(project.get_pr_list(status=status))
+
+        # Pagure does not filter on branch, the listing is filtered on the client.
+        for pull_request in pull_requests:
+            if branch is None or pull_request.source_branch == branch:
+                yield pull_request
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# Kebechet
+# Copyright(C) 2022 Kevin Postlethwait
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Budgets of forge API requests shared by managers, runs and processes forked for other repositories.
+
+Budgets are read from rate limit headers of responses the forge sent anyway, no requests are issued to obtain them.
+GitHub counts requests per installation of the GitHub App and per token, a budget is kept for each of them so that
+a repository is not deferred because of an exhausted budget of another installation. Only GitHub reports the budget
+this way, runs on other forges are never deferred nor spread.
+"""
+
+import hashlib
+import logging
+import math
+import multiprocessing
+import os
+import time
+from typing import Any, Dict, Optional
+
+from ogr.abstract import GitProject
+from ogr.services.base import BaseGitService
+from ogr.services.github import GithubProject, GithubService
+
+from kebechet import token_cache
+
+_LOGGER = logging.getLogger(__name__)
+
+# Requests kept for managers which are not deferred when the budget is low.
+_RESERVE = int(os.getenv("KEBECHET_RATE_LIMIT_RESERVE", 500))
+# Once less than this fraction of the limit is left, runs are spread evenly until the limit resets.
+_SPREAD = float(os.getenv("KEBECHET_RATE_LIMIT_SPREAD", 0.5))
+# The longest time a manager waits for the budget, a fleet run waits as long as needed.
+_MAX_DELAY = float(os.getenv("KEBECHET_RATE_LIMIT_MAX_DELAY", 300))
+# Minimal time in seconds between requests creating content (pull requests, issues, comments).
+_CONTENT_CREATION_INTERVAL = float(os.getenv("KEBECHET_CONTENT_CREATION_INTERVAL", 1.0))
+# Number of budgets (installations and tokens) tracked at once, the budget closest to its reset is dropped first.
+_BUDGETS = int(os.getenv("KEBECHET_RATE_LIMIT_BUDGETS", 64))
+
+# Managers deferred when the budget is low.
+LOW_PRIORITY_MANAGERS = frozenset(
+    os.getenv("KEBECHET_LOW_PRIORITY_MANAGERS", "label-bot,info").split(",")
+)
+# Managers issuing many requests, they are spread over time when the budget gets low.
+HEAVY_MANAGERS = frozenset(
+    {"update", "thoth-advise", "pipfile-requirements", "version"}
+)
+# Estimated number of requests done by a heavy manager and by a run on a single repository.
+MANAGER_COST = int(os.getenv("KEBECHET_RATE_LIMIT_MANAGER_COST", 50))
+REPOSITORY_COST = int(os.getenv("KEBECHET_RATE_LIMIT_REPOSITORY_COST", 150))
+
+# The shared state starts with time of the last content creation, budgets follow, each stored in these fields.
+_LAST_CONTENT_CREATION = 0
+_KEY, _REMAINING, _LIMIT, _RESET = range(4)
+_FIELDS = 4
+
+_STATE: Any = None
+
+
+def _get_state() -> Any:
+    """Get state of the budgets, processes forked after the state was created share it."""
+    global _STATE
+
+    if _STATE is None:
+        _STATE = multiprocessing.get_context("fork").Array("d", 1 + _BUDGETS * _FIELDS)
+    return _STATE
+
+
+def share_across_processes() -> None:
+    """Make sure the budgets are shared with processes forked from now on."""
+    _get_state()
+
+
+def get_key(service: BaseGitService, namespace: str, repo: str) -> Optional[str]:
+    """Get key of the budget requests for the given repository are counted against, None if it is not known.
+
+    No request is issued, an installation of the GitHub App is known once a token for the repository was obtained.
+    """
+    if not isinstance(service, GithubService):
+        return None
+
+    authentication = service.authentication
+    if (
+        isinstance(authentication, token_cache.CachedGithubApp)
+        and authentication.private_key
+    ):
+        installation_id = token_cache.get_installation_id(
+            authentication.id, namespace, repo
+        )
+        if installation_id is None:
+            return None
+        identity = f"installation/{authentication.id}/{installation_id}"
+    else:
+        token = authentication.get_token(namespace, repo) if authentication else None
+        # Tokens are not kept in the shared state, only their digest.
+        identity = (
+            f"token/{hashlib.sha256(token.encode()).hexdigest()}"
+            if token
+            else "anonymous"
+        )
+
+    return f"{service.instance_url}/{identity}"
+
+
+def _get_slot(state: Any, key: str, create: bool = False) -> Optional[int]:
+    """Get offset of the budget with the given key in the state, the lock of the state has to be held."""
+    # Keys are stored as 48 bit digests, doubles represent them exactly; zero marks a free slot.
+    digest = int.from_bytes(hashlib.sha256(key.encode()).digest()[:6], "big") or 1
+    victim = None
+    for offset in range(1, len(state), _FIELDS):
+        if state[offset + _KEY] == digest:
+            return offset
+        if victim is None or state[offset + _RESET] < state[victim + _RESET]:
+            victim = offset
+
+    if not create or victim is None:
+        return None
+
+    state[victim + _KEY] = digest
+    state[victim + _REMAINING] = state[victim + _LIMIT] = math.nan
+    state[victim + _RESET] = 0.0
+    return victim
+
+
+def observe(project: GitProject) -> None:
+    """Record the budget reported in the last response the forge sent for the given project."""
+    if not isinstance(project, GithubProject):
+        return
+
+    # If no request was made using this instance yet, the client asks for the rate limit, which is not counted.
+    github_instance = project.github_instance
+    remaining, limit = github_instance.rate_limiting
+    reset = float(github_instance.rate_limiting_resettime)
+    if limit < 0:
+        # The forge does not report the rate limit.
+        return
+
+    observe_budget(
+        get_key(project.service, project.namespace, project.repo),
+        remaining,
+        limit,
+        reset,
+    )
+
+
+def observe_budget(
+    key: Optional[str], remaining: int, limit: int, reset: float
+) -> None:
+    """Record the given budget, the lowest one reported for the current rate limit window wins."""
+    if key is None:
+        return
+
+    state = _get_state()
+    with state.get_lock():
+        values = state.get_obj()
+        offset = _get_slot(values, key, create=True)
+        if reset > values[offset + _RESET] or math.isnan(values[offset + _REMAINING]):
+            values[offset + _REMAINING] = remaining
+            values[offset + _LIMIT] = limit
+            values[offset + _RESET] = reset
+        elif reset == values[offset + _RESET]:
+            values[offset + _REMAINING] = min(values[offset + _REMAINING], remaining)
+
+
+def observe_exhausted(key: Optional[str], retry_after: Optional[float] = None) -> None:
+    """Record that the forge rejected a request because of a primary or a secondary rate limit."""
+    if key is None:
+        return
+
+    state = _get_state()
+    with state.get_lock():
+        values = state.get_obj()
+        offset = _get_slot(values, key, create=True)
+        values[offset + _REMAINING] = 0
+        values[offset + _RESET] = max(
+            values[offset + _RESET], time.time() + (retry_after or 60)
+        )
+        if math.isnan(values[offset + _LIMIT]):
+            values[offset + _LIMIT] = 0
+
+
+def get_retry_after(headers: Optional[Dict[str, str]]) -> Optional[float]:
+    """Get time in seconds after which a request rejected because of a rate limit can be retried."""
+    headers = {k.lower(): v for k, v in (headers or {}).items()}
+    try:
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+        if "x-ratelimit-reset" in headers:
+            return float(headers["x-ratelimit-reset"]) - time.time()
+    except ValueError:
+        pass
+
+    return None
+
+
+def _get_budget(key: Optional[str]):
+    """Get the budget left and time in seconds to its reset, None if the budget is not known or was reset."""
+    if key is None:
+        return None
+
+    state = _get_state()
+    with state.get_lock():
+        values = state.get_obj()
+        offset = _get_slot(values, key)
+        if offset is None:
+            return None
+        remaining = values[offset + _REMAINING]
+        limit = values[offset + _LIMIT]
+        reset = values[offset + _RESET]
+
+    window = reset - time.time()
+    if math.isnan(remaining) or window <= 0:
+        return None
+
+    return remaining, limit, window
+
+
+def is_low(key: Optional[str]) -> bool:
+    """Check whether the budget with the given key is so low that only the most important work should be done."""
+    budget = _get_budget(key)
+    return budget is not None and budget[0] <= _RESERVE
+
+
+def get_delay(key: Optional[str], cost: int) -> float:
+    """Get time in seconds to wait before work issuing the given number of requests against the budget is started.
+
+    Work is not delayed while more than the spread fraction of the limit is left. Below it, work is spread
+    so that the rest of the budget lasts until the limit is reset; once the reserve is reached, work waits
+    for the reset.
+    """
+    budget = _get_budget(key)
+    if budget is None:
+        return 0.0
+
+    remaining, limit, window = budget
+    available = remaining - _RESERVE
+    if available <= 0:
+        return window
+
+    if remaining > limit * _SPREAD:
+        return 0.0
+
+    return min(window, window * cost / available)
+
+
+def wait(
+    key: Optional[str], cost: int, max_delay: Optional[float] = _MAX_DELAY
+) -> None:
+    """Wait until work issuing the given number of requests fits into the budget with the given key."""
+    delay = get_delay(key, cost)
+    if max_delay is not None:
+        delay = min(delay, max_delay)
+
+    if delay > 0:
+        _LOGGER.info("Rate limit budget is low, waiting %.1f seconds", delay)
+        time.sleep(delay)
+
+
+def pace_content_creation() -> None:
+    """Wait so that requests creating content are not issued faster than the secondary rate limit allows."""
+    state = _get_state()
+    with state.get_lock():
+        now = time.monotonic()
+        start = max(now, state[_LAST_CONTENT_CREATION] + _CONTENT_CREATION_INTERVAL)
+        state[_LAST_CONTENT_CREATION] = start
+
+    if start > now:
+        time.sleep(start - now)
@@ -0,0 +1,136 @@
+"""Tests for rate limit budgets."""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import github
+import pytest
+from ogr.services.github import GithubService
+
+from kebechet import rate_limit
+
+
+@pytest.fixture(autouse=True)
+def _state(monkeypatch):
+    """Start each test with no budgets recorded."""
+    monkeypatch.setattr(rate_limit, "_STATE", None)
+
+
+_RESET = int(time.time()) + 600
+
+
+class _GithubHandler(BaseHTTPRequestHandler):
+    """Answer API requests reporting the rate limit the way GitHub does."""
+
+    def do_GET(self) -> None:  # noqa: N802
+        """Serve the repository or the rate limit status."""
+        self.server.paths.append(self.path)  # type: ignore
+        rate = {"limit": 5000, "remaining": 4321, "reset": _RESET, "used": 679}
+        if self.path == "/rate_limit":
+            body = {
+                "resources": {"core": rate, "search": rate, "graphql": rate},
+                "rate": rate,
+            }
+        else:
+            body = {"id": 1, "name": "kebechet", "full_name": "thoth-station/kebechet"}
+
+        content = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.send_header("X-RateLimit-Limit", "5000")
+        self.send_header("X-RateLimit-Remaining", "4321")
+        self.send_header("X-RateLimit-Reset", str(_RESET))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *_) -> None:
+        """Keep the test output clean."""
+
+
+@pytest.fixture
+def github_project():
+    """Get a project whose client talks to a local server instead of GitHub."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _GithubHandler)
+    server.paths = []  # type: ignore
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    project = GithubService(token="token").get_project(
+        namespace="thoth-station", repo="kebechet"
+    )
+    project._github_instance = github.Github(
+        "token", base_url=f"http://127.0.0.1:{server.server_address[1]}"
+    )
+    yield project, server.paths
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+class TestBudget:
+    """Test budgets are tracked per installation and token."""
+
+    def test_keys(self):
+        """Test repositories using different tokens use different budgets."""
+        first = GithubService(token="first")
+        second = GithubService(token="second")
+
+        key = rate_limit.get_key(first, "thoth-station", "kebechet")
+        assert key == rate_limit.get_key(first, "thoth-station", "thamos")
+        assert key != rate_limit.get_key(second, "thoth-station", "kebechet")
+        assert "first" not in key
+
+    def test_observe(self, github_project):
+        """Test the budget is read from the client once the forge responded."""
+        project, paths = github_project
+        project.github_instance.get_repo("thoth-station/kebechet")
+        rate_limit.observe(project)
+
+        key = rate_limit.get_key(project.service, "thoth-station", "kebechet")
+        remaining, limit, window = rate_limit._get_budget(key)
+        assert (remaining, limit) == (4321, 5000)
+        assert 0 < window <= 600
+        assert paths == ["/repos/thoth-station/kebechet"]
+
+    def test_observe_no_request(self, github_project):
+        """Test the rate limit status is obtained if the client did not issue any request yet."""
+        project, paths = github_project
+        rate_limit.observe(project)
+
+        key = rate_limit.get_key(project.service, "thoth-station", "kebechet")
+        assert rate_limit._get_budget(key)[:2] == (4321, 5000)
+        assert paths == ["/rate_limit"]
+
+    def test_separate_budgets(self):
+        """Test a low budget defers only work counted against it."""
+        reset = time.time() + 600
+        rate_limit.observe_budget("low", 100, 5000, reset)
+        rate_limit.observe_budget("high", 4900, 5000, reset)
+
+        assert rate_limit.is_low("low")
+        assert rate_limit.get_delay("low", rate_limit.REPOSITORY_COST) > 0
+        assert not rate_limit.is_low("high")
+        assert rate_limit.get_delay("high", rate_limit.REPOSITORY_COST) == 0
+        assert not rate_limit.is_low(None)
+
+    def test_exhausted(self):
+        """Test an exhausted budget makes work wait for the reset."""
+        rate_limit.observe_exhausted("exhausted", 120)
+
+        assert rate_limit.is_low("exhausted")
+        assert 100 < rate_limit.get_delay("exhausted", 1) <= 120
+        assert not rate_limit.is_low("other")
+
+    def test_budgets_recycled(self, monkeypatch):
+        """Test the budget closest to its reset is dropped once all the slots are taken."""
+        monkeypatch.setattr(rate_limit, "_BUDGETS", 2)
+        now = time.time()
+        rate_limit.observe_budget("first", 0, 5000, now + 100)
+        rate_limit.observe_budget("second", 0, 5000, now + 200)
+        rate_limit.observe_budget("third", 0, 5000, now + 300)
+
+        assert not rate_limit.is_low("first")
+        assert rate_limit.is_low("second")
+        assert rate_limit.is_low("third")
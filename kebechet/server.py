@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+# Kebechet
+# Copyright(C) 2022 Kevin Postlethwait
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Long running service accepting webhook payloads over HTTP."""
+
+import hashlib
+import hmac
+import json
+import logging
+import multiprocessing
+import multiprocessing.connection
+import itertools
+import os
+import queue
+import shutil
+import signal
+import tempfile
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .exception import WebhookPayloadError
+from . import index_cache
+from . import rate_limit
+from . import subprocess_runner
+from . import token_cache
+from .kebechet_runners import run_url
+from .managers.manager import get_environment_details
+from .payload_parser import PayloadParser
+
+_LOGGER = logging.getLogger(__name__)
+
+# Time in seconds a terminated job has to clean up before it is killed.
+_TERMINATE_GRACE_PERIOD = float(os.getenv("KEBECHET_SERVE_TERMINATE_GRACE_PERIOD", 10))
+# Payloads larger than this are rejected, GitHub caps webhook payloads at 25 MB.
+_MAX_PAYLOAD_SIZE = int(os.getenv("KEBECHET_SERVE_MAX_PAYLOAD_SIZE", 25 * 1024 * 1024))
+
+# Events of the same repository received within the window are merged into a single run.
+_DEBOUNCE_WINDOW = float(os.getenv("KEBECHET_SERVE_DEBOUNCE_WINDOW", 10))
+# Merged run is started at latest this long after the first event even if new events keep arriving.
+_DEBOUNCE_MAX_DELAY = float(os.getenv("KEBECHET_SERVE_DEBOUNCE_MAX_DELAY", 60))
+# Events whose payload is acted upon by managers (a merged release pull request, a new issue to label),
+# these are always processed on their own.
+_PAYLOAD_SENSITIVE_EVENTS = frozenset(
+    {("pull_request", "closed"), ("issues", "opened")}
+)
+
+
+def _is_payload_sensitive(parsed_payload: Dict[str, Any]) -> bool:
+    """Check whether the payload has to be processed on its own rather than merged with other events."""
+    raw_payload = parsed_payload.get("raw_payload") or {}
+    action = (raw_payload.get("payload") or {}).get("action")
+    return (parsed_payload.get("event"), action) in _PAYLOAD_SENSITIVE_EVENTS
+
+
+def _is_signed(secret: bytes, body: bytes, signature: Optional[str]) -> bool:
+    """Check the body was signed using the secret as GitHub does in the X-Hub-Signature-256 header."""
+    if not signature or not signature.startswith("sha256="):
+        return False
+
+    expected = hmac.new(secret, body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature[len("sha256=") :])
+
+
+def _is_authenticated(secret: bytes, body: bytes, headers: Any) -> bool:
+    """Check the delivery carries the secret as GitLab sends it, or is signed using it as GitHub does."""
+    token = headers.get("X-Gitlab-Token")
+    if token is not None:
+        return hmac.compare_digest(secret, token.encode())
+
+    return _is_signed(secret, body, headers.get("X-Hub-Signature-256"))
+
+
+def _get_payload(body: bytes, headers: Any) -> dict:
+    """Get the payload in the format PayloadParser expects.
+
+    GitHub and GitLab deliver the payload as is and state the event in a header, such deliveries are wrapped.
+    Payloads with no event header are expected to be wrapped already by a forwarder.
+    """
+    payload = json.loads(body)
+    github_event = headers.get("X-GitHub-Event")
+    if github_event is not None:
+        return {"event": github_event, "payload": payload}
+
+    if headers.get("X-Gitlab-Event") is not None:
+        return {"payload": payload}
+
+    return payload
+
+
+class PayloadQueue:
+    """Bounded queue of parsed payloads which merges events of the same repository.
+
+    A payload becomes available once no new event for the repository arrived for the debounce window. Merged
+    payloads carry the latest event and list all the events merged in "events", payloads merged into a pending one
+    do not count against the queue size.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        window: float = _DEBOUNCE_WINDOW,
+        max_delay: float = _DEBOUNCE_MAX_DELAY,
+    ) -> None:
+        """Create an empty queue, window of 0 disables debouncing but events pending for a worker are merged."""
+        self.maxsize = maxsize
+        self.window = window
+        self.max_delay = max_delay
+        # Mapping of repository URL (or a unique key for payloads not to be merged) to payload and its deadlines.
+        self._pending: "OrderedDict[Any, Tuple[Dict[str, Any], float, float]]" = (
+            OrderedDict()
+        )
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    def qsize(self) -> int:
+        """Get number of payloads waiting in the queue."""
+        with self._condition:
+            return len(self._pending)
+
+    def put_nowait(self, parsed_payload: Dict[str, Any]) -> None:
+        """Queue the given payload, raise queue.Full if there is no space left."""
+        events: List[str] = [parsed_payload.get("event")]  # type: ignore
+        now = time.monotonic()
+        with self._condition:
+            if _is_payload_sensitive(parsed_payload):
+                key: Any = (parsed_payload["url"], next(self._sequence))
+            else:
+                key = parsed_payload["url"]
+
+            pending = self._pending.get(key)
+            if pending is not None:
+                merged, _, latest = pending
+                events = merged["events"] + [
+                    e for e in events if e not in merged["events"]
+                ]
+                _LOGGER.debug(
+                    "Merging %r event into pending run for %r",
+                    parsed_payload.get("event"),
+                    key,
+                )
+                self._pending[key] = (
+                    dict(parsed_payload, events=events),
+                    min(now + self.window, latest),
+                    latest,
+                )
+            elif len(self._pending) >= self.maxsize:
+                raise queue.Full
+            else:
+                self._pending[key] = (
+                    dict(parsed_payload, events=events),
+                    now + self.window,
+                    now + self.max_delay,
+                )
+
+            self._condition.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Get the oldest payload available, raise queue.Empty if there is none in the given time."""
+        end = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                next_deadline = None
+                for key, (parsed_payload, deadline, _) in self._pending.items():
+                    if deadline <= now:
+                        del self._pending[key]
+                        return parsed_payload
+                    next_deadline = min(deadline, next_deadline or deadline)
+
+                wait = None if next_deadline is None else next_deadline - now
+                if end is not None:
+                    if end <= now:
+                        raise queue.Empty
+                    wait = end - now if wait is None else min(wait, end - now)
+
+                self._condition.wait(wait)
+
+    def get_nowait(self) -> Dict[str, Any]:
+        """Get the oldest payload available, raise queue.Empty if there is none."""
+        return self.get(timeout=0)
+
+
+class _WebhookRequestHandler(BaseHTTPRequestHandler):
+    """Accept webhook payloads and put them to the queue of the server."""
+
+    server: "WebhookServer"
+
+    def _respond(self, status: HTTPStatus, body: Dict[str, Any]) -> None:
+        """Send a JSON response."""
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self) -> None:  # noqa: N802
+        """Report health of the service."""
+        if self.path.rstrip("/") not in ("", "/healthz"):
+            self._respond(HTTPStatus.NOT_FOUND, {"error": "Not found"})
+            return
+
+        self._respond(
+            HTTPStatus.OK,
+            {
+                "status": "ok",
+                "queued": self.server.jobs.qsize(),
+                "running": self.server.running_count,
+            },
+        )
+
+    def do_POST(self) -> None:  # noqa: N802
+        """Parse the webhook payload and queue it for processing."""
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = 0
+
+        if length <= 0 or length > _MAX_PAYLOAD_SIZE:
+            self._respond(
+                HTTPStatus.BAD_REQUEST, {"error": "Missing or invalid Content-Length"}
+            )
+            return
+
+        body = self.rfile.read(length)
+        if not _is_authenticated(self.server.secret, body, self.headers):
+            _LOGGER.warning(
+                "Rejecting payload from %s with missing or invalid signature",
+                self.address_string(),
+            )
+            self._respond(
+                HTTPStatus.UNAUTHORIZED, {"error": "Missing or invalid signature"}
+            )
+            return
+
+        try:
+            parsed_payload = PayloadParser(
+                _get_payload(body, self.headers)
+            ).parsed_data()
+        except (ValueError, KeyError, TypeError, WebhookPayloadError) as exc:
+            self._respond(
+                HTTPStatus.BAD_REQUEST, {"error": f"Cannot parse payload: {exc}"}
+            )
+            return
+
+        if (
+            not parsed_payload
+            or parsed_payload.get("url") is None
+            or parsed_payload.get("service_type") is None
+        ):
+            # Events Kebechet does not act on (e.g. app installation) are acknowledged but not processed.
+            self._respond(HTTPStatus.OK, {"status": "ignored"})
+            return
+
+        try:
+            self.server.jobs.put_nowait(parsed_payload)
+        except queue.Full:
+            _LOGGER.warning(
+                "Queue is full, rejecting payload for %r", parsed_payload["url"]
+            )
+            self._respond(HTTPStatus.SERVICE_UNAVAILABLE, {"error": "Queue is full"})
+            return
+
+        self._respond(HTTPStatus.ACCEPTED, {"status": "queued"})
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """Log requests using the module logger instead of stderr."""
+        _LOGGER.debug("%s - %s", self.address_string(), format % args)
+
+
+class WebhookServer(ThreadingHTTPServer):
+    """HTTP server queueing webhook payloads which are processed by a pool of worker processes.
+
+    Requests are served in threads, jobs are forked from the main thread (see serve_forever) so that each of them
+    starts from the warm interpreter without paying for imports and initialization again.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        server_address: Tuple[str, int],
+        secret: str,
+        workers: int = 4,
+        queue_size: int = 100,
+        timeout: Optional[float] = None,
+        debounce_window: float = _DEBOUNCE_WINDOW,
+    ) -> None:
+        """Bind the server, payloads are not accepted until serve_forever is called.
+
+        Only payloads signed using the given secret (the secret of the webhook) are accepted.
+        """
+        if not secret:
+            raise ValueError("Secret used to sign webhook payloads is not configured")
+
+        super().__init__(server_address, _WebhookRequestHandler)
+        self.secret = secret.encode()
+        self.jobs = PayloadQueue(maxsize=queue_size, window=debounce_window)
+        self.workers = workers
+        self.job_timeout = timeout
+        self.running_count = 0
+        self._stop = threading.Event()
+
+    def _run_job(
+        self, parsed_payload: Dict[str, Any], temporary_directory: str
+    ) -> None:
+        """Process a single payload, run in a forked process."""
+        # The listening socket and signal handlers are owned by the parent, the job is terminated on SIGTERM
+        # together with the commands it runs. Clones and other temporary files of the job (and of the commands
+        # it runs) are created in its own directory which is removed by the parent however the job ends.
+        self.socket.close()
+        subprocess_runner.terminate_on_sigterm()
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        os.environ["TMPDIR"] = tempfile.tempdir = temporary_directory
+        run_url(
+            url=parsed_payload["url"],
+            service=parsed_payload["service_type"],
+            parsed_payload=parsed_payload,
+        )
+
+    def stop(self, *_: Any) -> None:
+        """Stop accepting payloads, jobs which are running are finished."""
+        self._stop.set()
+
+    def serve_forever(self, poll_interval: float = 0.5) -> None:
+        """Accept payloads in a background thread and dispatch jobs until stopped."""
+        http_thread = threading.Thread(
+            target=super().serve_forever,
+            args=(poll_interval,),
+            name="kebechet-http",
+            daemon=True,
+        )
+        http_thread.start()
+        _LOGGER.info(
+            "Listening on %s:%d with %d workers", *self.server_address[:2], self.workers
+        )
+
+        # Jobs on repositories of the same installation reuse installation tokens requested by previous jobs.
+        token_cache.share_across_processes()
+        rate_limit.share_across_processes()
+        index_cache.share_across_processes()
+        # Jobs report the environment in pull requests and issues, pipenv is run once instead of in each job.
+        get_environment_details()
+        context = multiprocessing.get_context("fork")
+        running: Dict[Any, Tuple[Dict[str, Any], str, float]] = {}
+        try:
+            while not self._stop.is_set() or running:
+                while not self._stop.is_set() and len(running) < self.workers:
+                    try:
+                        if running:
+                            parsed_payload = self.jobs.get_nowait()
+                        else:
+                            parsed_payload = self.jobs.get(timeout=poll_interval)
+                    except queue.Empty:
+                        break
+
+                    temporary_directory = tempfile.mkdtemp(prefix="kebechet-job-")
+                    process = context.Process(
+                        target=self._run_job,
+                        args=(parsed_payload, temporary_directory),
+                        name=f"kebechet-{parsed_payload['url']}",
+                    )
+                    process.start()
+                    running[process] = (
+                        parsed_payload,
+                        temporary_directory,
+                        time.monotonic(),
+                    )
+
+                self.running_count = len(running)
+                if not running:
+                    continue
+
+                multiprocessing.connection.wait(
+                    [process.sentinel for process in running], timeout=poll_interval
+                )
+                for process, (parsed_payload, temporary_directory, start) in list(
+                    running.items()
+                ):
+                    duration = time.monotonic() - start
+                    if process.is_alive():
+                        if self.job_timeout is None or duration < self.job_timeout:
+                            continue
+
+                        _LOGGER.error(
+                            "Job for %r did not finish in %s seconds, terminating",
+                            parsed_payload["url"],
+                            self.job_timeout,
+                        )
+                        process.terminate()
+                        process.join(_TERMINATE_GRACE_PERIOD)
+                        if process.is_alive():
+                            process.kill()
+                            process.join()
+
+                    _LOGGER.info(
+                        "Job for %r (events %r) finished with exit code %r in %.3f seconds",
+                        parsed_payload["url"],
+                        parsed_payload.get("events"),
+                        process.exitcode,
+                        duration,
+                    )
+                    shutil.rmtree(temporary_directory, ignore_errors=True)
+                    del running[process]
+
+                self.running_count = len(running)
+        finally:
+            self.shutdown()
+            http_thread.join()
+            _LOGGER.info(
+                "Server stopped, %d queued payloads were not processed",
+                self.jobs.qsize(),
+            )
+
+
+def serve(
+    secret: str,
+    host: str = "127.0.0.1",
+    port: int = 8080,
+    workers: int = 4,
+    queue_size: int = 100,
+    timeout: Optional[float] = None,
+    debounce_window: float = _DEBOUNCE_WINDOW,
+) -> None:
+    """Serve webhook payloads signed using the given secret until SIGTERM or SIGINT is received."""
+    with WebhookServer(
+        (host, port),
+        secret=secret,
+        workers=workers,
+        queue_size=queue_size,
+        timeout=timeout,
+        debounce_window=debounce_window,
+    ) as server:
+        signal.signal(signal.SIGTERM, server.stop)
+        signal.signal(signal.SIGINT, server.stop)
+        server.serve_forever()
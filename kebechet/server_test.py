@@ -0,0 +1,224 @@
+"""Tests for the webhook service."""
+
+import hashlib
+import hmac
+import http.client
+import json
+import os
+import queue
+import threading
+import time
+
+import pytest
+
+from kebechet import server
+
+_SECRET = "webhook-secret"
+
+
+def _parsed_payload(url: str, event: str = "push", action=None) -> dict:
+    """Get a parsed payload of the given event."""
+    return {
+        "service_type": "GITHUB",
+        "url": url,
+        "event": event,
+        "raw_payload": {"event": event, "payload": {"action": action}},
+    }
+
+
+def _payload(url: str) -> dict:
+    """Get a webhook payload as relayed from GitHub."""
+    return {
+        "event": "push",
+        "payload": {
+            "sender": {"url": "https://api.github.com/users/octocat"},
+            "repository": {"html_url": url},
+        },
+    }
+
+
+def _post(port: int, payload: dict, secret: str = None, headers: dict = None) -> int:
+    """Post the payload to the service, sign it if a secret is given, return the response status."""
+    body = json.dumps(payload).encode()
+    headers = {"Content-Type": "application/json", **(headers or {})}
+    if secret is not None:
+        digest = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+        headers["X-Hub-Signature-256"] = f"sha256={digest}"
+
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    try:
+        connection.request("POST", "/", body=body, headers=headers)
+        return connection.getresponse().status
+    finally:
+        connection.close()
+
+
+class TestPayloadQueue:
+    """Test merging and debouncing of payloads."""
+
+    def test_merge(self):
+        """Test events of the same repository are merged into the latest payload."""
+        jobs = server.PayloadQueue(maxsize=10, window=0)
+        jobs.put_nowait(_parsed_payload("https://github.com/a/b", "push"))
+        jobs.put_nowait(_parsed_payload("https://github.com/a/b", "issue_comment"))
+        jobs.put_nowait(_parsed_payload("https://github.com/a/b", "push"))
+        jobs.put_nowait(_parsed_payload("https://github.com/c/d", "push"))
+
+        assert jobs.qsize() == 2
+        merged = jobs.get_nowait()
+        assert merged["url"] == "https://github.com/a/b"
+        assert merged["event"] == "push"
+        assert merged["events"] == ["push", "issue_comment"]
+        assert jobs.get_nowait()["url"] == "https://github.com/c/d"
+        with pytest.raises(queue.Empty):
+            jobs.get_nowait()
+
+    def test_payload_sensitive(self):
+        """Test payloads acted upon are never merged."""
+        jobs = server.PayloadQueue(maxsize=10, window=0)
+        for _ in range(2):
+            jobs.put_nowait(
+                _parsed_payload("https://github.com/a/b", "issues", "opened")
+            )
+
+        assert jobs.qsize() == 2
+
+    def test_full(self):
+        """Test payloads over the size are rejected, merged ones are not counted."""
+        jobs = server.PayloadQueue(maxsize=1, window=0)
+        jobs.put_nowait(_parsed_payload("https://github.com/a/b"))
+        jobs.put_nowait(_parsed_payload("https://github.com/a/b"))
+        with pytest.raises(queue.Full):
+            jobs.put_nowait(_parsed_payload("https://github.com/c/d"))
+
+    def test_debounce(self):
+        """Test a payload is available once no event arrived for the window."""
+        jobs = server.PayloadQueue(maxsize=10, window=0.3, max_delay=10)
+        jobs.put_nowait(_parsed_payload("https://github.com/a/b"))
+        time.sleep(0.2)
+        jobs.put_nowait(_parsed_payload("https://github.com/a/b"))
+        with pytest.raises(queue.Empty):
+            jobs.get(timeout=0.2)
+
+        assert jobs.get(timeout=1)["url"] == "https://github.com/a/b"
+
+    def test_max_delay(self):
+        """Test events arriving continuously do not postpone the run past the maximum delay."""
+        jobs = server.PayloadQueue(maxsize=10, window=0.3, max_delay=0.5)
+        start = time.monotonic()
+        jobs.put_nowait(_parsed_payload("https://github.com/a/b"))
+        while time.monotonic() - start < 0.45:
+            jobs.put_nowait(_parsed_payload("https://github.com/a/b"))
+            time.sleep(0.05)
+
+        jobs.get(timeout=0.2)
+        assert time.monotonic() - start < 0.7
+
+
+class TestWebhookServer:
+    """Test accepting payloads and running jobs."""
+
+    @pytest.fixture
+    def webhook_server(self, monkeypatch):
+        """Run the service on a free port, jobs are not run unless serve_forever is called."""
+        monkeypatch.setattr(server, "get_environment_details", lambda: None)
+        webhook_server = server.WebhookServer(
+            ("127.0.0.1", 0), secret=_SECRET, debounce_window=0, timeout=0.5
+        )
+        yield webhook_server
+        webhook_server.server_close()
+
+    def test_secret_required(self):
+        """Test the service does not start without a secret."""
+        with pytest.raises(ValueError):
+            server.WebhookServer(("127.0.0.1", 0), secret="")
+
+    def test_signature(self, webhook_server):
+        """Test only signed payloads are queued."""
+        thread = threading.Thread(
+            target=server.ThreadingHTTPServer.serve_forever,
+            args=(webhook_server, 0.05),
+            daemon=True,
+        )
+        thread.start()
+        try:
+            port = webhook_server.server_address[1]
+            payload = _payload("https://github.com/a/b")
+            assert _post(port, payload) == 401
+            assert _post(port, payload, "wrong-secret") == 401
+            assert webhook_server.jobs.qsize() == 0
+            assert _post(port, payload, _SECRET) == 202
+            assert webhook_server.jobs.qsize() == 1
+        finally:
+            webhook_server.shutdown()
+            thread.join()
+
+    def test_deliveries(self, webhook_server):
+        """Test payloads delivered by GitHub and GitLab directly are authenticated and queued."""
+        thread = threading.Thread(
+            target=server.ThreadingHTTPServer.serve_forever,
+            args=(webhook_server, 0.05),
+            daemon=True,
+        )
+        thread.start()
+        try:
+            port = webhook_server.server_address[1]
+            github_payload = _payload("https://github.com/a/b")["payload"]
+            github_headers = {"X-GitHub-Event": "push"}
+            assert _post(port, github_payload, headers=github_headers) == 401
+            assert _post(port, github_payload, _SECRET, github_headers) == 202
+
+            gitlab_payload = {
+                "object_kind": "push",
+                "project": {"web_url": "https://gitlab.com/c/d"},
+            }
+            gitlab_headers = {"X-Gitlab-Event": "Push Hook", "X-Gitlab-Token": "wrong"}
+            assert _post(port, gitlab_payload, headers=gitlab_headers) == 401
+            gitlab_headers["X-Gitlab-Token"] = _SECRET
+            assert _post(port, gitlab_payload, headers=gitlab_headers) == 202
+
+            github_job, gitlab_job = (
+                webhook_server.jobs.get(timeout=1) for _ in range(2)
+            )
+            assert (github_job["service_type"], github_job["event"]) == (
+                "GITHUB",
+                "push",
+            )
+            assert github_job["url"] == "https://github.com/a/b"
+            assert (gitlab_job["service_type"], gitlab_job["event"]) == (
+                "GITLAB",
+                "push",
+            )
+            assert gitlab_job["url"] == "https://gitlab.com/c/d"
+        finally:
+            webhook_server.shutdown()
+            thread.join()
+
+    def test_terminated_job_cleaned_up(self, webhook_server, monkeypatch, tmp_path):
+        """Test temporary files of a job terminated on timeout are removed."""
+        report = tmp_path / "tmpdir"
+
+        def _run_url(**_):
+            clone = os.path.join(os.environ["TMPDIR"], "clone")
+            os.mkdir(clone)
+            report.write_text(clone)
+            time.sleep(60)
+
+        monkeypatch.setattr(server, "run_url", _run_url)
+        thread = threading.Thread(
+            target=webhook_server.serve_forever, args=(0.05,), daemon=True
+        )
+        thread.start()
+        try:
+            webhook_server.jobs.put_nowait(_parsed_payload("https://github.com/a/b"))
+            deadline = time.monotonic() + 5
+            while not report.exists() and time.monotonic() < deadline:
+                time.sleep(0.05)
+            clone = report.read_text()
+            assert os.path.isdir(clone)
+        finally:
+            webhook_server.stop()
+            thread.join(10)
+
+        assert not thread.is_alive()
+        assert not os.path.exists(os.path.dirname(clone))
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# Kebechet
+# Copyright(C) 2022 Kevin Postlethwait
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Running commands (pipenv) with a timeout, bounded capture of their output and resource usage reported."""
+
+import asyncio
+import functools
+import logging
+import os
+import resource
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import IO, Any, Deque, Dict, NamedTuple, Optional, Set
+
+_LOGGER = logging.getLogger(__name__)
+
+# Commands running for longer than this many seconds are terminated, 0 means no limit.
+_TIMEOUT = float(os.getenv("KEBECHET_SUBPROCESS_TIMEOUT", 3600))
+# Time given to a terminated command to exit before it is killed.
+_KILL_GRACE_PERIOD = float(os.getenv("KEBECHET_SUBPROCESS_KILL_GRACE_PERIOD", 10))
+# Number of bytes of standard error kept, the beginning of longer outputs is dropped. Standard output is
+# kept whole, callers use it as the result of the command (e.g. a lock written to requirements.txt).
+_OUTPUT_LIMIT = int(os.getenv("KEBECHET_SUBPROCESS_OUTPUT_LIMIT", 1024 * 1024))
+# Limits of address space (bytes) and CPU time (seconds) of commands, 0 means no limit.
+_MEMORY_LIMIT = int(os.getenv("KEBECHET_SUBPROCESS_MEMORY_LIMIT", 0))
+_CPU_LIMIT = int(os.getenv("KEBECHET_SUBPROCESS_CPU_LIMIT", 0))
+
+_READ_SIZE = 64 * 1024
+
+# Process groups of commands running in this process, they are killed once this process is terminated.
+_RUNNING: Set[int] = set()
+
+
+class CommandResult(NamedTuple):
+    """Result of a finished command, the interface matches delegator.Command used to run commands before."""
+
+    cmd: str
+    out: str
+    err: str
+    return_code: int
+    # Wall time, user and system CPU time in seconds and peak resident set size in KiB.
+    duration: float
+    cpu_time: float
+    max_rss: int
+    timed_out: bool = False
+
+
+class _RingBuffer:
+    """Keep the last bytes written, the beginning of outputs over the limit is dropped."""
+
+    def __init__(self, limit: Optional[int]) -> None:
+        """Create an empty buffer holding at most the given number of bytes, None means no limit."""
+        self.limit = limit
+        self.truncated = False
+        self._size = 0
+        self._chunks: Deque[bytes] = deque()
+
+    def write(self, chunk: bytes) -> None:
+        """Append a chunk, drop the oldest ones once the limit is exceeded."""
+        self._chunks.append(chunk)
+        self._size += len(chunk)
+        while (
+            self.limit is not None and self._size - len(self._chunks[0]) >= self.limit
+        ):
+            self._size -= len(self._chunks.popleft())
+            self.truncated = True
+
+    def getvalue(self) -> str:
+        """Get the content kept as text."""
+        content = b"".join(self._chunks)
+        if self.limit is not None and len(content) > self.limit:
+            content = content[-self.limit :]
+            self.truncated = True
+
+        text = content.decode("utf-8", errors="replace")
+        if self.truncated:
+            return f"[... output truncated to last {self.limit} bytes ...]\n{text}"
+        return text
+
+
+def _drain(stream: IO[bytes], buffer: _RingBuffer) -> None:
+    """Read the stream until it is closed, run in a thread for each of the output streams."""
+    with stream:
+        for chunk in iter(functools.partial(stream.read1, _READ_SIZE), b""):  # type: ignore
+            buffer.write(chunk)
+
+
+def _set_limits() -> None:
+    """Apply resource limits, run in the child process before the command is executed so that it cannot escape them.
+
+    Processes the command spawns inherit the limits. Logging is not safe in the child, failures are reported
+    on standard error of the command.
+    """
+    limits = ((resource.RLIMIT_AS, _MEMORY_LIMIT), (resource.RLIMIT_CPU, _CPU_LIMIT))
+    for limit, value in limits:
+        if value:
+            try:
+                resource.setrlimit(limit, (value, value))
+            except (OSError, ValueError) as exc:
+                os.write(2, f"Failed to set resource limit {limit}: {exc}\n".encode())
+
+
+def _kill(pid: int, sig: int) -> None:
+    """Send a signal to the whole process group of the command."""
+    try:
+        os.killpg(pid, sig)
+    except ProcessLookupError:
+        pass
+
+
+def run(
+    cmd: str,
+    timeout: Optional[float] = _TIMEOUT,
+    cwd: Optional[str] = None,
+    env: Optional[Dict[str, str]] = None,
+    output_limit: Optional[int] = _OUTPUT_LIMIT,
+    cancel: Optional[threading.Event] = None,
+) -> CommandResult:
+    """Run the given shell command and wait for it to finish.
+
+    Standard error is bounded by output_limit, standard output is kept whole. The command together with all
+    the processes it spawns is terminated once the timeout passes or once the cancel event is set. A command
+    which does not exit on SIGTERM in the grace period is killed.
+    """
+    start = time.monotonic()
+    process = subprocess.Popen(
+        cmd,
+        shell=True,
+        cwd=cwd,
+        env=dict(os.environ, **env) if env else None,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        # The command gets its own process group so that processes it spawns are terminated together with it.
+        start_new_session=True,
+        preexec_fn=_set_limits if _MEMORY_LIMIT or _CPU_LIMIT else None,
+    )
+    _RUNNING.add(process.pid)
+    try:
+        return _wait(process, cmd, timeout, output_limit, cancel, start)
+    finally:
+        _RUNNING.discard(process.pid)
+
+
+def _wait(
+    process: subprocess.Popen,
+    cmd: str,
+    timeout: Optional[float],
+    output_limit: Optional[int],
+    cancel: Optional[threading.Event],
+    start: float,
+) -> CommandResult:
+    """Collect output of the started command and wait for it to finish, see run()."""
+    stdout, stderr = _RingBuffer(None), _RingBuffer(output_limit)
+    readers = [
+        threading.Thread(target=_drain, args=(process.stdout, stdout), daemon=True),
+        threading.Thread(target=_drain, args=(process.stderr, stderr), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+
+    timed_out = False
+    kill_at: Optional[float] = None
+    poll_interval = 0.01
+    while True:
+        # Reaped using wait4 rather than Popen.wait, resource usage of the command is reported only this way.
+        pid, status, rusage = os.wait4(process.pid, os.WNOHANG)
+        if pid:
+            break
+
+        now = time.monotonic()
+        if kill_at is None:
+            if timeout and now - start > timeout:
+                _LOGGER.error("Command %r timed out after %s seconds", cmd, timeout)
+                timed_out = True
+            elif cancel is not None and cancel.is_set():
+                _LOGGER.warning("Command %r was cancelled", cmd)
+            else:
+                poll_interval = min(poll_interval * 2, 0.1)
+                time.sleep(poll_interval)
+                continue
+
+            _kill(process.pid, signal.SIGTERM)
+            kill_at = now + _KILL_GRACE_PERIOD
+        elif now >= kill_at:
+            _kill(process.pid, signal.SIGKILL)
+            kill_at = float("inf")
+
+        time.sleep(0.05)
+
+    process.returncode = (
+        -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+    )
+    # Processes spawned by the command might have outlived it, they still hold the output open.
+    _kill(process.pid, signal.SIGKILL)
+    for reader in readers:
+        reader.join()
+
+    err = stderr.getvalue()
+    if timed_out:
+        err += f"\nCommand timed out after {timeout} seconds"
+
+    result = CommandResult(
+        cmd=cmd,
+        out=stdout.getvalue(),
+        err=err,
+        return_code=process.returncode,
+        duration=time.monotonic() - start,
+        cpu_time=rusage.ru_utime + rusage.ru_stime,
+        max_rss=rusage.ru_maxrss,
+        timed_out=timed_out,
+    )
+    _LOGGER.debug(
+        "Command %r exited with %d in %.3f seconds (CPU time %.3f seconds, peak RSS %d KiB)",
+        cmd,
+        result.return_code,
+        result.duration,
+        result.cpu_time,
+        result.max_rss,
+    )
+    return result
+
+
+def kill_running() -> None:
+    """Kill all the commands (together with processes they spawned) running in this process."""
+    for pid in list(_RUNNING):
+        _kill(pid, signal.SIGKILL)
+
+
+def terminate_on_sigterm() -> None:
+    """Kill running commands once this process receives SIGTERM and exit, cleanup (e.g. of clones) is done on exit.
+
+    Commands run in their own process groups, without this they would keep running after this process is
+    terminated. Must be called from the main thread.
+    """
+
+    def _handle_sigterm(signum: int, _: Any) -> None:
+        kill_running()
+        raise SystemExit(128 + signum)
+
+    signal.signal(signal.SIGTERM, _handle_sigterm)
+
+
+async def run_async(cmd: str, **kwargs) -> CommandResult:
+    """Run the given shell command in a thread, the command is terminated if the awaiting task is cancelled."""
+    cancel = threading.Event()
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(
+        None, functools.partial(run, cmd, cancel=cancel, **kwargs)
+    )
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        cancel.set()
+        # Do not leave the command behind, wait for it to be terminated.
+        await asyncio.wait([future])
+        raise
@@ -0,0 +1,92 @@
+"""Tests for running commands."""
+
+import multiprocessing
+import os
+import time
+
+from kebechet import subprocess_runner
+
+
+def _is_running(pid: int) -> bool:
+    """Check whether the given process exists."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def _wait_for_exit(pid: int, timeout: float = 5) -> bool:
+    """Wait for the given process to exit, report whether it did."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not _is_running(pid):
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def _run_in_worker(pid_file: str) -> None:
+    """Run a long command in a worker which is terminated the way fleet and webhook jobs are."""
+    subprocess_runner.terminate_on_sigterm()
+    subprocess_runner.run(f"sleep 60 & echo $! > {pid_file}; wait", timeout=0)
+
+
+class TestRun:
+    """Test running commands."""
+
+    def test_output(self):
+        """Test output, return code and resource usage are reported."""
+        result = subprocess_runner.run("echo out; echo err >&2; exit 3")
+
+        assert result.out == "out\n"
+        assert result.err == "err\n"
+        assert result.return_code == 3
+        assert not result.timed_out
+        assert result.max_rss > 0
+
+    def test_output_limit(self):
+        """Test only standard error is truncated, standard output is the result of the command."""
+        result = subprocess_runner.run(
+            "head -c 100000 /dev/zero | tr '\\0' a; head -c 100000 /dev/zero | tr '\\0' b >&2",
+            output_limit=1000,
+        )
+
+        assert result.out == "a" * 100000
+        assert result.err.startswith("[... output truncated to last 1000 bytes ...]\n")
+        assert result.err.endswith("b" * 1000)
+
+    def test_timeout(self, tmp_path):
+        """Test a command is killed on timeout together with processes it spawned."""
+        pid_file = tmp_path / "pid"
+        result = subprocess_runner.run(
+            f"sleep 60 & echo $! > {pid_file}; wait", timeout=0.5
+        )
+
+        assert result.timed_out
+        assert result.return_code != 0
+        assert _wait_for_exit(int(pid_file.read_text()))
+
+    def test_limits(self, monkeypatch):
+        """Test resource limits are applied before the command is executed."""
+        monkeypatch.setattr(subprocess_runner, "_CPU_LIMIT", 42)
+
+        assert subprocess_runner.run("ulimit -t").out == "42\n"
+
+    def test_terminate_on_sigterm(self, tmp_path):
+        """Test commands are killed once the process running them is terminated."""
+        pid_file = tmp_path / "pid"
+        process = multiprocessing.get_context("fork").Process(
+            target=_run_in_worker, args=(str(pid_file),)
+        )
+        process.start()
+        deadline = time.monotonic() + 5
+        while not pid_file.exists() or not pid_file.read_text():
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+
+        process.terminate()
+        process.join(5)
+
+        assert process.exitcode == 128 + 15
+        assert _wait_for_exit(int(pid_file.read_text()))
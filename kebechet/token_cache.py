@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# Kebechet
+# Copyright(C) 2022 Kevin Postlethwait
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Cache of GitHub App installation tokens shared by managers, runs and processes forked for other repositories."""
+
+import atexit
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import timezone
+from typing import Dict, Optional, Tuple
+
+import github
+from ogr.exceptions import OgrException
+from ogr.services.github.auth_providers import GithubApp
+
+_LOGGER = logging.getLogger(__name__)
+
+_CACHE_DIRECTORY = os.getenv("KEBECHET_TOKEN_CACHE_DIRECTORY", None)
+# Tokens are valid for an hour, they are refreshed once they are about to expire in this many seconds.
+_REFRESH_MARGIN = int(os.getenv("KEBECHET_TOKEN_REFRESH_MARGIN", 300))
+
+# Installation of the app on a repository, keyed by app id and repository.
+_INSTALLATIONS: Dict[str, int] = {}
+# Installation token and its expiration timestamp, keyed by app id and installation.
+_TOKENS: Dict[str, Tuple[str, float]] = {}
+
+
+def share_across_processes() -> None:
+    """Make sure tokens are shared with processes forked from now on.
+
+    If no cache directory is configured, a private temporary one is created and removed when this process exits.
+    """
+    global _CACHE_DIRECTORY
+
+    if _CACHE_DIRECTORY is not None:
+        return
+
+    # The directory is created readable by the owner only.
+    _CACHE_DIRECTORY = tempfile.mkdtemp(prefix="kebechet-tokens-")
+    pid = os.getpid()
+
+    def _cleanup() -> None:
+        # Forked processes run exit handlers too, only the process which created the directory removes it.
+        if os.getpid() == pid:
+            shutil.rmtree(_CACHE_DIRECTORY, ignore_errors=True)  # type: ignore
+
+    atexit.register(_cleanup)
+
+
+def _get_path(key: str) -> str:
+    """Get path to the cache entry with the given key."""
+    return os.path.join(_CACHE_DIRECTORY, hashlib.sha256(key.encode()).hexdigest())  # type: ignore
+
+
+@contextmanager
+def _locked_entry(key: str):
+    """Serialize work on the given entry across processes, yield path to the entry (if the cache is on disk)."""
+    if _CACHE_DIRECTORY is None:
+        yield None
+        return
+
+    os.makedirs(_CACHE_DIRECTORY, mode=0o700, exist_ok=True)
+    path = _get_path(key)
+    with open(f"{path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield path
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _read_entry(path: Optional[str]) -> Optional[dict]:
+    """Read an entry stored on disk."""
+    if path is None:
+        return None
+
+    try:
+        with open(path) as entry_file:
+            return json.load(entry_file)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_entry(path: Optional[str], entry: dict) -> None:
+    """Write an entry to disk atomically, the entry is readable by the owner only."""
+    if path is None:
+        return
+
+    with tempfile.NamedTemporaryFile(
+        "w", dir=_CACHE_DIRECTORY, delete=False
+    ) as entry_file:
+        json.dump(entry, entry_file)
+    os.replace(entry_file.name, path)
+
+
+def get_installation_id(app_id: str, namespace: str, repo: str) -> Optional[int]:
+    """Get installation of the app on the given repository if it was looked up already, no request is issued."""
+    key = f"installation/{app_id}/{namespace}/{repo}"
+    installation_id = _INSTALLATIONS.get(key)
+    if installation_id is None and _CACHE_DIRECTORY is not None:
+        # Entries are replaced atomically, they can be read without the lock.
+        entry = _read_entry(_get_path(key))
+        if entry is not None:
+            installation_id = _INSTALLATIONS[key] = entry["id"]
+
+    return installation_id
+
+
+class CachedGithubApp(GithubApp):
+    """Authentication as a GitHub App which reuses installation tokens until they are about to expire."""
+
+    def __init__(
+        self, id: str, private_key: Optional[str], private_key_path: Optional[str]
+    ) -> None:
+        """Create the authentication, the private key is read on the first use."""
+        super().__init__(id, private_key, private_key_path)  # type: ignore
+
+    @property
+    def private_key(self) -> str:
+        """Get private key of the app, the key file is read only once."""
+        if not self._private_key and self._private_key_path:
+            self._private_key = super().private_key
+        return self._private_key
+
+    def _get_installation_id(self, namespace: str, repo: str) -> int:
+        """Get installation of the app on the given repository."""
+        key = f"installation/{self.id}/{namespace}/{repo}"
+        installation_id = _INSTALLATIONS.get(key)
+        if installation_id is not None:
+            return installation_id
+
+        with _locked_entry(key) as path:
+            entry = _read_entry(path)
+            if entry is not None:
+                installation_id = entry["id"]
+            else:
+                try:
+                    installation_id = self.integration.get_repo_installation(
+                        namespace, repo
+                    ).id
+                except github.GithubException as exc:
+                    raise OgrException(
+                        f"No installation ID provided for {namespace}/{repo}: "
+                        "please make sure that you provided correct credentials of your GitHub app."
+                    ) from exc
+                _write_entry(path, {"id": installation_id})
+
+        _INSTALLATIONS[key] = installation_id
+        return installation_id
+
+    def _forget_installation(self, namespace: str, repo: str) -> None:
+        """Drop installation of the app on the given repository from the cache."""
+        key = f"installation/{self.id}/{namespace}/{repo}"
+        _INSTALLATIONS.pop(key, None)
+        if _CACHE_DIRECTORY is not None:
+            try:
+                os.remove(_get_path(key))
+            except FileNotFoundError:
+                pass
+
+    def get_token(self, namespace: str, repo: str) -> str:
+        """Get installation token for the given repository, a new token is requested only if needed."""
+        if not self.private_key:
+            return None  # type: ignore
+
+        installation_id = self._get_installation_id(namespace, repo)
+        key = f"token/{self.id}/{installation_id}"
+
+        cached = _TOKENS.get(key)
+        if cached is not None and cached[1] - _REFRESH_MARGIN > time.time():
+            return cached[0]
+
+        with _locked_entry(key) as path:
+            entry = _read_entry(path)
+            if (
+                entry is not None
+                and entry["expires_at"] - _REFRESH_MARGIN > time.time()
+            ):
+                cached = (entry["token"], entry["expires_at"])
+            else:
+                _LOGGER.debug(
+                    "Requesting a new token for installation %d of app %s",
+                    installation_id,
+                    self.id,
+                )
+                try:
+                    authorization = self.integration.get_access_token(installation_id)
+                except github.UnknownObjectException:
+                    # The app was reinstalled, look the installation up again next time.
+                    self._forget_installation(namespace, repo)
+                    raise
+                expires_at = authorization.expires_at
+                if expires_at.tzinfo is None:
+                    # Older PyGithub releases report naive datetime in UTC.
+                    expires_at = expires_at.replace(tzinfo=timezone.utc)
+                cached = (authorization.token, expires_at.timestamp())
+                _write_entry(path, {"token": cached[0], "expires_at": cached[1]})
+
+        _TOKENS[key] = cached
+        return cached[0]
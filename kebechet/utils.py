@@ -18,18 +18,24 @@
 """Just some utility methods."""
 
 
+import io
 import os
 import sys
 import traceback
 import logging
-import tempfile
+from functools import lru_cache
 from ogr.services.base import BaseGitService, GitProject
-from contextlib import contextmanager
+from contextlib import contextmanager, ExitStack
 from tempfile import TemporaryDirectory
 from urllib.parse import urljoin
 from typing import TYPE_CHECKING, Optional
 import git
 
+from . import clone_cache
+from . import config_cache
+from . import pagination
+from . import token_cache
+from .config import _Config
 from ogr.services.github import GithubService
 from ogr.services.gitlab import GitlabService
 from ogr.services.pagure import PagureService
@@ -55,19 +61,22 @@ def cwd(path: str):
         os.chdir(previous_dir)
 
 
-def _clone_repo_and_set_vals(
-    manager: "ManagerBase", repo_path: str, **clone_kwargs
-) -> git.Repo:
-    service_url = manager.service_url
-    slug = manager.slug
+def _get_service_host(service_url: str) -> str:
+    """Strip protocol from the service URL."""
     if service_url.startswith("https://"):
-        service_url = service_url[len("https://") :]
+        return service_url[len("https://") :]
     elif service_url.startswith("http://"):
-        service_url = service_url[len("http://") :]
+        return service_url[len("http://") :]
     else:
         # This is mostly internal error - we require service URL to have protocol explicitly set
         raise NotImplementedError
 
+
+def _clone_repo_and_set_vals(
+    manager: "ManagerBase", repo_path: str, **clone_kwargs
+) -> git.Repo:
+    service_url = _get_service_host(manager.service_url)
+    slug = manager.slug
     namespace, repository = slug.split("/")
     access_token = None
     if manager.installation:
@@ -81,6 +90,15 @@ def _clone_repo_and_set_vals(
         else repo_url
     )
 
+    if clone_cache.is_enabled():
+        # Objects are borrowed from the local mirror, only new objects are transferred over the network.
+        clone_kwargs["reference"] = clone_cache.update_mirror(
+            repo_url, service_url, slug, masked_repo_url=masked_repo_url
+        )
+        # The whole history is available locally, there is no reason to do shallow clones.
+        clone_kwargs.pop("depth", None)
+        clone_kwargs.pop("no_single_branch", None)
+
     _LOGGER.info(f"Cloning repository {masked_repo_url} to {repo_path}")
     repo = git.Repo.clone_from(repo_url, repo_path, **clone_kwargs)
     repo.config_writer().set_value(
@@ -100,32 +118,119 @@ def fetch_and_checkout_branch(repo: git.Repo, branch_name: str):
     repo.git.checkout(branch_name)
 
 
+def _refresh_existing_clone(repo: git.Repo, depth: Optional[int] = None) -> None:
+    """Make sure an already existing clone holds enough history for the caller."""
+    if depth:
+        repo.remote().fetch(depth=depth)
+    elif repo.git.execute(["git", "rev-parse", "--is-shallow-repository"]) == "true":
+        repo.git.fetch(unshallow=True)
+
+
+class CloneSession:
+    """A clone of a repository shared by all the managers run within a single Kebechet run.
+
+    The repository is cloned lazily on the first request, subsequent requests reuse the clone and
+    the working tree is reset between managers instead of cloning the repository again.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty clone session, nothing is cloned until a manager asks for it."""
+        self._temporary_directory: Optional[TemporaryDirectory] = None
+        self._repo: Optional[git.Repo] = None
+        self._in_use = False
+        # Holds lease on the clone cache mirror the shared clone borrows objects from.
+        self._exit_stack = ExitStack()
+
+    def __enter__(self) -> "CloneSession":
+        """Enter the session context."""
+        return self
+
+    def __exit__(self, *_) -> None:
+        """Remove the clone once the run is done."""
+        self.close()
+
+    @property
+    def in_use(self) -> bool:
+        """Check whether the clone is currently used by a manager."""
+        return self._in_use
+
+    @contextmanager
+    def cloned_repo(self, manager: "ManagerBase", branch: str, **clone_kwargs):
+        """Provide the shared clone checked out on the given branch and cd into it."""
+        if self._temporary_directory is None:
+            self._temporary_directory = TemporaryDirectory()
+
+        repo_path = self._temporary_directory.name
+        self._in_use = True
+        try:
+            with cwd(repo_path):
+                if self._repo is None:
+                    self._exit_stack.enter_context(
+                        clone_cache.lease(
+                            _get_service_host(manager.service_url), manager.slug
+                        )
+                    )
+                    if clone_kwargs.get("depth"):
+                        # Keep all the remote branches, other managers can operate on them.
+                        clone_kwargs["no_single_branch"] = True
+                    self._repo = _clone_repo_and_set_vals(
+                        manager, repo_path, **clone_kwargs
+                    )
+                elif not clone_kwargs.get("depth"):
+                    # A previous manager could ask for a shallow clone, fetch the history if needed.
+                    _refresh_existing_clone(self._repo)
+
+                self._repo.git.fetch("origin", branch)
+                # Always start from the remote state, previous managers could leave local commits behind.
+                self._repo.git.checkout("-B", branch, "FETCH_HEAD")
+                try:
+                    yield self._repo
+                finally:
+                    self._repo.git.reset("--hard")
+                    self._repo.git.clean("-xdf")
+        finally:
+            self._in_use = False
+
+    def close(self) -> None:
+        """Remove the shared clone."""
+        self._repo = None
+        if self._temporary_directory is not None:
+            self._temporary_directory.cleanup()
+            self._temporary_directory = None
+        self._exit_stack.close()
+
+
 @contextmanager
 def cloned_repo(manager: "ManagerBase", branch: str = None, **clone_kwargs):
     """Clone the given Git repository and cd into it."""
-    branch = branch or manager.project.default_branch
+    branch = branch or manager.default_branch
 
-    if _CLONE_DIRECTORY is not None:
+    clone_session = getattr(manager, "clone_session", None)
+    if clone_session is not None and not clone_session.in_use:
+        with clone_session.cloned_repo(manager, branch, **clone_kwargs) as repo:
+            yield repo
+    elif _CLONE_DIRECTORY is not None:
         with cwd(_CLONE_DIRECTORY):
             if os.path.isdir(os.path.join(".", ".git")):
                 repo = git.Repo(".")
-                depth = clone_kwargs.get("depth")
-                if depth:
-                    repo.remote().fetch(depth=depth)
-                elif (
-                    repo.git.execute(["git", "rev-parse", "--is-shallow-repository"])
-                    == "true"
-                ):
-                    repo.git.fetch(unshallow=True)
+                _refresh_existing_clone(repo, clone_kwargs.get("depth"))
                 fetch_and_checkout_branch(repo, branch)
             else:
-                repo = _clone_repo_and_set_vals(manager, ".", **clone_kwargs)
+                # The clone outlives the job, do not depend on objects in the clone cache.
+                with clone_cache.lease(
+                    _get_service_host(manager.service_url), manager.slug
+                ):
+                    repo = _clone_repo_and_set_vals(
+                        manager, ".", dissociate=True, **clone_kwargs
+                    )
                 fetch_and_checkout_branch(repo, branch)
             yield repo
             repo.git.stash()  # cleanup unused changes
             repo.git.clean("-xdf")
     else:
-        with TemporaryDirectory() as repo_path, cwd(repo_path):
+        with clone_cache.lease(
+            _get_service_host(manager.service_url), manager.slug
+        ), TemporaryDirectory() as repo_path, cwd(repo_path):
             repo = _clone_repo_and_set_vals(manager, repo_path, **clone_kwargs)
             fetch_and_checkout_branch(repo, branch)
             yield repo
@@ -153,24 +258,33 @@ def construct_raw_file_url(
     return url
 
 
-@contextmanager
-def download_kebechet_config(
+def get_kebechet_config(
     service: BaseGitService, namespace: str, project: str, branch: Optional[str] = None
-):
-    """Get file containing contents of .thoth.yaml from a remote repository."""
+) -> _Config:
+    """Get parsed .thoth.yaml of a remote repository, configuration is cached by the commit it was read from."""
     ogr_project = service.get_project(namespace=namespace, repo=project)
     if branch is None:
         branch = ogr_project.default_branch
 
-    content = ogr_project.get_file_content(".thoth.yaml", ref=branch)
+    slug = f"{namespace}/{project}"
+    service_host = _get_service_host(service.instance_url)  # type: ignore
+    # ogr does not expose HTTP validators (ETag), head of the branch tells whether the file could change.
+    sha = ogr_project.get_sha_from_branch(branch)
+    if sha:
+        config = config_cache.get(service_host, slug, sha)
+        if config is not None:
+            return config
+
+    content = ogr_project.get_file_content(".thoth.yaml", ref=sha or branch)
+    _LOGGER.info(content)
 
-    with tempfile.TemporaryFile("w+") as f:
-        f.write(content)
-        f.seek(0)
-        _LOGGER.info(content)
-        yield f
+    if sha:
+        return config_cache.put(service_host, slug, sha, content)
 
+    return _Config.from_file(io.StringIO(content))
 
+
+@lru_cache(maxsize=32)
 def create_ogr_service(
     service_type: str,
     service_url: Optional[str] = None,
@@ -178,13 +292,20 @@ def create_ogr_service(
     github_app_id: Optional[str] = None,
     github_private_key_path: Optional[str] = None,
 ):
-    """Create a new OGR service for interacting with remote GitForges."""
+    """Create an OGR service for interacting with remote GitForges.
+
+    Services are reused by subsequent calls with the same arguments, installation tokens of a GitHub App
+    are cached until they are about to expire (see kebechet.token_cache).
+    """
     service_type = service_type.upper()
     if service_type == "GITHUB":
         ogr_service: BaseGitService = GithubService(
             token=token,
-            github_app_id=os.getenv("GITHUB_APP_ID"),
-            github_app_private_key_path=os.getenv("GITHUB_PRIVATE_KEY_PATH"),
+            github_authentication=token_cache.CachedGithubApp(
+                github_app_id, None, github_private_key_path
+            )
+            if github_app_id
+            else None,
         )
     elif service_type == "GITLAB":
         ogr_service = GitlabService(token=token, instance_url=service_url)
@@ -202,9 +323,9 @@ def create_ogr_service(
 
 def get_issue_by_title(ogr_project: GitProject, title: str):
     """If an issue exists in the passed project then return the issue object."""
-    for issue in ogr_project.get_issue_list():
-        if issue.title == title:
-            return issue
+    # Issues are filtered by the forge where possible, listing stops on the first match.
+    for issue in pagination.iter_issues_by_title(ogr_project, title):
+        return issue
     else:
         return None
 